@@ -1,20 +1,127 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import Dict, List
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import Dict, Optional
 from sqlalchemy.orm import Session
-import networkx as nx
 
-from ..database import get_db
-from ..database import Note as NoteModel, Link as LinkModel, Tag as TagModel
+from ..services import graph_analytics, suggestions
+from ..services.compression import compress_stream, negotiate_encoding
+from ..services.graph_cache import graph_cache
+from ..services.graph_engine import GraphEngine
+from ..services.graph_export import GraphExporter
+from ..services.http_cache import cached_response
+from ..services.workers import run_analytics
 
 router = APIRouter(prefix="/graph", tags=["graph"])
 
+# Everything here reads the shared graph cache, so it runs on the bounded
+# analytics pool rather than on the event loop. Large payloads are also
+# serialized there, as JSONResponse renders its body on construction.
+# Responses are validated and cached by vault revision.
+
 @router.get("/", summary="Get full knowledge graph")
-def get_graph(db: Session = Depends(get_db)) -> Dict:
-    G = nx.Graph()
-    for n in db.query(NoteModel).all():
-        G.add_node(n.id, title=n.title)
-    for l in db.query(LinkModel).all():
-        G.add_edge(l.from_note_id, l.to_note_id, strength=l.strength)
-    nodes = [{"id": nid, "title": data["title"], "connections": G.degree(nid)} for nid, data in G.nodes(data=True)]
-    links = [{"source": u, "target": v, "strength": data["strength"]} for u, v, data in G.edges(data=True)]
-    return {"nodes": nodes, "links": links}
+async def get_graph(request: Request) -> Dict:
+    return await cached_response(
+        request, lambda: run_analytics(lambda db: JSONResponse(GraphEngine(db).get_graph_data()))
+    )
+
+@router.get("/central", summary="Most connected notes")
+async def get_central_notes(request: Request, limit: int = Query(10, ge=1, le=100)) -> Dict:
+    async def build():
+        payload = suggestions.cached("central", limit) or await run_analytics(
+            lambda db: suggestions.central_notes(db, limit)
+        )
+        return JSONResponse(payload)
+
+    return await cached_response(request, build)
+
+@router.get("/rankings", summary="Notes by PageRank, with their community, from the last analytics run")
+async def get_rankings(
+    request: Request,
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    community: Optional[int] = Query(None, ge=0, description="Only notes of this community"),
+) -> Dict:
+    def rankings(db: Session) -> Dict:
+        rows = db.execute(graph_analytics.rankings_query(limit, offset, community)).all()
+        return {**_analytics_status(db), "notes": graph_analytics.ranking_rows(rows)}
+
+    return await cached_response(request, lambda: run_analytics(lambda db: JSONResponse(rankings(db))))
+
+@router.post("/rankings/refresh", summary="Recompute PageRank and communities now")
+async def refresh_rankings() -> Dict:
+    return await graph_analytics.refresh(force=True)
+
+@router.get("/communities", summary="Communities found by label propagation, largest first")
+async def get_communities(
+    request: Request,
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    members: int = Query(3, ge=0, le=50, description="Best ranked notes listed per community"),
+) -> Dict:
+    def communities(db: Session) -> Dict:
+        groups = []
+        for community, size in db.execute(graph_analytics.communities_query(limit, offset)).all():
+            rows = db.execute(graph_analytics.rankings_query(members, 0, community)).all() if members else []
+            groups.append({"community": community, "size": size, "top": graph_analytics.ranking_rows(rows)})
+        return {**_analytics_status(db), "communities": groups}
+
+    return await cached_response(request, lambda: run_analytics(lambda db: JSONResponse(communities(db))))
+
+def _analytics_status(db: Session) -> Dict:
+    rankings = graph_analytics.graph_rankings
+    rankings.ensure_loaded(db)
+    return {
+        "computed_at": rankings.computed_at.isoformat() if rankings.computed_at else None,
+        # The graph has changed since: a background run will catch up
+        "stale": rankings.version != graph_cache.version,
+    }
+
+@router.get("/ego/{note_id}", summary="Neighborhood of a note up to a given depth")
+async def get_ego_network(
+    request: Request,
+    note_id: int,
+    depth: int = Query(2, ge=1, le=6),
+    max_nodes: int = Query(200, ge=1, le=5000),
+) -> Dict:
+    async def build():
+        result = await run_analytics(
+            lambda db: GraphEngine(db).get_ego_network(note_id, depth=depth, max_nodes=max_nodes)
+        )
+        if result is None:
+            raise HTTPException(status_code=404, detail="Note not found")
+        return JSONResponse(result)
+
+    return await cached_response(request, build)
+
+@router.get("/overview", summary="Most connected notes with the rest folded into clusters")
+async def get_overview(request: Request, top: int = Query(100, ge=1, le=2000)) -> Dict:
+    return await cached_response(
+        request, lambda: run_analytics(lambda db: JSONResponse(GraphEngine(db).get_overview(top)))
+    )
+
+@router.get("/nodes", summary="Page through graph nodes by id")
+async def get_nodes_page(
+    request: Request,
+    after_id: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=5000),
+) -> Dict:
+    return await cached_response(
+        request,
+        lambda: run_analytics(lambda db: JSONResponse(GraphEngine(db).get_nodes_page(after_id=after_id, limit=limit))),
+    )
+
+@router.get("/export", summary="Stream the knowledge graph as NDJSON, JSON or compact binary")
+def export_graph(
+    format: str = Query("ndjson", pattern="^(ndjson|json|binary)$"),
+    accept_encoding: Optional[str] = Header(None),
+):
+    exporter = GraphExporter()
+    encoding = negotiate_encoding(accept_encoding)
+    headers = {"Vary": "Accept-Encoding", "X-Graph-Version": str(exporter.version)}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return StreamingResponse(
+        compress_stream(exporter.stream(format), encoding),
+        media_type=GraphExporter.MEDIA_TYPES[format],
+        headers=headers,
+    )
@@ -1,81 +1,253 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List, Dict
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import List, Dict, Optional
+from sqlalchemy import distinct, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, load_only
 
-from ..database import get_db
-from ..database import Note as NoteModel, Link as LinkModel, Tag as TagModel
-from ..services.link_parser import LinkParser
+from ..database import get_async_db
+from ..database import Note as NoteModel, UnresolvedLink
+from ..services import note_fields, note_renderer
+from ..services.tag_index import tagged_note_ids
+from ..services.tag_parser import TagParser
+from ..services.backlinks import BACKLINK_SORTS, backlinks_query
+from ..services.change_feed import changes_since
+from ..services.bulk import NoteImporter, export_ndjson, read_ndjson
+from ..services.http_cache import cached_response, not_modified, vault_revision, with_validators
+from ..services.graph_engine import GraphEngine
+from ..services.note_writer import NoteWriter
+from ..services.related_notes import GRAPH_WEIGHT, related_index
+from ..services.unresolved_links import unresolved_query
+from ..services.workers import run_analytics, run_write
 
 router = APIRouter(prefix="/notes", tags=["notes"])
 
-@router.get("/", summary="List notes with pagination")
-def list_notes(limit: int = 100, offset: int = 0, db: Session = Depends(get_db)) -> List[Dict]:
-    notes = (
-        db.query(NoteModel)
-          .order_by(NoteModel.updated_at.desc())
+def _note_dict(n: NoteModel) -> Dict:
+    return note_fields.note_dict(n, note_fields.FULL_FIELDS)
+
+def _parse_fields(fields: Optional[str], default) -> List[str]:
+    try:
+        return note_fields.parse_fields(fields, default)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/", summary="List note summaries, most recently updated first")
+async def list_notes(
+    request: Request,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated, e.g. id,title,content"),
+    tag: List[str] = Query([], description="Only notes with all of these tags"),
+    db: AsyncSession = Depends(get_async_db),
+) -> List[Dict]:
+    names = _parse_fields(fields, note_fields.SUMMARY_FIELDS)
+    query = (
+        select(NoteModel)
+          # updated_at is always loaded: it is half of the next cursor
+          .options(load_only(*note_fields.columns([*names, "updated_at"])))
+          .order_by(NoteModel.updated_at.desc(), NoteModel.id.desc())
           .limit(limit)
-          .offset(offset)
-          .all()
     )
-    return [{"id": n.id, "title": n.title, "content": n.content} for n in notes]
+    if cursor:
+        try:
+            position = note_fields.decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        # Keyset pagination: seeks straight to the position via ix_notes_updated_at
+        query = query.where(tuple_(NoteModel.updated_at, NoteModel.id) < position)
+    for name in tag:
+        query = query.where(NoteModel.id.in_(tagged_note_ids(TagParser.normalize(name))))
+
+    async def build() -> Response:
+        notes = (await db.scalars(query)).all()
+        headers = {"X-Next-Cursor": note_fields.encode_cursor(notes[-1])} if len(notes) == limit else None
+        return JSONResponse([note_fields.note_dict(n, names) for n in notes], headers=headers)
+
+    return await cached_response(request, build)
+
+@router.get("/export", summary="Stream every note as NDJSON")
+def export_notes():
+    return StreamingResponse(export_ndjson(), media_type="application/x-ndjson")
+
+@router.post("/import", summary="Bulk import notes from an NDJSON request body")
+async def import_notes(request: Request) -> Dict:
+    # Batches commit as they fill, so a malformed line stops the import but
+    # keeps (and links) the notes before it. Every step runs on the writer
+    # thread, between the other writes rather than alongside them.
+    importer = NoteImporter()
+
+    async def write(step, *args):
+        return await run_write(lambda _: step(*args))
+
+    await write(importer.__enter__)
+    try:
+        pending = b""
+        line_number = 1
+        lines: List[str] = []
+        async for chunk in request.stream():
+            pending += chunk
+            *complete, pending = pending.split(b"\n")
+            lines.extend(line.decode("utf-8") for line in complete)
+            if len(lines) >= importer.batch_size:
+                # Parsed on the writer thread, so a bad line still lets the ones before it in
+                await write(importer.add, read_ndjson(lines, line_number))
+                line_number += len(lines)
+                lines = []
+        lines.append(pending.decode("utf-8"))
+        await write(importer.add, read_ndjson(lines, line_number))
+        return await write(importer.finish)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"{e}; notes imported before it: {importer.notes}")
+    finally:
+        await write(importer.__exit__, None, None, None)
+
+@router.get("/unresolved", summary="Link targets that have no note yet, most referenced first")
+async def list_unresolved(
+    request: Request,
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_async_db),
+) -> Dict:
+    async def build() -> Response:
+        total = await db.scalar(select(func.count(distinct(UnresolvedLink.target_key))))
+        rows = (await db.execute(unresolved_query(limit, offset))).all()
+        return JSONResponse({
+            "total": total,
+            "targets": [{"title": row.title, "references": row.references} for row in rows],
+        })
+
+    return await cached_response(request, build)
+
+@router.get("/changes", summary="What changed since a seq from /ws or an earlier call, for catching up")
+async def get_changes(
+    since: int = Query(..., ge=0, description="The last seq this client has applied"),
+    db: AsyncSession = Depends(get_async_db),
+) -> Dict:
+    return await db.run_sync(changes_since, since)
 
 @router.get("/{note_id}", summary="Get a specific note by ID")
-def get_note(note_id: int, db: Session = Depends(get_db)) -> Dict:
-    note = db.get(NoteModel, note_id)
+async def get_note(
+    note_id: int,
+    request: Request,
+    fields: Optional[str] = Query(None, description="Comma-separated, e.g. id,title,preview"),
+    db: AsyncSession = Depends(get_async_db),
+) -> Dict:
+    names = _parse_fields(fields, note_fields.FULL_FIELDS)
+    # A known version answers a conditional GET without a query
+    version = vault_revision.note_version(note_id)
+    if version is not None:
+        cached = not_modified(request, vault_revision.note_etag(note_id, version), version[0])
+        if cached is not None:
+            return cached
+    # The version columns are always loaded: they make up the ETag
+    loaded = note_fields.columns([*names, "updated_at", "in_degree", "out_degree"])
+    note = await db.get(NoteModel, note_id, options=[load_only(*loaded)])
     if not note:
         raise HTTPException(status_code=404, detail="Note not found")
-    return {"id": note.id, "title": note.title, "content": note.content}
+    version = (note.updated_at, note.in_degree or 0, note.out_degree or 0)
+    vault_revision.note_seen(note.id, version)
+    return with_validators(
+        JSONResponse(note_fields.note_dict(note, names)),
+        vault_revision.note_etag(note.id, version),
+        note.updated_at,
+    )
+
+@router.get("/{note_id}/render", summary="Note body with [[links]] resolved to note links, for the preview")
+async def render_note(note_id: int, request: Request, db: AsyncSession = Depends(get_async_db)) -> Dict:
+    async def build() -> Response:
+        content = await db.scalar(select(NoteModel.content).where(NoteModel.id == note_id))
+        if content is None:
+            raise HTTPException(status_code=404, detail="Note not found")
+        return JSONResponse(await db.run_sync(lambda s: note_renderer.render_note(note_id, content, s)))
+
+    return await cached_response(request, build)
+
+@router.get("/{note_id}/backlinks", summary="Notes linking to this note, with titles and link counts")
+async def get_backlinks(
+    note_id: int,
+    request: Request,
+    sort: str = Query("degree", pattern=f"^({'|'.join(BACKLINK_SORTS)})$"),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_async_db),
+) -> Dict:
+    async def build() -> Response:
+        total = await db.scalar(select(NoteModel.in_degree).where(NoteModel.id == note_id))
+        if total is None:
+            raise HTTPException(status_code=404, detail="Note not found")
+        rows = (await db.execute(backlinks_query(note_id, sort, limit, offset))).all()
+        return JSONResponse({
+            "note_id": note_id,
+            "total": total,
+            "backlinks": [
+                {
+                    "id": row.id,
+                    "title": row.title,
+                    "preview": row.preview,
+                    "in_degree": row.in_degree,
+                    "out_degree": row.out_degree,
+                    "updated_at": row.updated_at.isoformat(),
+                }
+                for row in rows
+            ],
+        })
+
+    return await cached_response(request, build)
+
+@router.get("/{note_id}/related", summary="Notes similar in content, blended with link distance")
+async def get_related(
+    note_id: int,
+    request: Request,
+    limit: int = Query(10, ge=1, le=100),
+    graph_weight: float = Query(GRAPH_WEIGHT, ge=0.0, le=1.0, description="0 = text only, 1 = links only"),
+    include_linked: bool = Query(False, description="Also list notes this one already links with"),
+) -> Dict:
+    async def build() -> Response:
+        result = await run_analytics(lambda db: _related(db, note_id, limit, graph_weight, include_linked))
+        if result is None:
+            raise HTTPException(status_code=404, detail="Note not found")
+        return JSONResponse(result)
+
+    return await cached_response(request, build)
+
+def _related(db: Session, note_id: int, limit: int, graph_weight: float, include_linked: bool) -> Optional[Dict]:
+    related = related_index.related(note_id, db, limit, graph_weight, include_linked)
+    if related is None:
+        return None
+    titles = GraphEngine(db).get_titles([item["id"] for item in related])
+    return {
+        "note_id": note_id,
+        "related": [{**item, "title": titles.get(item["id"], f"Note {item['id']}")} for item in related],
+    }
+
+# Writes go through the NoteWriter on the writer thread: it keeps the
+# in-process indexes current and must not wait on their locks on the event loop.
 
 @router.post("/", summary="Create a new note")
-def create_note(body: Dict, db: Session = Depends(get_db)) -> Dict:
-    n = NoteModel(title=body.get("title"), content=body.get("content", ""))
-    db.add(n)
-    db.commit()
-    db.refresh(n)
-    
-    # Create links for any referenced notes
-    link_titles = LinkParser.extract_links(body.get("content", ""))
-    for title in link_titles:
-        linked_note = db.query(NoteModel).filter(NoteModel.title == title.strip()).first()
-        if linked_note:
-            link = LinkModel(from_note_id=n.id, to_note_id=linked_note.id)
-            db.add(link)
-    db.commit()
-    
-    return {"id": n.id, "title": n.title, "content": n.content}
+async def create_note(body: Dict) -> Dict:
+    return await run_write(lambda db: _note_dict(NoteWriter(db).create(body.get("title"), body.get("content", ""))))
 
-@router.put("/{note_id}", summary="Update an existing note")
-def update_note(note_id: int, body: Dict, db: Session = Depends(get_db)) -> Dict:
+def _update(db: Session, note_id: int, body: Dict) -> Optional[Dict]:
     n = db.get(NoteModel, note_id)
     if not n:
+        return None
+    return _note_dict(NoteWriter(db).update(n, title=body.get("title"), content=body.get("content")))
+
+def _delete(db: Session, note_id: int) -> bool:
+    n = db.get(NoteModel, note_id)
+    if n:
+        NoteWriter(db).delete(n)
+    return n is not None
+
+@router.put("/{note_id}", summary="Update an existing note")
+async def update_note(note_id: int, body: Dict) -> Dict:
+    n = await run_write(lambda db: _update(db, note_id, body))
+    if n is None:
         raise HTTPException(status_code=404, detail="Note not found")
-    
-    # Delete existing links
-    db.query(LinkModel).filter(LinkModel.from_note_id == note_id).delete()
-    
-    n.title = body.get("title", n.title)
-    n.content = body.get("content", n.content)
-    db.commit()
-    
-    # Create new links
-    link_titles = LinkParser.extract_links(body.get("content", ""))
-    for title in link_titles:
-        linked_note = db.query(NoteModel).filter(NoteModel.title == title.strip()).first()
-        if linked_note:
-            link = LinkModel(from_note_id=n.id, to_note_id=linked_note.id)
-            db.add(link)
-    db.commit()
-    
-    return {"id": n.id, "title": n.title, "content": n.content}
+    return n
 
 @router.delete("/{note_id}", summary="Delete a note")
-def delete_note(note_id: int, db: Session = Depends(get_db)) -> Dict:
-    n = db.get(NoteModel, note_id)
-    if not n:
+async def delete_note(note_id: int) -> Dict:
+    if not await run_write(lambda db: _delete(db, note_id)):
         raise HTTPException(status_code=404, detail="Note not found")
-        # cascade delete related links and tags
-    db.query(LinkModel).filter((LinkModel.from_note_id==note_id)|(LinkModel.to_note_id==note_id)).delete(synchronize_session=False)
-    db.query(TagModel).filter(TagModel.note_id==note_id).delete(synchronize_session=False)
-    db.delete(n)
-    db.commit()
     return {"message": "Deleted"}
@@ -1,40 +1,83 @@
-from fastapi import APIRouter, Depends, Query
-from typing import List, Dict
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.responses import JSONResponse
+from typing import Dict, List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import func, or_
 
-from ..database import get_db
+from ..database import get_async_db
+from ..services import suggestions
+from ..services.http_cache import cached_response
+from ..services.note_fields import SUMMARY_FIELDS, note_dict
 from ..services.resurfacing import IdeaResurfacing
-from ..database import Note as NoteModel
+from ..services.search_index import SearchIndex
+from ..services.tag_index import tag_counts_query
+from ..services.tag_parser import TagParser
+from ..services.title_index import title_index
+from ..services.workers import run_analytics
 
 router = APIRouter(prefix="/search", tags=["search"])
 
-@router.get("/", summary="Search notes by title or content")
-def search_notes(q: str = Query(..., min_length=2), db: Session = Depends(get_db)) -> Dict[str, List[Dict]]:
-    pattern = f"%{q.lower()}%"
-    notes = (
-        db.query(NoteModel)
-          .filter(
-              or_(func.lower(NoteModel.title).like(pattern), func.lower(NoteModel.content).like(pattern))
-          )
-          .order_by(NoteModel.updated_at.desc())
-          .all()
-    )
-    return {"notes": [{"id": n.id, "title": n.title, "content": n.content} for n in notes]}
+@router.get("/", summary="Full-text search over note titles and content")
+async def search_notes(
+    q: str = Query(..., min_length=2),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    tag: List[str] = Query([], description="Only notes with all of these tags"),
+    db: AsyncSession = Depends(get_async_db),
+) -> Dict:
+    tags = [TagParser.normalize(t) for t in tag]
+    result = await db.run_sync(SearchIndex.search, q, limit=limit, offset=offset, tags=tags)
+    return {**result, "limit": limit, "offset": offset}
+
+@router.get("/tags", summary="Tags with their note counts, most used first")
+async def list_tags(
+    request: Request,
+    prefix: Optional[str] = Query(None, description="Only tags starting with this"),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_async_db),
+) -> Dict:
+    prefix = TagParser.normalize(prefix) if prefix else None
+
+    async def build() -> Response:
+        # Counts are kept by triggers on every tag change, so this never groups the tags table
+        rows = (await db.execute(tag_counts_query(prefix, limit, offset))).all()
+        return JSONResponse({"tags": [{"name": name, "count": count} for name, count in rows]})
+
+    return await cached_response(request, build)
+
+@router.get("/suggest", summary="Note titles for [[link]] autocompletion")
+async def suggest_titles(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(8, ge=1, le=50),
+    db: AsyncSession = Depends(get_async_db),
+) -> Dict:
+    # Served from the in-memory title index; the session is only used if it must load
+    return {"suggestions": await db.run_sync(lambda s: title_index.suggest(q, limit, s))}
 
 @router.get("/resurface/daily", summary="Get daily resurfacing note suggestions")
-def daily_resurface(count: int = 5, db: Session = Depends(get_db)):
-    resurfacer = IdeaResurfacing(db)
-    notes = resurfacer.get_daily_suggestions(count)
-    return {"notes": [
-        {"id": n.id, "title": n.title, "content": n.content, "updated_at": n.updated_at.isoformat()} for n in notes
-    ]}
+async def daily_resurface(count: int = Query(5, ge=1, le=50)):
+    return suggestions.cached("daily", count) or await run_analytics(
+        lambda db: suggestions.daily_suggestions(db, count)
+    )
+
+@router.get("/resurface/orphans", summary="Get unlinked notes that could use connections")
+async def orphan_resurface(count: int = Query(3, ge=1, le=50)):
+    return suggestions.cached("orphans", count) or await run_analytics(
+        lambda db: suggestions.orphan_suggestions(db, count)
+    )
 
 @router.get("/resurface/random", summary="Get a random resurfacing note")
-def random_resurface(db: Session = Depends(get_db)):
+async def random_resurface(
+    seed: Optional[int] = None,
+    avoid_repeats: int = Query(10, ge=0, le=100),
+):
+    return await run_analytics(lambda db: _random_discovery(db, seed, avoid_repeats))
+
+def _random_discovery(db: Session, seed: Optional[int], avoid_repeats: int) -> Dict:
     resurfacer = IdeaResurfacing(db)
-    note = resurfacer.get_random_discovery()
+    note = resurfacer.get_random_discovery(seed=seed, avoid_repeats=avoid_repeats)
     if note:
-        return {"note": {"id": note.id, "title": note.title, "content": note.content, "updated_at": note.updated_at.isoformat()}}
+        return {"note": note_dict(note, SUMMARY_FIELDS)}
     else:
         return {"note": None}
@@ -1,15 +1,62 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import create_engine, event, Column, Integer, Float, String, Text, DateTime, ForeignKey, Index
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session, relationship
 from datetime import datetime
 import os
 
 # Database setup
-DATABASE_URL = "sqlite:///./data/focusnest.db"
-os.makedirs("./data", exist_ok=True)
+DATABASE_URL = os.environ.get("FOCUSNEST_DATABASE_URL", "sqlite:///./data/focusnest.db")
+
+# Storage tuning, overridable per deployment
+SQLITE_PRAGMAS = {
+    # WAL lets readers proceed while a write is in progress
+    "journal_mode": os.environ.get("FOCUSNEST_SQLITE_JOURNAL_MODE", "WAL"),
+    # NORMAL is crash-safe under WAL and skips an fsync per commit
+    "synchronous": os.environ.get("FOCUSNEST_SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": int(os.environ.get("FOCUSNEST_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    # Negative values are KiB: 64 MiB of page cache per connection
+    "cache_size": int(os.environ.get("FOCUSNEST_SQLITE_CACHE_SIZE", "-65536")),
+    "temp_store": "MEMORY",
+    "busy_timeout": int(os.environ.get("FOCUSNEST_SQLITE_BUSY_TIMEOUT_MS", "5000")),
+}
+POOL_SIZE = int(os.environ.get("FOCUSNEST_DB_POOL_SIZE", "8"))
+MAX_OVERFLOW = int(os.environ.get("FOCUSNEST_DB_MAX_OVERFLOW", "16"))
+
+def _create_engine(url: str):
+    database = make_url(url).database
+    if not database or database == ":memory:":
+        return create_engine(url, connect_args={"check_same_thread": False})
+    os.makedirs(os.path.dirname(os.path.abspath(database)), exist_ok=True)
+    # One file, many connections: a pool of readers alongside the writer
+    return create_engine(
+        url,
+        connect_args={"check_same_thread": False},
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+    )
+
+def _create_async_engine(url: str):
+    """The same database through aiosqlite, for handlers that run on the event loop"""
+    url = make_url(url).set(drivername="sqlite+aiosqlite")
+    if not url.database or url.database == ":memory:":
+        return create_async_engine(url)
+    return create_async_engine(url, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW)
+
+engine = _create_engine(DATABASE_URL)
+async_engine = _create_async_engine(DATABASE_URL)
+
+@event.listens_for(engine, "connect")
+@event.listens_for(async_engine.sync_engine, "connect")
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+    cursor.close()
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 # Database Models
@@ -19,8 +66,14 @@ class Note(Base):
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True, nullable=False)
     content = Column(Text, nullable=False, default="")
+    # Derived from content on every write so list views never read the body
+    preview = Column(String, nullable=False, default="", server_default="")
+    word_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # Link counts kept current by the write path (see services/backlinks.py)
+    in_degree = Column(Integer, nullable=False, default=0, server_default="0")
+    out_degree = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # Relationships
     outgoing_links = relationship("Link", foreign_keys="Link.from_note_id", back_populates="from_note")
@@ -29,10 +82,14 @@ class Note(Base):
 
 class Link(Base):
     __tablename__ = "links"
+    __table_args__ = (
+        # One row per directed pair; also serves lookups by from_note_id
+        Index("uq_links_from_to", "from_note_id", "to_note_id", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     from_note_id = Column(Integer, ForeignKey("notes.id"), nullable=False)
-    to_note_id = Column(Integer, ForeignKey("notes.id"), nullable=False)
+    to_note_id = Column(Integer, ForeignKey("notes.id"), nullable=False, index=True)
     strength = Column(Integer, default=1)
     created_at = Column(DateTime, default=datetime.utcnow)
     
@@ -42,16 +99,69 @@ class Link(Base):
 
 class Tag(Base):
     __tablename__ = "tags"
+    __table_args__ = (
+        # One row per tag and note; covers "notes with this tag" without touching the table
+        Index("uq_tags_name_note", "tag_name", "note_id", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    note_id = Column(Integer, ForeignKey("notes.id"), nullable=False)
+    note_id = Column(Integer, ForeignKey("notes.id"), nullable=False, index=True)
     tag_name = Column(String, nullable=False)
     
     # Relationships
     note = relationship("Note", back_populates="tags")
 
+class UnresolvedLink(Base):
+    """A [[link]] whose target has no note yet, kept until a note with that title appears"""
+    __tablename__ = "unresolved_links"
+    __table_args__ = (
+        # One row per (note, target); also serves lookups by from_note_id
+        Index("uq_unresolved_links_from_key", "from_note_id", "target_key", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    from_note_id = Column(Integer, ForeignKey("notes.id"), nullable=False)
+    # normalize_title() of the link text: the lookup key when notes are created or renamed
+    target_key = Column(String, nullable=False, index=True)
+    target_title = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class NoteRanking(Base):
+    """A note's scores from the last graph analytics run (see services/graph_analytics.py)"""
+    __tablename__ = "note_rankings"
+    __table_args__ = (
+        Index("ix_note_rankings_pagerank", "pagerank"),
+        # Members of a community, best ranked first
+        Index("ix_note_rankings_community", "community", "pagerank"),
+    )
+
+    note_id = Column(Integer, ForeignKey("notes.id"), primary_key=True)
+    pagerank = Column(Float, nullable=False)
+    # Label propagation community and connected component, both numbered by size (0 = largest)
+    community = Column(Integer, nullable=False)
+    component = Column(Integer, nullable=False)
+    computed_at = Column(DateTime, nullable=False)
+
+class ChangeLog(Base):
+    """One note or link change, numbered in commit order (see services/change_feed.py)"""
+    __tablename__ = "change_log"
+    # AUTOINCREMENT: a sequence number is never handed out twice, even after pruning
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True)
+    # note.created | note.updated | note.deleted | link.created | link.deleted | vault.reset
+    kind = Column(String, nullable=False)
+    # The note, or the source of a link
+    note_id = Column(Integer)
+    # The target of a link
+    other_id = Column(Integer)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 def init_db():
+    from .migrations import run_migrations
+
     Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
 
 def get_db() -> Session:
     db = SessionLocal()
@@ -59,3 +169,7 @@ def get_db() -> Session:
         yield db
     finally:
         db.close()
+
+async def get_async_db() -> AsyncSession:
+    async with AsyncSessionLocal() as db:
+        yield db
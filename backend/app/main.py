@@ -1,14 +1,37 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, WebSocket
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 import pathlib
 
-from .database import init_db
+from .database import init_db, AsyncSessionLocal, SessionLocal, engine, async_engine
 from .api import notes, graph, search
+from .services import metrics
+from .services.change_feed import change_feed, latest_seq
+from .services.graph_analytics import analytics_scheduler
+from .services.graph_cache import graph_cache
+from .services.suggestions import scheduler
+from .services.title_index import title_index
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm the in-process indexes once so no request pays for the first build
+    db = SessionLocal()
+    try:
+        title_index.ensure_loaded(db)
+        graph_cache.ensure_loaded(db)
+    finally:
+        db.close()
+    scheduler.start()
+    analytics_scheduler.start()
+    yield
+    await analytics_scheduler.stop()
+    await scheduler.stop()
+    await async_engine.dispose()
 
 # Create FastAPI app
-app = FastAPI(title="FocusNest API", version="1.0.0")
+app = FastAPI(title="FocusNest API", version="1.0.0", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -17,8 +40,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let browser devtools read the timings and profile id cross-origin
+    expose_headers=["Server-Timing", "X-Profile-Id"],
 )
 
+# Opt-in instrumentation (FOCUSNEST_METRICS=1)
+if metrics.METRICS_ENABLED:
+    metrics.instrument_engine(engine)
+    metrics.instrument_engine(async_engine.sync_engine)
+    app.add_middleware(metrics.MetricsMiddleware, routes=app.routes)
+
 # Initialize database
 init_db()
 
@@ -51,3 +82,24 @@ async def serve_frontend():
 async def health_check():
     return {"status": "healthy", "message": "FocusNest API is running"}
 
+@app.websocket("/ws")
+async def changes_socket(websocket: WebSocket):
+    """Change feed: a hello with the current seq, then batches of note/link events"""
+    async def load_seq() -> int:
+        async with AsyncSessionLocal() as db:
+            return await db.run_sync(latest_seq)
+
+    await change_feed.serve(websocket, load_seq)
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled; set FOCUSNEST_METRICS=1")
+    return PlainTextResponse(metrics.render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/metrics/profiles/{profile_id}", include_in_schema=False)
+async def profile_dump(profile_id: str):
+    dump = metrics.get_profile(profile_id) if metrics.METRICS_ENABLED else None
+    if dump is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(dump)
@@ -0,0 +1,126 @@
+"""
+Schema migrations for existing databases.
+
+`Base.metadata.create_all` creates missing tables with their current
+definition, but never changes a table that already exists. Each migration
+below brings an older database up to the models. Every step is idempotent,
+so it is also safe on a database that create_all has just built. The
+number of applied steps is stored in SQLite's `PRAGMA user_version`.
+"""
+
+from typing import Callable, List
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+def _unique_links(conn: Connection):
+    """Links were not unique per (from, to): drop duplicate pairs, then add the index"""
+    exists = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'uq_links_from_to'")
+    ).first()
+    if exists:
+        return
+    conn.execute(text(
+        "DELETE FROM links WHERE id NOT IN "
+        "(SELECT MIN(id) FROM links GROUP BY from_note_id, to_note_id)"
+    ))
+    conn.execute(text("CREATE UNIQUE INDEX uq_links_from_to ON links (from_note_id, to_note_id)"))
+
+def _hot_path_indexes(conn: Connection):
+    """Indexes behind backlink lookups, note deletes and recency ordering"""
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_links_to_note_id ON links (to_note_id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_tags_note_id ON tags (note_id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_notes_updated_at ON notes (updated_at)"))
+
+def _search_index(conn: Connection):
+    from .services.search_index import SearchIndex
+    SearchIndex.ensure_schema(conn)
+
+def _note_summaries(conn: Connection):
+    """Add the stored preview/word_count columns and fill them for existing notes"""
+    from .services.note_fields import summarize
+
+    existing = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(notes)")}
+    if "preview" in existing:
+        return
+    conn.execute(text("ALTER TABLE notes ADD COLUMN preview VARCHAR NOT NULL DEFAULT ''"))
+    conn.execute(text("ALTER TABLE notes ADD COLUMN word_count INTEGER NOT NULL DEFAULT 0"))
+    rows = []
+    for note_id, content in conn.execute(text("SELECT id, content FROM notes")).fetchall():
+        preview, word_count = summarize(content)
+        rows.append({"id": note_id, "preview": preview, "word_count": word_count})
+    if rows:
+        conn.execute(text("UPDATE notes SET preview = :preview, word_count = :word_count WHERE id = :id"), rows)
+
+def _link_degrees(conn: Connection):
+    """Add the stored in/out degree columns and count them for existing notes"""
+    from .services.backlinks import refresh_degrees
+
+    existing = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(notes)")}
+    if "in_degree" in existing:
+        return
+    conn.execute(text("ALTER TABLE notes ADD COLUMN in_degree INTEGER NOT NULL DEFAULT 0"))
+    conn.execute(text("ALTER TABLE notes ADD COLUMN out_degree INTEGER NOT NULL DEFAULT 0"))
+    refresh_degrees(conn)
+
+def _unresolved_links(conn: Connection):
+    """Record the dangling [[links]] of existing notes (create_all has made the table)"""
+    from .services.link_parser import LinkParser
+    from .services.title_index import normalize_title
+
+    if conn.execute(text("SELECT 1 FROM unresolved_links LIMIT 1")).first():
+        return
+    keys = {normalize_title(title) for (title,) in conn.execute(text("SELECT title FROM notes"))}
+    rows = []
+    for note_id, content in conn.execute(text("SELECT id, content FROM notes")).fetchall():
+        dangling = {}
+        for title in sorted(LinkParser.extract_links(content or "")):
+            key = normalize_title(title)
+            if key not in keys:
+                dangling.setdefault(key, title)
+        rows.extend({"id": note_id, "key": key, "title": title} for key, title in dangling.items())
+    if rows:
+        conn.execute(text(
+            "INSERT OR IGNORE INTO unresolved_links (from_note_id, target_key, target_title, created_at) "
+            "VALUES (:id, :key, :title, CURRENT_TIMESTAMP)"
+        ), rows)
+
+def _tag_index(conn: Connection):
+    """Unique (tag_name, note_id) index, #hashtags of existing notes, and the tag count table"""
+    from .services import tag_index
+    from .services.tag_parser import TagParser
+
+    exists = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'uq_tags_name_note'")
+    ).first()
+    if not exists:
+        conn.execute(text(
+            "DELETE FROM tags WHERE id NOT IN (SELECT MIN(id) FROM tags GROUP BY tag_name, note_id)"
+        ))
+        conn.execute(text("CREATE UNIQUE INDEX uq_tags_name_note ON tags (tag_name, note_id)"))
+    rows = [
+        {"note_id": note_id, "tag_name": tag}
+        for note_id, content in conn.execute(text("SELECT id, content FROM notes")).fetchall()
+        for tag in sorted(TagParser.extract_tags(content))
+    ]
+    tag_index.add_tags(conn, rows)
+    tag_index.ensure_schema(conn)
+
+MIGRATIONS: List[Callable[[Connection], None]] = [
+    _unique_links,
+    _hot_path_indexes,
+    _search_index,
+    _note_summaries,
+    _link_degrees,
+    _unresolved_links,
+    _tag_index,
+]
+
+def run_migrations(engine: Engine) -> int:
+    """Apply pending migrations; returns the resulting schema version"""
+    with engine.begin() as conn:
+        current = conn.exec_driver_sql("PRAGMA user_version").scalar()
+        for version, migrate in enumerate(MIGRATIONS, 1):
+            if version > current:
+                migrate(conn)
+                conn.exec_driver_sql(f"PRAGMA user_version = {version}")
+        return max(current, len(MIGRATIONS))
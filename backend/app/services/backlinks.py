@@ -0,0 +1,48 @@
+from typing import Iterable, Optional, Union
+from sqlalchemy import func, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from ..database import Note, Link
+
+# How backlinks can be ordered: most linked first, most recently edited first, or by title
+BACKLINK_SORTS = {
+    "degree": ((Note.in_degree + Note.out_degree).desc(), Note.id),
+    "recent": (Note.updated_at.desc(), Note.id.desc()),
+    "title": (Note.title.collate("NOCASE"), Note.id),
+}
+
+_ID_CHUNK = 500
+
+def refresh_degrees(db: Union[Session, Connection], note_ids: Optional[Iterable[int]] = None):
+    """Recount the stored in/out degree of the given notes (all notes when None).
+
+    Each count is an index lookup on links, so recounting the handful of notes
+    a write touched is cheaper and safer than tracking increments.
+    """
+    statement = (
+        update(Note)
+        .values(
+            out_degree=select(func.count()).where(Link.from_note_id == Note.id).scalar_subquery(),
+            in_degree=select(func.count()).where(Link.to_note_id == Note.id).scalar_subquery(),
+            # Not an edit: keep the onupdate default from touching updated_at
+            updated_at=Note.updated_at,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if note_ids is None:
+        db.execute(statement)
+        return
+    ids = sorted(set(note_ids))
+    for start in range(0, len(ids), _ID_CHUNK):
+        db.execute(statement.where(Note.id.in_(ids[start:start + _ID_CHUNK])))
+
+def backlinks_query(note_id: int, sort: str = "degree", limit: int = 50, offset: int = 0):
+    """Notes linking to `note_id`, with their titles and counts, in one joined query"""
+    return (
+        select(Note.id, Note.title, Note.preview, Note.in_degree, Note.out_degree, Note.updated_at)
+        .join(Link, Link.from_note_id == Note.id)
+        .where(Link.to_note_id == note_id)
+        .order_by(*BACKLINK_SORTS[sort])
+        .limit(limit)
+        .offset(offset)
+    )
@@ -0,0 +1,255 @@
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from sqlalchemy import insert, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from ..database import engine as default_engine, Note, Link
+from . import suggestions
+from .backlinks import refresh_degrees
+from .change_feed import change_feed, record_changes
+from .graph_cache import graph_cache
+from .http_cache import vault_revision
+from .link_parser import LinkParser
+from .note_fields import summarize
+from .related_notes import related_index
+from .tag_index import add_tags
+from .tag_parser import TagParser
+from .title_index import normalize_title, title_index
+from .unresolved_links import dangling_targets, record_unresolved, resolve_pending
+
+def _parse_datetime(value) -> Optional[datetime]:
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00")).replace(tzinfo=None)
+
+def read_ndjson(lines: Iterable[str], first_line: int = 1) -> Iterator[Dict]:
+    """Note records from NDJSON lines: {"title", "content", optional created_at/updated_at}"""
+    for number, line in enumerate(lines, first_line):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON on line {number}: {e}") from e
+        if not isinstance(record, dict):
+            raise ValueError(f"Line {number} is not a JSON object")
+        yield record
+
+def read_markdown_dir(path: Path) -> Iterator[Dict]:
+    """Note records from a directory tree of .md files; the file name is the title"""
+    for file in sorted(Path(path).rglob("*.md")):
+        modified = datetime.utcfromtimestamp(file.stat().st_mtime)
+        yield {
+            "title": file.stem,
+            "content": file.read_text(encoding="utf-8"),
+            "created_at": modified,
+            "updated_at": modified,
+        }
+
+class NoteImporter:
+    """Loads many notes in large batched transactions.
+
+    Pass one inserts note rows with executemany and remembers only each new
+    note's link titles. Pass two resolves all links against the title index,
+    which by then includes every imported note. Links to notes later in the
+    same import (forward references) therefore resolve too, as do unresolved
+    links from existing notes to the imported titles. Links that still have
+    no target are recorded as unresolved. #hashtags are tagged with each batch.
+    An import that stops early keeps the batches already committed, and
+    leaving the context still resolves their links.
+    """
+
+    BATCH_SIZE = 1000
+
+    def __init__(self, engine: Engine = None, batch_size: int = BATCH_SIZE):
+        self.engine = engine or default_engine
+        self.batch_size = batch_size
+        self._conn = None
+        self._synchronous = None
+        self._pending_links: List[Tuple[int, List[str]]] = []
+        self._imported_keys: Set[str] = set()
+        self.notes = 0
+        self.links = 0
+        self.unresolved = 0
+        self._started = None
+
+    def __enter__(self) -> "NoteImporter":
+        self._started = time.perf_counter()
+        self._conn = self.engine.connect()
+        self._synchronous = self._conn.exec_driver_sql("PRAGMA synchronous").scalar()
+        # Durability of every batch is not needed mid-load; the final commit still syncs
+        self._conn.exec_driver_sql("PRAGMA synchronous = OFF")
+        self._conn.commit()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        events = []
+        try:
+            if self._pending_links or self._imported_keys:
+                # Stopped before finish(): still link the batches already committed
+                self.finish()
+            if self.notes:
+                # Too much changed to describe note by note: clients reload
+                with self._conn.begin():
+                    events = record_changes(self._conn, [{"type": "vault.reset"}])
+            if self._synchronous is not None:
+                self._conn.exec_driver_sql(f"PRAGMA synchronous = {int(self._synchronous)}")
+                self._conn.commit()
+        finally:
+            self._conn.close()
+            self._conn = None
+            # Caches are rebuilt from the database on next use
+            title_index.invalidate()
+            graph_cache.invalidate()
+            related_index.invalidate()
+            suggestions.suggestion_cache.clear()
+            suggestions.graph_changed()
+            vault_revision.invalidate()
+            change_feed.publish(events)
+
+    def add(self, records: Iterable[Dict]) -> int:
+        """Insert note records; returns how many were inserted.
+
+        A bad record raises ValueError once the records before it are in.
+        """
+        inserted = 0
+        batch: List[Dict] = []
+        try:
+            for record in records:
+                batch.append(self._row(record))
+                if len(batch) >= self.batch_size:
+                    full, batch = batch, []
+                    inserted += self._insert_notes(full)
+        finally:
+            if batch:
+                inserted += self._insert_notes(batch)
+        return inserted
+
+    def finish(self) -> Dict:
+        """Resolve the links of every imported note and report throughput"""
+        title_index.invalidate()
+        titles = {title for _, link_titles in self._pending_links for title in link_titles}
+        with Session(self.engine) as db:
+            resolved = title_index.resolve(titles, db)
+            # Keys are already normalized, so they resolve to themselves
+            claimable = title_index.resolve(self._imported_keys, db)
+        rows, dangling = [], []
+        for from_id, link_titles in self._pending_links:
+            targets = dict.fromkeys(resolved[t] for t in link_titles if t in resolved)
+            rows.extend({"from_note_id": from_id, "to_note_id": to_id} for to_id in targets)
+            dangling.extend(
+                {"from_note_id": from_id, "target_key": key, "target_title": title}
+                for key, title in dangling_targets(link_titles, resolved).items()
+            )
+        step = self.batch_size * 10
+        for start in range(0, len(rows), step):
+            with self._conn.begin():
+                self._conn.execute(insert(Link).prefix_with("OR IGNORE"), rows[start:start + step])
+        with self._conn.begin():
+            claimed = resolve_pending(self._conn, claimable)
+            for start in range(0, len(dangling), step):
+                record_unresolved(self._conn, dangling[start:start + step])
+        rows.extend({"from_note_id": from_id, "to_note_id": to_id} for from_id, to_id in claimed)
+        if rows:
+            with self._conn.begin():
+                refresh_degrees(self._conn, {row[key] for row in rows for key in ("from_note_id", "to_note_id")})
+        self.links = len(rows)
+        self.unresolved = len(dangling)
+        self._pending_links = []
+        self._imported_keys = set()
+        elapsed = time.perf_counter() - self._started
+        return {
+            "notes": self.notes,
+            "links": self.links,
+            "unresolved": self.unresolved,
+            "seconds": round(elapsed, 3),
+            "notes_per_sec": round(self.notes / elapsed, 1) if elapsed > 0 else None,
+        }
+
+    def run(self, records: Iterable[Dict]) -> Dict:
+        with self:
+            self.add(records)
+            return self.finish()
+
+    @staticmethod
+    def _row(record: Dict) -> Dict:
+        if not isinstance(record, dict):
+            raise ValueError("Every imported note must be an object")
+        title = (record.get("title") or "").strip()
+        if not title:
+            raise ValueError("Every imported note needs a title")
+        now = datetime.utcnow()
+        created = _parse_datetime(record.get("created_at")) or now
+        content = record.get("content") or ""
+        preview, word_count = summarize(content)
+        return {
+            "title": title,
+            "content": content,
+            "preview": preview,
+            "word_count": word_count,
+            "created_at": created,
+            "updated_at": _parse_datetime(record.get("updated_at")) or created,
+        }
+
+    def _insert_notes(self, rows: List[Dict]) -> int:
+        with self._conn.begin():
+            ids = self._conn.execute(
+                insert(Note).returning(Note.id, sort_by_parameter_order=True), rows
+            ).scalars().all()
+            add_tags(self._conn, [
+                {"note_id": note_id, "tag_name": tag}
+                for note_id, row in zip(ids, rows)
+                for tag in sorted(TagParser.extract_tags(row["content"]))
+            ])
+        self._imported_keys.update(normalize_title(row["title"]) for row in rows)
+        for note_id, row in zip(ids, rows):
+            link_titles = list(LinkParser.extract_links(row["content"]))
+            if link_titles:
+                self._pending_links.append((note_id, link_titles))
+        self.notes += len(ids)
+        return len(ids)
+
+def export_ndjson(engine: Engine = None, batch_size: int = 1000) -> Iterator[bytes]:
+    """Stream every note as one NDJSON line, in id order, a batch of rows at a time"""
+    engine = engine or default_engine
+    with engine.connect() as conn:
+        result = conn.execution_options(yield_per=batch_size).execute(
+            select(Note.id, Note.title, Note.content, Note.created_at, Note.updated_at).order_by(Note.id)
+        )
+        for rows in result.partitions():
+            yield b"".join(
+                (json.dumps({
+                    "id": row.id,
+                    "title": row.title,
+                    "content": row.content,
+                    "created_at": row.created_at.isoformat() if row.created_at else None,
+                    "updated_at": row.updated_at.isoformat() if row.updated_at else None,
+                }) + "\n").encode()
+                for row in rows
+            )
+
+def export_markdown(directory: Path, engine: Engine = None, batch_size: int = 1000) -> int:
+    """Write every note to `<title>.md` (id-suffixed on clashes); returns the number written"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    engine = engine or default_engine
+    used = set()
+    written = 0
+    with engine.connect() as conn:
+        result = conn.execution_options(yield_per=batch_size).execute(
+            select(Note.id, Note.title, Note.content).order_by(Note.id)
+        )
+        for row in result:
+            stem = "".join("_" if c in '/\\:*?"<>|' else c for c in row.title).strip() or f"Note {row.id}"
+            if stem.lower() in used:
+                stem = f"{stem} ({row.id})"
+            used.add(stem.lower())
+            (directory / f"{stem}.md").write_text(row.content, encoding="utf-8")
+            written += 1
+    return written
@@ -0,0 +1,221 @@
+import asyncio
+import logging
+import os
+import threading
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+from fastapi import WebSocket, WebSocketDisconnect
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from ..database import ChangeLog, Note
+from .note_fields import SUMMARY_FIELDS, columns, note_dict
+
+logger = logging.getLogger(__name__)
+
+# Changes kept for clients catching up with since=; older clients reload everything
+CHANGE_LOG_RETAIN = int(os.environ.get("FOCUSNEST_CHANGE_LOG_RETAIN", "50000"))
+PRUNE_EVERY = 1000
+# A catch-up spanning more changes than this is answered with a reset
+MAX_DELTA = 10000
+
+Event = Dict[str, object]
+
+def note_event(kind: str, note: Note) -> Event:
+    """note.created / note.updated, carrying the list view's fields"""
+    return {"type": kind, "id": note.id, "note": note_dict(note, SUMMARY_FIELDS)}
+
+def deleted_event(note_id: int) -> Event:
+    return {"type": "note.deleted", "id": note_id}
+
+def link_events(kind: str, pairs: Iterable[Tuple[int, int]]) -> List[Event]:
+    return [{"type": kind, "from": from_id, "to": to_id} for from_id, to_id in pairs]
+
+def record_changes(db: Union[Session, Connection], events: List[Event]) -> List[Event]:
+    """Append events to the change log in the caller's transaction; numbers them with `seq`"""
+    if not events:
+        return events
+    rows = [
+        {"kind": event["type"], "note_id": event.get("id", event.get("from")), "other_id": event.get("to")}
+        for event in events
+    ]
+    seqs = db.execute(insert(ChangeLog).returning(ChangeLog.id, sort_by_parameter_order=True), rows).scalars().all()
+    for event, seq in zip(events, seqs):
+        event["seq"] = seq
+    last = seqs[-1]
+    if last % PRUNE_EVERY < len(seqs):
+        db.execute(delete(ChangeLog).where(ChangeLog.id <= last - CHANGE_LOG_RETAIN))
+    return events
+
+def latest_seq(db: Session) -> int:
+    return db.scalar(select(func.max(ChangeLog.id))) or 0
+
+def changes_since(db: Session, since: int) -> Dict:
+    """Everything a client at `since` needs to catch up, coalesced to the net effect.
+
+    Returns the notes created or updated since (current list fields), the ids
+    deleted since, and the links created or deleted since; a deleted note
+    takes all of its links with it. `reset` means the log no longer reaches
+    back that far (or the vault was bulk-loaded): the client must reload.
+    """
+    latest = latest_seq(db)
+    oldest = db.scalar(select(func.min(ChangeLog.id)))
+    count = db.scalar(select(func.count(ChangeLog.id)).where(ChangeLog.id > since))
+    if since > latest or (oldest is not None and since < oldest - 1) or count > MAX_DELTA:
+        return {"seq": latest, "reset": True}
+    notes: Dict[int, str] = {}
+    links: Dict[Tuple[int, int], str] = {}
+    rows = db.execute(
+        select(ChangeLog.kind, ChangeLog.note_id, ChangeLog.other_id).where(ChangeLog.id > since).order_by(ChangeLog.id)
+    )
+    for kind, note_id, other_id in rows:
+        if kind == "vault.reset":
+            return {"seq": latest, "reset": True}
+        if kind.startswith("note."):
+            notes[note_id] = kind
+        else:
+            links[(note_id, other_id)] = kind
+    changed = [note_id for note_id, kind in notes.items() if kind != "note.deleted"]
+    current = db.execute(select(*columns(SUMMARY_FIELDS)).where(Note.id.in_(changed))).all() if changed else []
+    present = {row.id for row in current}
+    deleted = {note_id for note_id in notes if note_id not in present}
+    links = {pair: kind for pair, kind in links.items() if not deleted.intersection(pair)}
+    return {
+        "seq": latest,
+        "reset": False,
+        "notes": [note_dict(row, SUMMARY_FIELDS) for row in current],
+        # A note saved and then deleted since is simply gone
+        "deleted": sorted(deleted),
+        "links": {
+            "created": [[f, t] for (f, t), kind in links.items() if kind == "link.created"],
+            "deleted": [[f, t] for (f, t), kind in links.items() if kind == "link.deleted"],
+        },
+    }
+
+class _Subscriber:
+    """One socket's outgoing queue.
+
+    Pending events are keyed by what they are about, so a note saved ten
+    times while the client is slow is sent once, with its latest fields.
+    If the backlog still outgrows MAX_PENDING, or the vault was bulk-loaded,
+    it is dropped and the client is told to resync: it catches up with
+    GET /api/notes/changes?since= from the last seq it applied.
+    """
+
+    MAX_PENDING = 1000
+
+    def __init__(self):
+        self.pending: Dict[Tuple, Event] = {}
+        self.resync = False
+        self.wake = asyncio.Event()
+
+    def push(self, events: List[Event]):
+        for event in events:
+            if self.resync:
+                break
+            if event["type"] == "vault.reset":
+                self.resync = True
+                break
+            key = (event["type"].split(".")[0], event.get("id"), event.get("from"), event.get("to"))
+            previous = self.pending.pop(key, None)
+            if previous is not None and previous["type"] == "note.created" and event["type"] == "note.updated":
+                event = {**event, "type": "note.created"}
+            self.pending[key] = event
+        if self.resync or len(self.pending) > self.MAX_PENDING:
+            self.pending.clear()
+            self.resync = True
+        self.wake.set()
+
+    def take(self) -> Optional[Dict]:
+        self.wake.clear()
+        if self.resync:
+            self.resync = False
+            return {"type": "resync"}
+        if not self.pending:
+            return None
+        events = sorted(self.pending.values(), key=lambda event: event["seq"])
+        self.pending = {}
+        return {"type": "changes", "seq": events[-1]["seq"], "events": events}
+
+class ChangeFeed:
+    """Fans committed changes out to every connected /ws client.
+
+    Writers publish from the writer thread; delivery hops onto the event
+    loop. Each client gets its own queue and sender, so a slow socket only
+    ever delays itself, and messages carry every change gathered since the
+    previous send, not one frame per change.
+    """
+
+    SEND_TIMEOUT = 10.0
+
+    def __init__(self):
+        self._subscribers: Set[_Subscriber] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def publish(self, events: List[Event]):
+        """Queue committed events for every client; safe to call from any thread"""
+        if not events:
+            return
+        with self._lock:
+            loop = self._loop if self._subscribers else None
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._dispatch, events)
+
+    def _dispatch(self, events: List[Event]):
+        for subscriber in list(self._subscribers):
+            subscriber.push(events)
+
+    async def serve(self, websocket: WebSocket, load_seq: Callable[[], Awaitable[int]]):
+        """Run one client connection until it closes"""
+        await websocket.accept()
+        subscriber = _Subscriber()
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            self._subscribers.add(subscriber)
+        try:
+            # Read only once subscribed: whatever commits after this read is
+            # published to the socket, everything up to it is covered by the
+            # seq, which the client catches up from with GET /api/notes/changes?since=
+            await websocket.send_json({"type": "hello", "seq": await load_seq()})
+            tasks = {
+                asyncio.create_task(self._receive(websocket)),
+                asyncio.create_task(self._send(websocket, subscriber)),
+            }
+            _, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in pending:
+                task.cancel()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            with self._lock:
+                self._subscribers.discard(subscriber)
+
+    @staticmethod
+    async def _receive(websocket: WebSocket):
+        # Nothing is expected from clients; reading notices the disconnect.
+        # Raw frames, so a binary frame is dropped like a text one
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+
+    async def _send(self, websocket: WebSocket, subscriber: _Subscriber):
+        while True:
+            await subscriber.wake.wait()
+            message = subscriber.take()
+            if message is None:
+                continue
+            try:
+                await asyncio.wait_for(websocket.send_json(message), self.SEND_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.info("Closing a change feed client that stopped reading")
+                await websocket.close(code=1013)
+                return
+            except Exception:
+                return
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+change_feed = ChangeFeed()
@@ -0,0 +1,356 @@
+import asyncio
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+import numpy as np
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from ..database import ChangeLog, Note, NoteRanking
+from .graph_cache import graph_cache
+from .graph_csr import CSRGraph
+from .http_cache import vault_revision
+from .workers import run_analytics, run_write
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_INTERVAL = float(os.environ.get("FOCUSNEST_ANALYTICS_INTERVAL", "900"))
+
+PAGERANK_DAMPING = 0.85
+PAGERANK_TOLERANCE = 1e-8
+PAGERANK_MAX_ITER = 100
+LPA_MAX_ITER = 30
+# Label propagation stops once fewer than this share of notes change label in a round
+LPA_SETTLED = 0.001
+# Rankings rows written per writer-thread transaction
+PERSIST_CHUNK = 2000
+# Change log entries that can move the rankings (a title edit cannot)
+GRAPH_CHANGES = ("note.created", "note.deleted", "link.created", "link.deleted", "vault.reset")
+
+def _edge_rows(graph: CSRGraph) -> np.ndarray:
+    """Row of every stored adjacency entry, aligned with graph.indices"""
+    return np.repeat(np.arange(len(graph.ids), dtype=np.int64), graph.degree)
+
+def _number_by_size(labels: np.ndarray) -> np.ndarray:
+    """Renumber labels 0, 1, ... from the largest group down (ties by smallest label)"""
+    if len(labels) == 0:
+        return labels.astype(np.int32)
+    _, inverse, counts = np.unique(labels, return_inverse=True, return_counts=True)
+    order = np.argsort(-counts, kind="stable")
+    number = np.empty(len(counts), dtype=np.int32)
+    number[order] = np.arange(len(counts), dtype=np.int32)
+    return number[inverse.reshape(-1)]
+
+def pagerank(graph: CSRGraph, damping: float = PAGERANK_DAMPING, tolerance: float = PAGERANK_TOLERANCE,
+             max_iter: int = PAGERANK_MAX_ITER) -> np.ndarray:
+    """PageRank of every row by power iteration over the CSR arrays.
+
+    Links are walked both ways, weighted by strength, as in
+    nx.pagerank(graph, weight="strength"). Notes without links spread their
+    score evenly over all notes. Sums to 1.
+    """
+    n = len(graph.ids)
+    if n == 0:
+        return np.zeros(0)
+    rows = _edge_rows(graph)
+    weights = graph.strength.astype(np.float64)
+    out = np.bincount(rows, weights=weights, minlength=n)
+    dangling = out == 0
+    out[dangling] = 1.0
+    scores = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        share = scores / out
+        spread = np.bincount(graph.indices, weights=share[rows] * weights, minlength=n)
+        updated = damping * spread + (damping * scores[dangling].sum() + 1.0 - damping) / n
+        error = np.abs(updated - scores).sum()
+        scores = updated
+        if error < n * tolerance:
+            break
+    return scores
+
+def connected_components(graph: CSRGraph) -> np.ndarray:
+    """Connected component of every row, numbered by size.
+
+    Each round every row takes the smallest label among itself and its
+    neighbors, the old label's holder is pulled along, and pointer jumping
+    flattens the chains, so it settles in a few rounds rather than one per hop.
+    """
+    n = len(graph.ids)
+    labels = np.arange(n, dtype=np.int64)
+    if n == 0 or len(graph.indices) == 0:
+        return _number_by_size(labels)
+    has_edges = graph.degree > 0
+    starts = graph.indptr[:-1][has_edges]
+    while True:
+        smallest = labels.copy()
+        smallest[has_edges] = np.minimum(labels[has_edges], np.minimum.reduceat(labels[graph.indices], starts))
+        np.minimum.at(smallest, labels, smallest)
+        while True:
+            jumped = smallest[smallest]
+            if np.array_equal(jumped, smallest):
+                break
+            smallest = jumped
+        if np.array_equal(smallest, labels):
+            return _number_by_size(labels)
+        labels = smallest
+
+def label_propagation(graph: CSRGraph, seed: int = 0, max_iter: int = LPA_MAX_ITER) -> np.ndarray:
+    """Communities by label propagation, numbered by size.
+
+    Every note adopts the label carrying the most link strength among its
+    neighbors, keeping its own on a tie and breaking other ties at random.
+    Half the notes, picked at random, update per round, which keeps two
+    groups from swapping labels back and forth forever.
+    """
+    n = len(graph.ids)
+    labels = np.arange(n, dtype=np.int64)
+    if n == 0 or len(graph.indices) == 0:
+        return _number_by_size(labels)
+    rng = np.random.default_rng(seed)
+    rows = _edge_rows(graph)
+    weights = graph.strength.astype(np.float64)
+    for _ in range(max_iter):
+        # Total strength per (row, neighbor label) pair
+        keys, inverse = np.unique(rows * n + labels[graph.indices], return_inverse=True)
+        strength = np.bincount(inverse.reshape(-1), weights=weights)
+        key_rows, key_labels = keys // n, keys % n
+        # Strengths are whole numbers: the bonus and jitter only ever decide ties
+        score = strength + 0.6 * (key_labels == labels[key_rows]) + 0.3 * rng.random(len(keys))
+        order = np.lexsort((-score, key_rows))
+        first = order[np.r_[True, key_rows[order][1:] != key_rows[order][:-1]]]
+        best = labels.copy()
+        best[key_rows[first]] = key_labels[first]
+        # Settled once (almost) no note wants another label, whichever half moved
+        pending = best != labels
+        if pending.sum() <= LPA_SETTLED * n:
+            break
+        changed = pending & (rng.random(n) < 0.5)
+        labels[changed] = best[changed]
+    return _number_by_size(labels)
+
+class GraphRankings:
+    """The latest analytics results, kept in memory next to their table.
+
+    Lookups go through the sorted id array, so a score costs a binary search
+    and no query. `version` is the graph cache version the scores were
+    computed from; anything newer means they lag behind some writes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = False
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.pagerank = np.zeros(0)
+        self.community = np.zeros(0, dtype=np.int32)
+        self.component = np.zeros(0, dtype=np.int32)
+        self.version: Optional[int] = None
+        self.computed_at: Optional[datetime] = None
+
+    @property
+    def available(self) -> bool:
+        return self.computed_at is not None
+
+    def compute(self, db: Session) -> Dict:
+        """Run the analytics on the current graph; returns the rows to persist"""
+        # Taken before the graph is read: any change logged after it may be missing
+        computed_at = datetime.utcnow()
+        version = graph_cache.version
+        graph = graph_cache.csr(db)
+        scores = pagerank(graph)
+        communities = label_propagation(graph)
+        components = connected_components(graph)
+        with self._lock:
+            self.ids, self.pagerank = graph.ids, scores
+            self.community, self.component = communities, components
+            self.version, self.computed_at = version, computed_at
+            self._loaded = True
+        return {
+            "computed_at": computed_at,
+            "rows": [
+                {"note_id": note_id, "pagerank": score, "community": community,
+                 "component": component, "computed_at": computed_at}
+                for note_id, score, community, component in zip(
+                    graph.ids.tolist(), scores.tolist(), communities.tolist(), components.tolist()
+                )
+            ],
+        }
+
+    def ensure_loaded(self, db: Session):
+        """Pick up the persisted results of an earlier run after a restart"""
+        with self._lock:
+            if self._loaded:
+                return
+            rows = db.execute(select(
+                NoteRanking.note_id, NoteRanking.pagerank, NoteRanking.community,
+                NoteRanking.component, NoteRanking.computed_at,
+            ).order_by(NoteRanking.note_id)).all()
+            if rows:
+                self.ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+                self.pagerank = np.fromiter((r[1] for r in rows), dtype=np.float64, count=len(rows))
+                self.community = np.fromiter((r[2] for r in rows), dtype=np.int32, count=len(rows))
+                self.component = np.fromiter((r[3] for r in rows), dtype=np.int32, count=len(rows))
+                self.computed_at = max(r[4] for r in rows)
+            self._loaded = True
+
+    def adopt_persisted(self, db: Session) -> bool:
+        """After a restart: take the stored results as current if no note or link changed since"""
+        graph_cache.ensure_loaded(db)
+        version = graph_cache.version
+        self.ensure_loaded(db)
+        if not self.available or graph_changed_since(db, self.computed_at):
+            return False
+        with self._lock:
+            self.version = version
+        return True
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded = False
+
+    def scores(self, note_ids) -> Dict[int, Dict]:
+        """{id: {"pagerank", "community", "component"}} for the ids that have been scored"""
+        with self._lock:
+            ids, pagerank, community, component = self.ids, self.pagerank, self.community, self.component
+        wanted = np.asarray(list(note_ids), dtype=np.int64)
+        if len(ids) == 0 or len(wanted) == 0:
+            return {}
+        rows = np.minimum(np.searchsorted(ids, wanted), len(ids) - 1)
+        found = ids[rows] == wanted
+        return {
+            note_id: {"pagerank": score, "community": group, "component": part}
+            for note_id, score, group, part in zip(
+                wanted[found].tolist(), pagerank[rows[found]].tolist(),
+                community[rows[found]].tolist(), component[rows[found]].tolist(),
+            )
+        }
+
+    def weights(self, note_ids: np.ndarray) -> Optional[np.ndarray]:
+        """PageRank scaled so an average note weighs 1; None until the first run"""
+        with self._lock:
+            ids, pagerank = self.ids, self.pagerank
+        if len(ids) == 0:
+            return None
+        rows = np.minimum(np.searchsorted(ids, note_ids), len(ids) - 1)
+        scaled = pagerank[rows] * len(ids)
+        # Notes created since the last run count as average
+        return np.where(ids[rows] == note_ids, scaled, 1.0)
+
+graph_rankings = GraphRankings()
+
+def graph_changed_since(db: Session, moment: datetime) -> bool:
+    """Whether the change log shows a note or link change after `moment`"""
+    oldest_id, oldest_at = db.execute(
+        select(ChangeLog.id, ChangeLog.created_at).order_by(ChangeLog.id).limit(1)
+    ).first() or (None, None)
+    # Pruned past `moment`: whatever happened in between is unknown
+    if oldest_id is not None and oldest_id > 1 and oldest_at > moment:
+        return True
+    return db.scalar(
+        select(ChangeLog.id).where(ChangeLog.created_at > moment, ChangeLog.kind.in_(GRAPH_CHANGES)).limit(1)
+    ) is not None
+
+def persist_rows(db: Session, rows: List[Dict]):
+    """Upsert one chunk of a run's rows"""
+    if rows:
+        statement = insert(NoteRanking)
+        db.execute(statement.on_conflict_do_update(
+            index_elements=[NoteRanking.note_id],
+            set_={name: statement.excluded[name] for name in ("pagerank", "community", "component", "computed_at")},
+        ), rows)
+    db.commit()
+
+def finish_persist(db: Session):
+    """Drop rankings of notes deleted while a run was being written, and publish the run"""
+    db.execute(delete(NoteRanking).where(NoteRanking.note_id.not_in(select(Note.id))))
+    db.commit()
+    vault_revision.derived_changed()
+
+def persist(db: Session, result: Dict):
+    """Store one run's rows in a single session (benchmarks, scripts)"""
+    rows = result["rows"]
+    for start in range(0, len(rows), PERSIST_CHUNK):
+        persist_rows(db, rows[start:start + PERSIST_CHUNK])
+    finish_persist(db)
+
+async def refresh(force: bool = False) -> Optional[Dict]:
+    """Recompute on the analytics pool and store on the writer thread; skipped if the graph is unchanged.
+
+    After a restart the stored results are reused unless notes or links
+    changed since they were computed. Rows are written in chunks, each its
+    own writer-thread job, so note writes queue behind one chunk at most.
+    """
+    if not force:
+        if graph_rankings.version is None:
+            await run_analytics(graph_rankings.adopt_persisted)
+        if graph_rankings.available and graph_rankings.version == graph_cache.version:
+            return None
+    result = await run_analytics(graph_rankings.compute)
+    rows = result["rows"]
+    for start in range(0, len(rows), PERSIST_CHUNK):
+        chunk = rows[start:start + PERSIST_CHUNK]
+        await run_write(lambda db: persist_rows(db, chunk))
+    await run_write(finish_persist)
+    return {"notes": len(rows), "computed_at": result["computed_at"].isoformat()}
+
+def rankings_query(limit: int = 50, offset: int = 0, community: Optional[int] = None):
+    """Scored notes that still exist, highest PageRank first"""
+    query = (
+        select(Note.id, Note.title, Note.in_degree + Note.out_degree,
+               NoteRanking.pagerank, NoteRanking.community, NoteRanking.component)
+        .join(Note, Note.id == NoteRanking.note_id)
+        .order_by(NoteRanking.pagerank.desc(), NoteRanking.note_id)
+        .limit(limit)
+        .offset(offset)
+    )
+    if community is not None:
+        query = query.where(NoteRanking.community == community)
+    return query
+
+def communities_query(limit: int = 50, offset: int = 0):
+    """Communities with their size, largest first"""
+    return (
+        select(NoteRanking.community, func.count().label("size"))
+        .group_by(NoteRanking.community)
+        .order_by(func.count().desc(), NoteRanking.community)
+        .limit(limit)
+        .offset(offset)
+    )
+
+def ranking_rows(rows) -> List[Dict]:
+    return [
+        {"id": row[0], "title": row[1], "degree": row[2], "pagerank": row[3],
+         "community": row[4], "component": row[5]}
+        for row in rows
+    ]
+
+class AnalyticsScheduler:
+    """Recomputes the graph rankings in the background whenever the graph has changed"""
+
+    def __init__(self, interval: float = ANALYTICS_INTERVAL):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def _loop(self):
+        while True:
+            try:
+                await refresh()
+            except Exception:
+                logger.exception("Graph analytics failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+analytics_scheduler = AnalyticsScheduler()
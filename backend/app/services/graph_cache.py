@@ -0,0 +1,146 @@
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+import networkx as nx
+from sqlalchemy.orm import Session
+from ..database import Note, Link
+from .graph_csr import CSRGraph
+
+class GraphCache:
+    """Process-wide undirected link graph, built once and patched on every note write.
+
+    Nodes carry only the note title. `version` increases on every change so
+    readers can tell whether anything they derived from the graph is stale.
+    All access goes through the same lock, so readers never see a half-applied write.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._graph = nx.Graph()
+        # Directed link rows (from -> {to: strength}); an undirected edge lives
+        # as long as at least one direction does.
+        self._outgoing: Dict[int, Dict[int, int]] = {}
+        self._loaded = False
+        self._csr: Optional[CSRGraph] = None
+        self._csr_version = -1
+        self._memo: Dict[object, object] = {}
+        self._memo_version = -1
+        self.version = 0
+
+    @classmethod
+    def from_graph(cls, graph: nx.Graph) -> "GraphCache":
+        """Cache pre-populated with an existing graph (benchmarks, offline analysis)"""
+        cache = cls()
+        cache._graph = graph
+        cache._outgoing = {}
+        for u, v, strength in graph.edges(data="strength", default=1):
+            cache._outgoing.setdefault(u, {})[v] = strength
+        cache._loaded = True
+        return cache
+
+    def _load(self, db: Session):
+        graph = nx.Graph()
+        outgoing: Dict[int, Dict[int, int]] = {}
+        for note_id, title in db.query(Note.id, Note.title):
+            graph.add_node(note_id, title=title)
+        for from_id, to_id, strength in db.query(Link.from_note_id, Link.to_note_id, Link.strength):
+            strength = strength if strength is not None else 1
+            outgoing.setdefault(from_id, {})[to_id] = strength
+            if graph.has_edge(from_id, to_id):
+                strength = max(strength, graph[from_id][to_id]["strength"])
+            graph.add_edge(from_id, to_id, strength=strength)
+        self._graph = graph
+        self._outgoing = outgoing
+        self._loaded = True
+        self.version += 1
+
+    def ensure_loaded(self, db: Session):
+        with self._lock:
+            if not self._loaded:
+                self._load(db)
+
+    def invalidate(self):
+        """Drop the graph; it is rebuilt from the database on next use"""
+        with self._lock:
+            self._loaded = False
+            self._graph = nx.Graph()
+            self._outgoing = {}
+            self.version += 1
+
+    @contextmanager
+    def read(self, db: Session) -> Iterator[nx.Graph]:
+        """Hold the cache lock and yield the live graph; do not mutate or keep it"""
+        with self._lock:
+            if not self._loaded:
+                self._load(db)
+            yield self._graph
+
+    def csr(self, db: Session) -> CSRGraph:
+        """Compact array copy of the graph, rebuilt lazily after the graph changes"""
+        with self._lock:
+            if not self._loaded:
+                self._load(db)
+            if self._csr is None or self._csr_version != self.version:
+                self._csr = CSRGraph.from_networkx(self._graph)
+                self._csr_version = self.version
+            return self._csr
+
+    def memoize(self, key, compute: Callable[[], object]):
+        """Return compute() cached until the graph next changes"""
+        with self._lock:
+            if self._memo_version != self.version:
+                self._memo = {}
+                self._memo_version = self.version
+            if key not in self._memo:
+                self._memo[key] = compute()
+            return self._memo[key]
+
+    def note_saved(self, note_id: int, title: str, outgoing: Optional[Dict[int, int]] = None):
+        """Record a created/updated note and, if given, its complete set of outgoing links"""
+        with self._lock:
+            if not self._loaded:
+                return
+            self._graph.add_node(note_id, title=title)
+            if outgoing is not None:
+                previous = self._outgoing.pop(note_id, {})
+                if outgoing:
+                    self._outgoing[note_id] = dict(outgoing)
+                for to_id in previous.keys() | outgoing.keys():
+                    self._sync_edge(note_id, to_id)
+            self.version += 1
+
+    def links_added(self, pairs: Iterable[Tuple[int, int]]):
+        """Record new (from, to) links between notes already in the graph"""
+        with self._lock:
+            if not self._loaded:
+                return
+            for from_id, to_id in pairs:
+                self._outgoing.setdefault(from_id, {}).setdefault(to_id, 1)
+                self._sync_edge(from_id, to_id)
+            self.version += 1
+
+    def note_deleted(self, note_id: int):
+        with self._lock:
+            if not self._loaded:
+                return
+            self._outgoing.pop(note_id, None)
+            if note_id in self._graph:
+                for neighbor in self._graph.neighbors(note_id):
+                    targets = self._outgoing.get(neighbor)
+                    if targets is not None:
+                        targets.pop(note_id, None)
+                self._graph.remove_node(note_id)
+            self.version += 1
+
+    def _sync_edge(self, u: int, v: int):
+        """Make the undirected edge u-v reflect the link rows in either direction"""
+        strengths = [
+            s for s in (self._outgoing.get(u, {}).get(v), self._outgoing.get(v, {}).get(u))
+            if s is not None
+        ]
+        if strengths:
+            self._graph.add_edge(u, v, strength=max(strengths))
+        elif self._graph.has_edge(u, v):
+            self._graph.remove_edge(u, v)
+
+graph_cache = GraphCache()
@@ -1,76 +1,201 @@
+import os
+from collections import Counter
 import networkx as nx
-from typing import List, Dict, Tuple
+import numpy as np
+from typing import List, Dict, Optional, Tuple
 from sqlalchemy.orm import Session
-from ..database import Note, Link
+from .graph_analytics import graph_rankings
+from .graph_cache import GraphCache, graph_cache
 
 class GraphEngine:
-    def __init__(self, db: Session):
+    # "networkx" walks the cached dict-of-dicts graph; "csr" runs the same
+    # queries as vectorized NumPy operations on a compact array copy of it.
+    BACKENDS = ("networkx", "csr")
+    DEFAULT_BACKEND = os.environ.get("FOCUSNEST_GRAPH_BACKEND", "networkx")
+    
+    def __init__(self, db: Session, backend: str = None, cache: GraphCache = None):
         self.db = db
-        self.graph = nx.Graph()
-        self._build_graph()
+        self.cache = cache or graph_cache
+        self.backend = backend or self.DEFAULT_BACKEND
+        if self.backend not in self.BACKENDS:
+            raise ValueError(f"Unknown graph backend: {self.backend}")
+        self.cache.ensure_loaded(db)
     
-    def _build_graph(self):
-        """Build NetworkX graph from database"""
-        # Add nodes
-        notes = self.db.query(Note).all()
-        for note in notes:
-            self.graph.add_node(note.id, title=note.title, content=note.content)
-        
-        # Add edges
-        links = self.db.query(Link).all()
-        for link in links:
-            self.graph.add_edge(link.from_note_id, link.to_note_id, strength=link.strength)
+    @property
+    def version(self) -> int:
+        return self.cache.version
     
     def get_connected_notes(self, note_id: int) -> List[int]:
         """Get all notes connected to given note"""
-        if note_id in self.graph:
-            return list(self.graph.neighbors(note_id))
+        if self.backend == "csr":
+            return self.cache.csr(self.db).neighbors(note_id)
+        with self.cache.read(self.db) as graph:
+            if note_id in graph:
+                return list(graph.neighbors(note_id))
         return []
     
     def get_orphan_notes(self) -> List[int]:
         """Find notes with no connections"""
-        return [node for node in self.graph.nodes() if self.graph.degree(node) == 0]
+        if self.backend == "csr":
+            return self.cache.csr(self.db).orphans()
+        with self.cache.read(self.db) as graph:
+            return [node for node, degree in graph.degree() if degree == 0]
     
     def get_central_nodes(self, limit: int = 10) -> List[Tuple[int, float]]:
         """Get most connected notes"""
-        centrality = nx.degree_centrality(self.graph)
+        if self.backend == "csr":
+            return self.cache.csr(self.db).central(limit)
+        with self.cache.read(self.db) as graph:
+            centrality = nx.degree_centrality(graph)
         sorted_nodes = sorted(centrality.items(), key=lambda x: x[1], reverse=True)
         return sorted_nodes[:limit]
     
     def suggest_connections(self, note_id: int, limit: int = 5) -> List[int]:
         """Suggest notes that might be related"""
-        if note_id not in self.graph:
-            return []
-        
-        # Get neighbors of neighbors (2-hop connections)
-        suggestions = []
-        neighbors = set(self.graph.neighbors(note_id))
+        if self.backend == "csr":
+            return self.cache.csr(self.db).two_hop(note_id, limit)
+        with self.cache.read(self.db) as graph:
+            if note_id not in graph:
+                return []
+            
+            # Neighbors of neighbors, ranked by shared neighbors like the CSR backend
+            neighbors = set(graph.neighbors(note_id))
+            shared = Counter()
+            for neighbor in neighbors:
+                shared.update(set(graph.neighbors(neighbor)) - neighbors - {note_id})
         
-        for neighbor in neighbors:
-            second_hop = set(self.graph.neighbors(neighbor))
-            suggestions.extend(second_hop - neighbors - {note_id})
-        
-        # Remove duplicates and limit results
-        unique_suggestions = list(set(suggestions))
-        return unique_suggestions[:limit]
+        ranked = sorted(shared.items(), key=lambda item: (-item[1], item[0]))
+        return [other for other, _ in ranked[:limit]]
     
     def get_graph_data(self) -> Dict:
-        """Export graph data for visualization"""
-        nodes = []
-        for node_id in self.graph.nodes():
-            node_data = self.graph.nodes[node_id]
-            nodes.append({
-                "id": node_id,
-                "title": node_data.get("title", f"Note {node_id}"),
-                "connections": self.graph.degree(node_id)
-            })
+        """Export graph data for visualization, with PageRank and community for colouring once computed"""
+        graph_rankings.ensure_loaded(self.db)
+        with self.cache.read(self.db) as graph:
+            nodes = [
+                {
+                    "id": node_id,
+                    "title": data.get("title", f"Note {node_id}"),
+                    "connections": graph.degree(node_id)
+                }
+                for node_id, data in graph.nodes(data=True)
+            ]
+            links = [
+                {"source": u, "target": v, "strength": data.get("strength", 1)}
+                for u, v, data in graph.edges(data=True)
+            ]
+            version = self.cache.version
+        
+        scores = graph_rankings.scores(node["id"] for node in nodes)
+        for node in nodes:
+            node.update(scores.get(node["id"], ()))
+        return {"nodes": nodes, "links": links, "version": version}
+
+    def get_titles(self, note_ids) -> Dict[int, str]:
+        with self.cache.read(self.db) as graph:
+            return {
+                note_id: graph.nodes[note_id].get("title", f"Note {note_id}")
+                for note_id in note_ids if note_id in graph
+            }
+    
+    def get_ego_network(self, note_id: int, depth: int = 2, max_nodes: int = 200) -> Optional[Dict]:
+        """Notes within `depth` hops of a note, best-connected first once the budget is hit"""
+        with self.cache.read(self.db) as graph:
+            if note_id not in graph:
+                return None
+            hops = {note_id: 0}
+            frontier = [note_id]
+            truncated = False
+            for level in range(1, depth + 1):
+                candidates = {n for node in frontier for n in graph.neighbors(node) if n not in hops}
+                if not candidates:
+                    break
+                room = max_nodes - len(hops)
+                if len(candidates) > room:
+                    candidates = sorted(candidates, key=graph.degree, reverse=True)[:room]
+                    truncated = True
+                for n in candidates:
+                    hops[n] = level
+                frontier = list(candidates)
+                if truncated:
+                    break
+            nodes = [
+                {
+                    "id": n,
+                    "title": graph.nodes[n].get("title", f"Note {n}"),
+                    "connections": graph.degree(n),
+                    "depth": d,
+                }
+                for n, d in hops.items()
+            ]
+            links = [
+                {"source": u, "target": v, "strength": data.get("strength", 1)}
+                for u, v, data in graph.subgraph(hops).edges(data=True)
+            ]
+            version = self.cache.version
+        return {"center": note_id, "nodes": nodes, "links": links, "truncated": truncated, "version": version}
+    
+    def get_overview(self, top: int = 100) -> Dict:
+        """Top notes by degree; every other note is folded into a cluster around its nearest top note"""
+        return self.cache.memoize(("overview", top), lambda: self._build_overview(top))
+    
+    def _build_overview(self, top: int) -> Dict:
+        csr = self.cache.csr(self.db)
+        n = len(csr.ids)
+        top_rows = np.argsort(-csr.degree, kind="stable")[:top]
+        k = len(top_rows)
+        labels = csr.nearest_sources(top_rows)
+        # Display group per row: 0..k-1 the top notes themselves, k..2k-1 the
+        # cluster hanging off top note i, 2k everything not reachable from any.
+        groups = np.where(labels >= 0, labels + k, 2 * k)
+        groups[top_rows] = np.arange(k)
         
-        links = []
-        for edge in self.graph.edges(data=True):
-            links.append({
-                "source": edge[0],
-                "target": edge[1],
-                "strength": edge[2].get("strength", 1)
-            })
+        sources, targets, _ = csr.edges_in_rows(0, n)
+        pairs = np.sort(np.stack([groups[np.searchsorted(csr.ids, sources)],
+                                  groups[np.searchsorted(csr.ids, targets)]], axis=1), axis=1)
+        pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+        pairs, counts = np.unique(pairs, axis=0, return_counts=True)
+        sizes = np.bincount(groups, minlength=2 * k + 1)
         
-        return {"nodes": nodes, "links": links}
+        top_ids = csr.ids[top_rows].tolist()
+        titles = self.get_titles(top_ids)
+        
+        def group_id(g: int):
+            if g < k:
+                return top_ids[g]
+            return f"cluster-{top_ids[g - k]}" if g < 2 * k else "cluster-unlinked"
+        
+        nodes = [
+            {"id": note_id, "title": titles.get(note_id, f"Note {note_id}"),
+             "connections": int(csr.degree[row]), "type": "note"}
+            for note_id, row in zip(top_ids, top_rows.tolist())
+        ]
+        for g in range(k, 2 * k + 1):
+            if sizes[g]:
+                label = f"{sizes[g]} notes near {titles.get(top_ids[g - k], '')}" if g < 2 * k else f"{sizes[g]} unlinked notes"
+                nodes.append({"id": group_id(g), "title": label, "connections": 0, "type": "cluster", "size": int(sizes[g])})
+        links = [
+            {"source": group_id(a), "target": group_id(b), "strength": int(c)}
+            for (a, b), c in zip(pairs.tolist(), counts.tolist())
+        ]
+        return {"nodes": nodes, "links": links, "total_nodes": n, "version": self.cache.version}
+    
+    def get_nodes_page(self, after_id: int = 0, limit: int = 500) -> Dict:
+        """Nodes in id order after `after_id`, with their links to nodes already paged in"""
+        csr = self.cache.csr(self.db)
+        start = int(np.searchsorted(csr.ids, after_id, side="right"))
+        stop = min(start + limit, len(csr.ids))
+        page_ids = csr.ids[start:stop].tolist()
+        titles = self.get_titles(page_ids)
+        sources, targets, strength = csr.edges_in_rows(start, stop)
+        return {
+            "nodes": [
+                {"id": note_id, "title": titles.get(note_id, f"Note {note_id}"), "connections": int(degree)}
+                for note_id, degree in zip(page_ids, csr.degree[start:stop].tolist())
+            ],
+            "links": [
+                {"source": u, "target": v, "strength": int(w)}
+                for u, v, w in zip(sources.tolist(), targets.tolist(), strength.tolist())
+            ],
+            "next_after_id": page_ids[-1] if stop < len(csr.ids) else None,
+            "version": self.cache.version,
+        }
@@ -0,0 +1,127 @@
+import json
+import struct
+from typing import Dict, Iterator
+import numpy as np
+from ..database import SessionLocal, Note
+from .graph_cache import GraphCache, graph_cache
+
+class GraphExporter:
+    """Stream the cached graph in bounded chunks.
+
+    Works from the immutable CSR snapshot of the graph cache, so the cache
+    lock is not held while bytes go out, and fetches titles per chunk of
+    node ids with its own session. Extra memory stays at one chunk however
+    large the vault is.
+
+    Binary layout (little-endian):
+        magic b"FNGB", uint32 format, uint32 graph version, uint32 node count, uint32 link count
+        int32[nodes] ids, int32[nodes] connections,
+        int32[links] source ids, int32[links] target ids, float32[links] strength,
+        then the node titles as UTF-8, NUL-separated, in id order, up to the end of the stream.
+    """
+
+    CHUNK_NODES = 4096
+    BINARY_MAGIC = b"FNGB"
+    BINARY_FORMAT = 1
+    MEDIA_TYPES = {
+        "ndjson": "application/x-ndjson",
+        "json": "application/json",
+        "binary": "application/octet-stream",
+    }
+
+    def __init__(self, cache: GraphCache = None):
+        self.cache = cache or graph_cache
+        with SessionLocal() as db:
+            self.version = self.cache.version
+            self.csr = self.cache.csr(db)
+        # Every undirected edge (self-loops included) is stored twice in the CSR arrays
+        self.link_count = len(self.csr.indices) // 2
+
+    def _chunks(self) -> Iterator[slice]:
+        for start in range(0, len(self.csr.ids), self.CHUNK_NODES):
+            yield slice(start, min(start + self.CHUNK_NODES, len(self.csr.ids)))
+
+    def _titles(self, ids: np.ndarray) -> Dict[int, str]:
+        if len(ids) == 0:
+            return {}
+        with SessionLocal() as db:
+            rows = db.query(Note.id, Note.title).filter(Note.id.between(int(ids[0]), int(ids[-1])))
+            return dict(rows.all())
+
+    def _link_chunk(self, nodes: slice):
+        return self.csr.edges_in_rows(nodes.start, nodes.stop)
+
+    def iter_ndjson(self) -> Iterator[bytes]:
+        yield self._json_line({"type": "meta", "version": self.version, "nodes": len(self.csr.ids), "links": self.link_count})
+        for nodes in self._chunks():
+            ids = self.csr.ids[nodes]
+            titles = self._titles(ids)
+            yield b"".join(
+                self._json_line({"type": "node", "id": note_id, "title": titles.get(note_id, ""), "connections": degree})
+                for note_id, degree in zip(ids.tolist(), self.csr.degree[nodes].tolist())
+            )
+        for nodes in self._chunks():
+            sources, targets, strength = self._link_chunk(nodes)
+            yield b"".join(
+                self._json_line({"type": "link", "source": s, "target": t, "strength": w})
+                for s, t, w in zip(sources.tolist(), targets.tolist(), self._strengths(strength))
+            )
+
+    def iter_json(self) -> Iterator[bytes]:
+        """Same document as /api/graph/, written incrementally"""
+        yield f'{{"version":{self.version},"nodes":['.encode()
+        first = True
+        for nodes in self._chunks():
+            ids = self.csr.ids[nodes]
+            titles = self._titles(ids)
+            items = [
+                json.dumps({"id": note_id, "title": titles.get(note_id, ""), "connections": degree})
+                for note_id, degree in zip(ids.tolist(), self.csr.degree[nodes].tolist())
+            ]
+            if items:
+                yield (("" if first else ",") + ",".join(items)).encode()
+                first = False
+        yield b'],"links":['
+        first = True
+        for nodes in self._chunks():
+            sources, targets, strength = self._link_chunk(nodes)
+            items = [
+                json.dumps({"source": s, "target": t, "strength": w})
+                for s, t, w in zip(sources.tolist(), targets.tolist(), self._strengths(strength))
+            ]
+            if items:
+                yield (("" if first else ",") + ",".join(items)).encode()
+                first = False
+        yield b"]}"
+
+    def iter_binary(self) -> Iterator[bytes]:
+        yield self.BINARY_MAGIC + struct.pack(
+            "<IIII", self.BINARY_FORMAT, self.version, len(self.csr.ids), self.link_count
+        )
+        for nodes in self._chunks():
+            yield self.csr.ids[nodes].astype("<i4").tobytes()
+        for nodes in self._chunks():
+            yield self.csr.degree[nodes].astype("<i4").tobytes()
+        for column in range(3):
+            dtype = "<f4" if column == 2 else "<i4"
+            for nodes in self._chunks():
+                yield self._link_chunk(nodes)[column].astype(dtype).tobytes()
+        first = True
+        for nodes in self._chunks():
+            ids = self.csr.ids[nodes]
+            titles = self._titles(ids)
+            block = "\0".join(titles.get(note_id, "").replace("\0", "") for note_id in ids.tolist())
+            yield (("" if first else "\0") + block).encode("utf-8")
+            first = False
+
+    def stream(self, fmt: str) -> Iterator[bytes]:
+        return {"ndjson": self.iter_ndjson, "json": self.iter_json, "binary": self.iter_binary}[fmt]()
+
+    @staticmethod
+    def _strengths(strength: np.ndarray):
+        # Strengths are whole numbers in the database; keep them ints in JSON
+        return [int(w) if w.is_integer() else w for w in strength.tolist()]
+
+    @staticmethod
+    def _json_line(obj: Dict) -> bytes:
+        return (json.dumps(obj) + "\n").encode()
@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Tuple
+from fastapi import Request, Response
+from .ttl_cache import TTLCache
+
+RESPONSE_CACHE_SIZE = int(os.environ.get("FOCUSNEST_RESPONSE_CACHE_SIZE", "64"))
+
+# Headers of a cached response that are part of the representation
+_KEPT_HEADERS = ("x-next-cursor", "x-graph-version")
+
+# Whole rendered responses for the current revision; emptied on every write
+response_cache = TTLCache(maxsize=RESPONSE_CACHE_SIZE, ttl=3600)
+
+# (updated_at, in_degree, out_degree): links from other notes change the
+# degrees without touching updated_at
+NoteVersion = Tuple[datetime, int, int]
+
+def http_date(moment: datetime) -> str:
+    return format_datetime(moment.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+class VaultRevision:
+    """Process-wide change counter for validating cached responses.
+
+    `revision` increases on every note write, so any response derived from
+    the vault as a whole is fresh exactly while the revision is unchanged.
+    Each note's own version is its updated_at plus its link degrees,
+    remembered here once a read has seen it, so a conditional GET of that
+    note is answered without a query. A write forgets the versions of the
+    note and of every note whose degrees it changed. The boot id keeps
+    ETags from a previous process from matching after a restart.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.boot = format(time.time_ns() // 1000, "x")
+        self.revision = 0
+        self.modified_at = datetime.utcnow()
+        self._note_versions: Dict[int, NoteVersion] = {}
+
+    def etag(self) -> str:
+        return f'"{self.boot}-{self.revision}"'
+
+    def note_etag(self, note_id: int, version: NoteVersion) -> str:
+        updated_at, in_degree, out_degree = version
+        return f'"{note_id}-{int(updated_at.timestamp() * 1_000_000):x}-{in_degree}-{out_degree}"'
+
+    def note_version(self, note_id: int) -> Optional[NoteVersion]:
+        return self._note_versions.get(note_id)
+
+    def note_seen(self, note_id: int, version: NoteVersion):
+        with self._lock:
+            self._note_versions[note_id] = version
+
+    def note_saved(self, note_id: int, relinked: Iterable[int] = ()):
+        """A note was written; `relinked` are the notes whose degrees it changed"""
+        with self._lock:
+            for changed in (note_id, *relinked):
+                self._note_versions.pop(changed, None)
+            self._bump()
+
+    def note_deleted(self, note_id: int, relinked: Iterable[int] = ()):
+        self.note_saved(note_id, relinked)
+
+    def invalidate(self):
+        """Forget every note version (bulk loads, writes from another process)"""
+        with self._lock:
+            self._note_versions.clear()
+            self._bump()
+
+    def derived_changed(self):
+        """Data computed from the vault in the background (graph rankings) was replaced"""
+        with self._lock:
+            self._bump()
+
+    def _bump(self):
+        self.revision += 1
+        self.modified_at = datetime.utcnow()
+        response_cache.clear()
+
+vault_revision = VaultRevision()
+
+def _etag_matches(header: str, etag: str) -> bool:
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+def not_modified(request: Request, etag: str, last_modified: datetime) -> Optional[Response]:
+    """A 304 response if the client's copy is current, else None"""
+    headers = validator_headers(etag, last_modified)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match takes precedence; If-Modified-Since is ignored when present
+        return Response(status_code=304, headers=headers) if _etag_matches(if_none_match, etag) else None
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).replace(tzinfo=None)
+        except (TypeError, ValueError):
+            return None
+        if last_modified.replace(microsecond=0) <= since:
+            return Response(status_code=304, headers=headers)
+    return None
+
+def validator_headers(etag: str, last_modified: datetime) -> Dict[str, str]:
+    # no-cache: browsers keep the body but revalidate on every use
+    return {"ETag": etag, "Last-Modified": http_date(last_modified), "Cache-Control": "no-cache"}
+
+def with_validators(response: Response, etag: str, last_modified: datetime) -> Response:
+    response.headers.update(validator_headers(etag, last_modified))
+    return response
+
+async def cached_response(request: Request, build: Callable[[], Awaitable[Response]]) -> Response:
+    """Serve a vault-wide read conditionally and from the response cache.
+
+    The ETag is the vault revision, so an unchanged reload is a 304 before
+    any work is done; otherwise the rendered body is reused until the next write.
+    """
+    revision, etag, last_modified = vault_revision.revision, vault_revision.etag(), vault_revision.modified_at
+    cached = not_modified(request, etag, last_modified)
+    if cached is not None:
+        return cached
+    key = (request.url.path, request.url.query, revision)
+    entry = response_cache.get(key)
+    if entry is None:
+        response = await build()
+        if response.status_code != 200:
+            return response
+        kept = {name: value for name, value in response.headers.items() if name in _KEPT_HEADERS}
+        entry = (response.body, response.media_type, kept)
+        # A write during build() already advanced the revision; this key is then never read
+        response_cache.set(key, entry)
+    body, media_type, kept = entry
+    return with_validators(Response(body, media_type=media_type, headers=kept), etag, last_modified)
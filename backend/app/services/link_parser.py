@@ -1,7 +1,8 @@
 import re
-from typing import List, Set
+from html import escape
+from typing import Dict, List, Set
 from sqlalchemy.orm import Session
-from ..database import Note
+from .title_index import title_index
 
 class LinkParser:
     LINK_PATTERN = r'\[\[([^\]]+)\]\]'
@@ -15,24 +16,24 @@ class LinkParser:
     @staticmethod
     def resolve_links(content: str, db: Session) -> List[int]:
         """Resolve link titles to note IDs"""
-        link_titles = LinkParser.extract_links(content)
-        resolved_ids = []
-        
-        for title in link_titles:
-            note = db.query(Note).filter(Note.title == title.strip()).first()
-            if note:
-                resolved_ids.append(note.id)
-        
-        return resolved_ids
+        resolved = title_index.resolve(LinkParser.extract_links(content), db)
+        # Titles differing only in case/spacing point at the same note
+        return list(dict.fromkeys(resolved.values()))
     
     @staticmethod
     def render_links(content: str, db: Session) -> str:
         """Convert [[Title]] to clickable links"""
+        resolved = title_index.resolve(LinkParser.extract_links(content), db)
+        return LinkParser.render_resolved(content, resolved)
+
+    @staticmethod
+    def render_resolved(content: str, resolved: Dict[str, int]) -> str:
+        """Convert [[Title]] to clickable links using an already resolved {title: note id} map"""
         def replace_link(match):
-            title = match.group(1).strip()
-            note = db.query(Note).filter(Note.title == title).first()
-            if note:
-                return f'<a href="#" class="note-link" data-note-id="{note.id}">{title}</a>'
+            title = escape(match.group(1).strip())
+            note_id = resolved.get(match.group(1))
+            if note_id is not None:
+                return f'<a href="#" class="note-link" data-note-id="{note_id}">{title}</a>'
             else:
                 return f'<span class="broken-link">{title} (not found)</span>'
         
@@ -0,0 +1,255 @@
+import contextvars
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+from starlette.routing import BaseRoute, Match
+
+# Off unless asked for: the hooks cost a little on every query and request
+METRICS_ENABLED = os.environ.get("FOCUSNEST_METRICS", "").lower() in ("1", "true", "yes")
+PROFILE_INTERVAL = float(os.environ.get("FOCUSNEST_PROFILE_INTERVAL_MS", "1")) / 1000
+PROFILES_KEPT = int(os.environ.get("FOCUSNEST_PROFILES_KEPT", "16"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+class Histogram:
+    """Prometheus-style cumulative histogram, one series per label tuple"""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # labels -> [count per bucket (+Inf last), sum]
+        self._series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, labels: Tuple[str, ...], value: float):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, list(counts), total) for labels, (counts, total) in self._series.items())
+        for labels, counts, total in series:
+            base = _labels(self.labels, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f'{self.name}_bucket{{{base}{"," if base else ""}le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{base}}} {total:.6f}")
+            lines.append(f"{self.name}_count{{{base}}} {cumulative}")
+        return lines
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, escaped))
+
+request_latency = Histogram(
+    "focusnest_http_request_duration_seconds", "Request latency by route template",
+    ("method", "route", "status"), LATENCY_BUCKETS,
+)
+request_db_time = Histogram(
+    "focusnest_http_request_db_seconds", "Time spent in SQL per request",
+    ("method", "route"), LATENCY_BUCKETS,
+)
+request_queries = Histogram(
+    "focusnest_http_request_queries", "SQL statements executed per request; a high count flags an N+1",
+    ("method", "route"), QUERY_COUNT_BUCKETS,
+)
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    db_seconds: float = 0.0
+
+# Set by the middleware for the duration of a request. The worker pools run
+# their callables inside a copy of the request's context (see workers._run),
+# so queries on the analytics and writer threads are counted too.
+_current_request: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    "focusnest_request_stats", default=None
+)
+
+# The start time lives on the statement's own execution context, so a
+# statement that fails (no after_cursor_execute) leaves nothing behind
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._focusnest_query_start = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_focusnest_query_start", None)
+    stats = _current_request.get()
+    if stats is not None and started is not None:
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - started
+
+def instrument_engine(engine):
+    """Count and time every statement run through `engine` (a sync Engine)"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+class SamplingProfiler:
+    """Samples every thread's stack at a fixed interval while a request runs.
+
+    Handlers hop between the event loop and the worker pools, so all threads
+    are sampled; stacks parked in a wait (idle loop, idle pool workers) are
+    dropped. The result is in collapsed "folded" form, one `frame;frame;... count`
+    line per distinct stack, which flamegraph.pl and speedscope read directly.
+    """
+
+    _IDLE_FILES = ("threading.py", "selectors.py", "queue.py", "thread.py")
+    # Blocks in C on its request queue, so the innermost Python frame is the loop itself
+    _IDLE_FUNCTIONS = ("_connection_worker_thread",)
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="focusnest-profiler", daemon=True)
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self) -> str:
+        self._stop.set()
+        self._thread.join()
+        elapsed = (time.perf_counter() - self._started) * 1000
+        header = f"# {sum(self.samples.values())} samples over {elapsed:.1f} ms, every {self.interval * 1000:g} ms\n"
+        return header + "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if (ident == own or os.path.basename(frame.f_code.co_filename) in self._IDLE_FILES
+                        or frame.f_code.co_name in self._IDLE_FUNCTIONS):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                if ident not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                stack.append(names.get(ident, str(ident)))
+                self.samples[";".join(reversed(stack))] += 1
+
+# Most recent profile dumps by id, oldest evicted first
+_profiles: "OrderedDict[str, str]" = OrderedDict()
+_profiles_lock = threading.Lock()
+
+def get_profile(profile_id: str) -> Optional[str]:
+    with _profiles_lock:
+        return _profiles.get(profile_id)
+
+def _store_profile(profile_id: str, dump: str):
+    with _profiles_lock:
+        _profiles[profile_id] = dump
+        while len(_profiles) > PROFILES_KEPT:
+            _profiles.popitem(last=False)
+
+def _profile_requested(scope) -> bool:
+    for name, value in scope.get("headers", ()):
+        if name == b"x-profile":
+            return value.strip().lower() in (b"1", b"true", b"yes")
+    return False
+
+class MetricsMiddleware:
+    """Times each request, counts its SQL and adds a Server-Timing header.
+
+    Send `X-Profile: 1` to run the sampling profiler for that one request; the
+    response carries an X-Profile-Id to fetch the dump from /metrics/profiles/{id}.
+    """
+
+    def __init__(self, app, routes: Sequence[BaseRoute] = ()):
+        self.app = app
+        self.routes = routes
+
+    def _route_template(self, scope) -> Optional[str]:
+        # Matched up front: older Starlette does not record the route in the scope
+        for route in self.routes:
+            path = getattr(route, "path", None)
+            if path and route.matches(scope)[0] == Match.FULL:
+                return path
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith("/metrics"):
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current_request.set(stats)
+        profiler, profile_id = None, None
+        if _profile_requested(scope):
+            profiler, profile_id = SamplingProfiler(), uuid.uuid4().hex
+            profiler.start()
+        started = time.perf_counter()
+        template = self._route_template(scope)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                total_ms = (time.perf_counter() - started) * 1000
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing",
+                    f'db;dur={stats.db_seconds * 1000:.2f};desc="{stats.queries} queries", total;dur={total_ms:.2f}',
+                )
+                if profile_id:
+                    headers.append("X-Profile-Id", profile_id)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_request.reset(token)
+            if profiler is not None:
+                _store_profile(profile_id, profiler.stop())
+            # Route templates keep the label set bounded; unmatched paths share one series
+            template = template or getattr(scope.get("route"), "path", None) or "unmatched"
+            method = scope["method"]
+            request_latency.observe((method, template, str(status)), time.perf_counter() - started)
+            request_db_time.observe((method, template), stats.db_seconds)
+            request_queries.observe((method, template), stats.queries)
+
+def _cache_lines() -> List[str]:
+    from .http_cache import response_cache
+    from .note_renderer import render_cache
+    from .suggestions import suggestion_cache
+    caches = {"response": response_cache, "render": render_cache, "suggestion": suggestion_cache}
+    lines = []
+    for metric, kind, attribute in (("hits_total", "counter", "hits"), ("misses_total", "counter", "misses"),
+                                    ("entries", "gauge", "__len__")):
+        name = f"focusnest_cache_{metric}"
+        lines += [f"# HELP {name} In-process cache {attribute.strip('_')}", f"# TYPE {name} {kind}"]
+        for label, cache in caches.items():
+            value = len(cache) if attribute == "__len__" else getattr(cache, attribute)
+            lines.append(f'{name}{{cache="{label}"}} {value}')
+    return lines
+
+def render_metrics() -> str:
+    """Everything collected so far in the Prometheus text exposition format"""
+    lines = []
+    for histogram in (request_latency, request_db_time, request_queries):
+        lines += histogram.render()
+    lines += _cache_lines()
+    return "\n".join(lines) + "\n"
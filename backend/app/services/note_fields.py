@@ -0,0 +1,61 @@
+import base64
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+from ..database import Note
+
+PREVIEW_LENGTH = 120
+
+# Fields a client may ask for with `fields=`, mapped to their columns
+NOTE_FIELDS = {
+    "id": Note.id,
+    "title": Note.title,
+    "content": Note.content,
+    "preview": Note.preview,
+    "word_count": Note.word_count,
+    "in_degree": Note.in_degree,
+    "out_degree": Note.out_degree,
+    "created_at": Note.created_at,
+    "updated_at": Note.updated_at,
+}
+# What list views need; everything but the body
+SUMMARY_FIELDS = ("id", "title", "preview", "word_count", "updated_at")
+FULL_FIELDS = tuple(NOTE_FIELDS)
+
+def summarize(content: str) -> Tuple[str, int]:
+    """The stored (preview, word_count) of a note body"""
+    words = (content or "").split()
+    return " ".join(words)[:PREVIEW_LENGTH], len(words)
+
+def parse_fields(fields: Optional[str], default: Sequence[str]) -> List[str]:
+    """Validate a comma-separated `fields=` value; `id` is always included"""
+    if not fields:
+        return list(default)
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in NOTE_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(NOTE_FIELDS)}")
+    return list(dict.fromkeys(["id", *names]))
+
+def columns(fields: Sequence[str]) -> list:
+    return [NOTE_FIELDS[name] for name in fields]
+
+def note_dict(note: Note, fields: Sequence[str]) -> Dict:
+    result = {}
+    for name in fields:
+        value = getattr(note, name)
+        result[name] = value.isoformat() if isinstance(value, datetime) else value
+    return result
+
+def encode_cursor(note: Note) -> str:
+    """Opaque keyset position after `note` in (updated_at, id) descending order"""
+    raw = json.dumps([note.updated_at.isoformat(), note.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        updated_at, note_id = json.loads(raw)
+        return datetime.fromisoformat(updated_at), int(note_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
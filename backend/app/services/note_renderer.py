@@ -0,0 +1,38 @@
+import hashlib
+import os
+from typing import Dict
+from sqlalchemy.orm import Session
+from .link_parser import LinkParser
+from .title_index import title_index
+from .ttl_cache import TTLCache
+
+RENDER_CACHE_SIZE = int(os.environ.get("FOCUSNEST_RENDER_CACHE_SIZE", "512"))
+
+# (note id, content hash) -> ({link title: note id}, rendered payload)
+render_cache = TTLCache(maxsize=RENDER_CACHE_SIZE, ttl=24 * 3600)
+
+def content_hash(content: str) -> str:
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
+
+def render_note(note_id: int, content: str, db: Session) -> Dict:
+    """Note body with [[links]] resolved in one batch; the browser renders the markdown.
+
+    A cached render stays valid while every link in it still resolves to the
+    same note. Editing the note changes the content hash. Renaming, deleting
+    or creating a linked title changes the resolution. Writes anywhere else
+    leave the entry alone.
+    """
+    key = (note_id, content_hash(content))
+    resolved = title_index.resolve(LinkParser.extract_links(content), db)
+    cached = render_cache.get(key)
+    if cached is not None and cached[0] == resolved:
+        return cached[1]
+
+    linked = LinkParser.render_resolved(content, resolved)
+    payload = {"id": note_id, "content": linked}
+    render_cache.set(key, (resolved, payload), note_ids=[note_id])
+    return payload
+
+def invalidate_note(note_id: int):
+    """Drop every cached render of a note after it was edited or deleted"""
+    render_cache.invalidate_notes([note_id])
@@ -0,0 +1,208 @@
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import insert, or_
+from sqlalchemy.orm import Session
+from ..database import Note, Link, NoteRanking, Tag, UnresolvedLink
+from . import note_renderer, suggestions
+from .backlinks import refresh_degrees
+from .change_feed import change_feed, deleted_event, link_events, note_event, record_changes
+from .graph_cache import graph_cache
+from .http_cache import vault_revision
+from .link_parser import LinkParser
+from .note_fields import summarize
+from .related_notes import related_index
+from .tag_index import add_tags, sync_note_tags
+from .tag_parser import TagParser
+from .title_index import normalize_title, title_index
+from .unresolved_links import dangling_targets, record_unresolved, replace_unresolved, resolve_pending
+
+class NoteWriter:
+    """The single write path for notes.
+
+    Each operation runs in one transaction, touches only the link rows that
+    actually change, and then brings the in-process indexes and caches up
+    to date. Links to titles that have no note yet are kept as unresolved
+    links and become real links once a note takes that title.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    @staticmethod
+    def link_keys(content: str) -> Set[str]:
+        """Normalized link targets of a note body; equal sets mean identical outgoing links"""
+        return {normalize_title(title) for title in LinkParser.extract_links(content or "")}
+
+    def create(self, title: str, content: str = "") -> Note:
+        preview, word_count = summarize(content)
+        note = Note(title=title, content=content or "", preview=preview, word_count=word_count)
+        try:
+            self.db.add(note)
+            self.db.flush()
+            title_index.note_saved(note.id, note.title)
+            linked_ids, dangling = self._resolve(note.content)
+            self._insert_links(note.id, linked_ids)
+            replace_unresolved(self.db, note.id, dangling)
+            add_tags(self.db, [{"note_id": note.id, "tag_name": tag} for tag in sorted(TagParser.extract_tags(content))])
+            claimed = resolve_pending(self.db, {normalize_title(note.title): note.id})
+            claimed_ids = [from_id for from_id, _ in claimed]
+            if linked_ids or claimed:
+                refresh_degrees(self.db, [note.id, *linked_ids, *claimed_ids])
+            events = record_changes(self.db, [
+                note_event("note.created", note),
+                *link_events("link.created", [(note.id, to_id) for to_id in linked_ids] + claimed),
+            ])
+            self.db.commit()
+        except Exception:
+            self._abort()
+            raise
+        graph_cache.note_saved(note.id, note.title, {to_id: 1 for to_id in linked_ids})
+        graph_cache.links_added(claimed)
+        related_index.note_saved(note.id, note.title, note.content, version=note.updated_at)
+        suggestions.invalidate_notes([note.id, *linked_ids, *claimed_ids])
+        suggestions.graph_changed()
+        vault_revision.note_saved(note.id, [*linked_ids, *claimed_ids])
+        change_feed.publish(events)
+        return note
+
+    def update(self, note: Note, title: Optional[str] = None, content: Optional[str] = None) -> Note:
+        old_title, old_content = note.title, note.content
+        old_key = normalize_title(note.title)
+        if title is not None:
+            note.title = title
+        if content is not None:
+            note.content = content
+            note.preview, note.word_count = summarize(content)
+        content_changed = content is not None and content != old_content
+        touched: List[int] = [note.id]
+        outgoing: Optional[Dict[int, int]] = None
+        claimed: List[Tuple[int, int]] = []
+        removed: List[int] = []
+        added: List[int] = []
+        try:
+            self.db.flush()
+            title_index.note_saved(note.id, note.title)
+            if self.link_keys(old_content) != self.link_keys(note.content):
+                outgoing, removed, added = self._sync_links(note)
+                touched.extend([*removed, *added])
+            if content_changed:
+                sync_note_tags(self.db, note.id, TagParser.extract_tags(old_content), TagParser.extract_tags(content))
+            new_key = normalize_title(note.title)
+            if new_key != old_key:
+                # Renamed onto a title other notes were waiting for
+                claimed = resolve_pending(self.db, {new_key: note.id})
+                touched.extend(from_id for from_id, _ in claimed)
+            if len(touched) > 1:
+                refresh_degrees(self.db, touched)
+            events = record_changes(self.db, [
+                note_event("note.updated", note),
+                *link_events("link.deleted", [(note.id, to_id) for to_id in removed]),
+                *link_events("link.created", [(note.id, to_id) for to_id in added] + claimed),
+            ])
+            self.db.commit()
+        except Exception:
+            self._abort()
+            raise
+        graph_cache.note_saved(note.id, note.title, outgoing)
+        graph_cache.links_added(claimed)
+        if content_changed or note.title != old_title:
+            related_index.note_saved(note.id, note.title, note.content, old_title, old_content, note.updated_at)
+        suggestions.invalidate_notes(touched)
+        if outgoing is not None or claimed:
+            suggestions.graph_changed()
+        if content_changed:
+            note_renderer.invalidate_note(note.id)
+        vault_revision.note_saved(note.id, touched)
+        change_feed.publish(events)
+        return note
+
+    def delete(self, note: Note):
+        note_id, title, content, version = note.id, note.title, note.content, note.updated_at
+        link_filter = or_(Link.from_note_id == note_id, Link.to_note_id == note_id)
+        try:
+            pairs = self.db.query(Link.from_note_id, Link.to_note_id).filter(link_filter).all()
+            neighbors = {other for pair in pairs for other in pair}
+            referrers = {from_id for from_id, to_id in pairs if to_id == note_id} - {note_id}
+            self.db.query(Link).filter(link_filter).delete(synchronize_session=False)
+            self.db.query(Tag).filter(Tag.note_id == note_id).delete(synchronize_session=False)
+            self.db.query(UnresolvedLink).filter(
+                UnresolvedLink.from_note_id == note_id
+            ).delete(synchronize_session=False)
+            self.db.query(NoteRanking).filter(NoteRanking.note_id == note_id).delete(synchronize_session=False)
+            self.db.delete(note)
+            # Flushed first so a title index loaded below no longer sees the note
+            self.db.flush()
+            title_index.note_deleted(note_id)
+            # Notes whose [[link]] text names this title keep it: it dangles again.
+            # Links made under an earlier title of the note just go.
+            key = normalize_title(note.title)
+            if referrers:
+                record_unresolved(self.db, [
+                    {"from_note_id": from_id, "target_key": key, "target_title": note.title}
+                    for from_id, content in self.db.query(Note.id, Note.content).filter(Note.id.in_(referrers))
+                    if key in self.link_keys(content)
+                ])
+            # Another note with the same title takes the links over
+            fallback = title_index.lookup(note.title, self.db)
+            relinked = resolve_pending(self.db, {key: fallback}) if fallback is not None and referrers else []
+            if relinked:
+                neighbors.add(fallback)
+            refresh_degrees(self.db, neighbors - {note_id})
+            # The note's own links go with it; only links handed to a namesake are news
+            events = record_changes(self.db, [
+                deleted_event(note_id), *link_events("link.created", relinked),
+            ])
+            self.db.commit()
+        except Exception:
+            self._abort()
+            raise
+        graph_cache.note_deleted(note_id)
+        graph_cache.links_added(relinked)
+        related_index.note_deleted(note_id, title, content, version)
+        suggestions.invalidate_notes(neighbors | {note_id})
+        suggestions.graph_changed()
+        note_renderer.invalidate_note(note_id)
+        vault_revision.note_deleted(note_id, neighbors)
+        change_feed.publish(events)
+
+    def _sync_links(self, note: Note):
+        """Apply only the delta between stored and wanted outgoing links.
+
+        Returns the resulting {to_id: strength} map and the removed and added target ids.
+        Links that survive keep their strength and created_at.
+        """
+        wanted, dangling = self._resolve(note.content)
+        replace_unresolved(self.db, note.id, dangling)
+        existing = {
+            to_id: strength if strength is not None else 1
+            for to_id, strength in self.db.query(Link.to_note_id, Link.strength).filter(Link.from_note_id == note.id)
+        }
+        removed = existing.keys() - set(wanted)
+        added = [to_id for to_id in wanted if to_id not in existing]
+        if removed:
+            self.db.query(Link).filter(
+                Link.from_note_id == note.id, Link.to_note_id.in_(removed)
+            ).delete(synchronize_session=False)
+        self._insert_links(note.id, added)
+        outgoing = {to_id: strength for to_id, strength in existing.items() if to_id not in removed}
+        outgoing.update((to_id, 1) for to_id in added)
+        return outgoing, list(removed), added
+
+    def _resolve(self, content: str) -> Tuple[List[int], Dict[str, str]]:
+        """Distinct target ids of a body's links, and {key: link text} of those with no note"""
+        titles = LinkParser.extract_links(content or "")
+        resolved = title_index.resolve(titles, self.db)
+        # Titles differing only in case/spacing point at the same note
+        return list(dict.fromkeys(resolved.values())), dangling_targets(titles, resolved)
+
+    def _insert_links(self, from_note_id: int, to_note_ids: List[int]):
+        """Insert outgoing links in one executemany"""
+        if to_note_ids:
+            self.db.execute(
+                insert(Link),
+                [{"from_note_id": from_note_id, "to_note_id": to_id} for to_id in to_note_ids],
+            )
+
+    def _abort(self):
+        self.db.rollback()
+        # The title index may already hold the rolled-back title
+        title_index.invalidate()
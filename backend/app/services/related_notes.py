@@ -0,0 +1,425 @@
+import math
+import os
+import threading
+import zlib
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from ..database import Note
+from .graph_cache import graph_cache
+from .search_index import TOKEN_PATTERN
+
+# Share of the blended score that comes from link distance rather than text
+GRAPH_WEIGHT = float(os.environ.get("FOCUSNEST_RELATED_GRAPH_WEIGHT", "0.3"))
+
+# (sorted features, weights) and (sorted features, counts)
+Vector = Tuple[np.ndarray, np.ndarray]
+Terms = Tuple[np.ndarray, np.ndarray]
+
+class RelatedIndex:
+    """Hashed TF-IDF vectors of every note, with an inverted index for top-k cosine queries.
+
+    Words are hashed into DIM buckets, so no vocabulary is kept. Each note
+    keeps its MAX_TERMS heaviest terms, L2-normalized; terms found in more
+    than MAX_DF of the notes (and more than MAX_DF_FLOOR) are dropped as
+    noise. A query gathers the
+    postings of the note's own terms and sums them per note with one bincount,
+    so its cost follows the postings of those terms, not the vault size.
+
+    The postings arrays are rebuilt in batch. Writes in between go to a small
+    delta (changed vectors plus their postings in dicts) and mask the old
+    rows. The delta is folded in once it reaches DELTA_LIMIT notes. When the
+    vault has grown or shrunk by REBUILD_DRIFT since the last full build, the
+    IDF weights are stale and refresh() re-reads every note.
+
+    Full builds never hold the lock: a replacement is built on the side and
+    swapped in, so writes are never held up by one. An index that is not
+    loaded yet ignores writes, except to queue them for the build in progress.
+    """
+
+    DIM = 1 << 20
+    MAX_TERMS = 32
+    MAX_DF = 0.1
+    MAX_DF_FLOOR = 10
+    DELTA_LIMIT = 2000
+    REBUILD_DRIFT = 0.2
+    TITLE_REPEAT = 2
+    HUB_DEGREE = 1000
+    # Cap on the token -> feature memo
+    MAX_MEMO = 1 << 20
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # One full build at a time; held while reading the vault, never by writes
+        self._build_lock = threading.Lock()
+        self._features: Dict[str, int] = {}
+        # Writes seen while rebuild() builds a replacement off the lock
+        self._replay: Optional[List[Tuple]] = None
+        self._generation = 0
+        self._clear()
+
+    def _clear(self):
+        self._loaded = False
+        self._df = np.zeros(self.DIM, dtype=np.int32)
+        self._docs = 0
+        self._built_docs = 0
+        # Main index: note ids (sorted) with CSR rows of (feature, weight) ...
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._indptr = np.zeros(1, dtype=np.int64)
+        self._row_features = np.zeros(0, dtype=np.int64)
+        self._row_weights = np.zeros(0, dtype=np.float32)
+        # ... and the same entries grouped by feature (postings)
+        self._post_features = np.zeros(0, dtype=np.int64)
+        self._post_ptr = np.zeros(1, dtype=np.int64)
+        self._post_rows = np.zeros(0, dtype=np.int32)
+        self._post_weights = np.zeros(0, dtype=np.float32)
+        self._stale = np.zeros(0, dtype=bool)
+        # Notes written since the build: id -> vector (None when deleted)
+        self._delta: Dict[int, Optional[Vector]] = {}
+        self._delta_postings: Dict[int, Dict[int, float]] = {}
+
+    # -- text to vectors
+
+    def _terms(self, title: str, content: str) -> Terms:
+        """Distinct hashed features of a note with their counts; the title counts TITLE_REPEAT times"""
+        tokens = TOKEN_PATTERN.findall((content or "").casefold())
+        tokens += TOKEN_PATTERN.findall((title or "").casefold()) * self.TITLE_REPEAT
+        features = self._features
+        if len(features) > self.MAX_MEMO:
+            features.clear()
+        # Only tokens never seen before are hashed in Python; the rest is a dict lookup per token
+        for token in set(tokens).difference(features):
+            skip = len(token) < 2 or token.isdigit()
+            features[token] = -1 if skip else zlib.crc32(token.encode("utf-8")) & (self.DIM - 1)
+        hashed = np.fromiter(map(features.__getitem__, tokens), dtype=np.int64, count=len(tokens))
+        return np.unique(hashed[hashed >= 0], return_counts=True)
+
+    def _vector(self, terms: Terms) -> Vector:
+        features, counts = terms
+        if not len(features):
+            return features, np.zeros(0, dtype=np.float32)
+        tf = 1.0 + np.log(counts)
+        df = self._df[features]
+        idf = np.log((1.0 + self._docs) / (1.0 + df)) + 1.0
+        weights = tf * idf
+        weights[df > max(self.MAX_DF_FLOOR, self.MAX_DF * self._docs)] = 0.0
+        keep = np.argsort(-weights, kind="stable")[:self.MAX_TERMS]
+        keep = np.sort(keep[weights[keep] > 0])
+        norm = math.sqrt(float(np.dot(weights[keep], weights[keep]))) or 1.0
+        return features[keep], (weights[keep] / norm).astype(np.float32)
+
+    def _count_df(self, terms: Terms, sign: int):
+        features = terms[0]
+        if len(features):
+            self._df[features] += sign
+            self._docs += sign
+
+    # -- building
+
+    def rebuild(self, db: Session, force: bool = True) -> int:
+        """Build the index from every note and swap it in; returns the number of notes.
+
+        Queries and writes carry on against the old index (or skip an unloaded
+        one) meanwhile. Writes made during the build are replayed onto the new
+        index before the swap, except those its read already saw. Without
+        `force` an index loaded in the meantime is kept.
+        """
+        with self._build_lock:
+            with self._lock:
+                if not force and self._loaded:
+                    return len(self._ids)
+                self._replay = []
+                generation = self._generation
+            fresh = RelatedIndex()
+            try:
+                # A session of its own: its snapshot must not predate the replay list
+                with Session(db.get_bind()) as read_db:
+                    seen = fresh._read(read_db)
+            except BaseException:
+                with self._lock:
+                    self._replay = None
+                raise
+            with self._lock:
+                replay, self._replay = self._replay, None
+                if generation != self._generation:
+                    # Invalidated meanwhile: the read may predate a bulk load
+                    return 0
+                vars(self).update(
+                    (key, value) for key, value in vars(fresh).items()
+                    if key not in ("_lock", "_build_lock", "_replay", "_generation")
+                )
+                for operation, args, version in replay:
+                    if not self._seen(seen, operation, args[0], version):
+                        operation(self, *args, version=version)
+            return len(seen)
+
+    @staticmethod
+    def _seen(seen: Dict[int, datetime], operation, note_id: int, version: Optional[datetime]) -> bool:
+        """Whether the build's read already reflects a replayed write"""
+        read = seen.get(note_id)
+        if operation is RelatedIndex.note_deleted:
+            # Gone before the read, or the id was taken again by a newer note
+            return read is None or (version is not None and read > version)
+        return read is not None and version is not None and read >= version
+
+    def _read(self, db: Session, batch_size: int = 2000) -> Dict[int, datetime]:
+        """Fill this (private, unshared) index from the database; returns {id: updated_at} as read"""
+        self._clear()
+        ids: List[int] = []
+        all_terms: List[Terms] = []
+        seen: Dict[int, datetime] = {}
+        # One statement in a fresh transaction, so one snapshot of the vault
+        result = db.execute(
+            select(Note.id, Note.title, Note.content, Note.updated_at)
+            .order_by(Note.id)
+            .execution_options(yield_per=batch_size)
+        )
+        for note_id, title, content, updated_at in result:
+            terms = self._terms(title, content)
+            self._count_df(terms, 1)
+            ids.append(note_id)
+            all_terms.append(terms)
+            seen[note_id] = updated_at
+        # IDF needs the document frequencies of the whole vault first
+        self._build(np.asarray(ids, dtype=np.int64), [self._vector(terms) for terms in all_terms])
+        self._built_docs = self._docs
+        self._loaded = True
+        return seen
+
+    def _build(self, ids: np.ndarray, vectors: List[Vector]):
+        lengths = np.fromiter((len(f) for f, _ in vectors), dtype=np.int64, count=len(vectors))
+        self._ids = ids
+        self._indptr = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self._indptr[1:])
+        self._row_features = np.concatenate([f for f, _ in vectors] or [np.zeros(0)]).astype(np.int64)
+        self._row_weights = np.concatenate([w for _, w in vectors] or [np.zeros(0)]).astype(np.float32)
+        rows = np.repeat(np.arange(len(ids), dtype=np.int32), lengths)
+        order = np.argsort(self._row_features, kind="stable")
+        self._post_rows = rows[order]
+        self._post_weights = self._row_weights[order]
+        self._post_features, starts = np.unique(self._row_features[order], return_index=True)
+        self._post_ptr = np.append(starts, len(order)).astype(np.int64)
+        self._stale = np.zeros(len(ids), dtype=bool)
+        self._delta = {}
+        self._delta_postings = {}
+
+    def _merge_delta(self):
+        """Fold the delta into the main arrays, keeping the current weights"""
+        vectors: Dict[int, Vector] = {}
+        for row in np.flatnonzero(~self._stale).tolist():
+            lo, hi = self._indptr[row], self._indptr[row + 1]
+            vectors[int(self._ids[row])] = (self._row_features[lo:hi], self._row_weights[lo:hi])
+        for note_id, vector in self._delta.items():
+            if vector is not None:
+                vectors[note_id] = vector
+        ids = np.asarray(sorted(vectors), dtype=np.int64)
+        self._build(ids, [vectors[note_id] for note_id in ids.tolist()])
+
+    def ensure_loaded(self, db: Session):
+        if not self._loaded:
+            self.rebuild(db, force=False)
+
+    def refresh(self, db: Session):
+        """Batch maintenance: full rebuild when unloaded or the IDF has drifted, else fold in pending writes"""
+        with self._lock:
+            loaded = self._loaded
+            drift = abs(self._docs - self._built_docs) / max(1, self._built_docs)
+            if loaded and drift <= self.REBUILD_DRIFT:
+                if self._delta:
+                    self._merge_delta()
+                return
+        self.rebuild(db, force=loaded)
+
+    def invalidate(self):
+        """Drop everything; rebuilt from the database on next use"""
+        with self._lock:
+            self._generation += 1
+            self._clear()
+
+    # -- incremental updates from the write path
+
+    def _row_of(self, note_id: int) -> Optional[int]:
+        row = int(np.searchsorted(self._ids, note_id))
+        if row < len(self._ids) and self._ids[row] == note_id:
+            return row
+        return None
+
+    def _drop(self, note_id: int):
+        row = self._row_of(note_id)
+        if row is not None:
+            self._stale[row] = True
+        previous = self._delta.pop(note_id, None)
+        if previous is not None:
+            for feature in previous[0].tolist():
+                postings = self._delta_postings.get(feature)
+                if postings is not None:
+                    postings.pop(note_id, None)
+                    if not postings:
+                        del self._delta_postings[feature]
+
+    def note_saved(self, note_id: int, title: str, content: str,
+                   old_title: Optional[str] = None, old_content: Optional[str] = None,
+                   version: Optional[datetime] = None):
+        """Re-vectorize a created or edited note; pass the old text for an edit.
+
+        `version` is the note's updated_at after the write, which tells a
+        build in progress whether its read already saw this write.
+        """
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append((RelatedIndex.note_saved, (note_id, title, content, old_title, old_content), version))
+            if not self._loaded:
+                return
+            if old_title is not None or old_content is not None:
+                self._count_df(self._terms(old_title, old_content), -1)
+            terms = self._terms(title, content)
+            self._count_df(terms, 1)
+            self._drop(note_id)
+            features, weights = self._vector(terms)
+            self._delta[note_id] = (features, weights)
+            for feature, weight in zip(features.tolist(), weights.tolist()):
+                self._delta_postings.setdefault(feature, {})[note_id] = weight
+            self._check_delta()
+
+    def note_deleted(self, note_id: int, title: str, content: str, version: Optional[datetime] = None):
+        """Forget a note; `version` is its updated_at when it was deleted"""
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append((RelatedIndex.note_deleted, (note_id, title, content), version))
+            if not self._loaded:
+                return
+            self._count_df(self._terms(title, content), -1)
+            self._drop(note_id)
+            self._delta[note_id] = None
+            self._check_delta()
+
+    def _check_delta(self):
+        if len(self._delta) >= self.DELTA_LIMIT:
+            self._merge_delta()
+
+    # -- queries
+
+    def _vector_of(self, note_id: int) -> Optional[Vector]:
+        if note_id in self._delta:
+            return self._delta[note_id]
+        row = self._row_of(note_id)
+        if row is None or self._stale[row]:
+            return None
+        lo, hi = self._indptr[row], self._indptr[row + 1]
+        return self._row_features[lo:hi], self._row_weights[lo:hi]
+
+    def similar(self, note_id: int, limit: int = 10) -> Optional[List[Tuple[int, float]]]:
+        """Top-`limit` notes by cosine similarity of their vectors; None for an unknown note"""
+        with self._lock:
+            vector = self._vector_of(note_id)
+            if vector is None:
+                return None
+            features, weights = vector
+            scores: Dict[int, float] = {}
+            # Main index: gather every posting of the query's terms, then sum per row
+            if len(self._post_features):
+                slots = np.searchsorted(self._post_features, features)
+                slots = np.minimum(slots, len(self._post_features) - 1)
+                found = self._post_features[slots] == features
+                slots, query_weights = slots[found], weights[found]
+                starts, stops = self._post_ptr[slots], self._post_ptr[slots + 1]
+                lengths = stops - starts
+                if lengths.sum():
+                    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(int(lengths.sum()))
+                    totals = np.bincount(
+                        self._post_rows[offsets],
+                        weights=self._post_weights[offsets] * np.repeat(query_weights, lengths),
+                        minlength=len(self._ids),
+                    )
+                    totals[self._stale] = 0.0
+                    own = self._row_of(note_id)
+                    if own is not None:
+                        totals[own] = 0.0
+                    top = np.argpartition(-totals, min(limit, len(totals) - 1))[:limit]
+                    scores.update(
+                        (int(self._ids[row]), float(totals[row])) for row in top.tolist() if totals[row] > 0
+                    )
+            # Delta: a handful of dict postings
+            for feature, weight in zip(features.tolist(), weights.tolist()):
+                for other, other_weight in self._delta_postings.get(feature, {}).items():
+                    if other != note_id:
+                        scores[other] = scores.get(other, 0.0) + weight * other_weight
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+    def related(self, note_id: int, db: Session, limit: int = 10, graph_weight: float = GRAPH_WEIGHT,
+                include_linked: bool = False) -> Optional[List[Dict]]:
+        """Notes related by content, blended with link distance.
+
+        score = (1 - graph_weight) * cosine + graph_weight * proximity, where
+        proximity is 1 for a direct link and up to 0.5 for notes two hops away
+        (by number of shared neighbors). Linked notes are left out unless
+        `include_linked`, which makes this a list of connections to suggest.
+        """
+        self.ensure_loaded(db)
+        similar = self.similar(note_id, limit * 4)
+        if similar is None:
+            return None
+        proximity, hops = self._proximity(note_id, db, [other for other, _ in similar], limit * 4)
+        candidates = dict(similar)
+        for other in proximity:
+            candidates.setdefault(other, 0.0)
+        ranked = []
+        for other, similarity in candidates.items():
+            if hops.get(other) == 1 and not include_linked:
+                continue
+            score = (1.0 - graph_weight) * similarity + graph_weight * proximity.get(other, 0.0)
+            ranked.append({"id": other, "score": round(score, 6), "similarity": round(similarity, 6),
+                           "hops": hops.get(other)})
+        ranked.sort(key=lambda item: (-item["score"], item["id"]))
+        return ranked[:limit]
+
+    def _proximity(self, note_id: int, db: Session, similar: List[int],
+                   limit: int) -> Tuple[Dict[int, float], Dict[int, int]]:
+        """Link proximity of the textually similar notes plus the `limit` best two-hop notes"""
+        with graph_cache.read(db) as graph:
+            if note_id not in graph:
+                return {}, {}
+            adjacency = graph.adj
+            neighbors = set(adjacency[note_id]) - {note_id}
+            shared: Counter = Counter()
+            # Walking through a hub would make half the vault two hops away, and
+            # a hub says little about any one of its notes: those are skipped here
+            for neighbor in neighbors:
+                around = adjacency[neighbor]
+                if len(around) <= self.HUB_DEGREE:
+                    shared.update(other for other in around if other not in neighbors)
+            shared.pop(note_id, None)
+            shared = Counter(dict(shared.most_common(limit)))
+            for other in similar:
+                if other in neighbors or other in shared or other not in adjacency:
+                    continue
+                around = adjacency[other]
+                if len(around) <= len(neighbors):
+                    count = sum(1 for n in around if n in neighbors)
+                else:
+                    count = sum(1 for n in neighbors if other in adjacency[n])
+                if count:
+                    shared[other] = count
+        most = max(shared.values(), default=1)
+        proximity = {other: 0.5 * count / most for other, count in shared.items()}
+        proximity.update((other, 1.0) for other in neighbors)
+        hops = {other: 2 for other in shared}
+        hops.update((other, 1) for other in neighbors)
+        return proximity, hops
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "notes": len(self._ids) - int(self._stale.sum()) + sum(v is not None for v in self._delta.values()),
+                "pending": len(self._delta),
+                "entries": int(len(self._row_features)),
+                "bytes": int(sum(a.nbytes for a in (
+                    self._ids, self._indptr, self._row_features, self._row_weights,
+                    self._post_features, self._post_ptr, self._post_rows, self._post_weights, self._df,
+                ))),
+            }
+
+related_index = RelatedIndex()
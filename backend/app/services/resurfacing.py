@@ -1,45 +1,137 @@
-import random
+import threading
+from collections import deque
 from datetime import datetime, timedelta
-from typing import List
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from ..database import Note, Link
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy.orm import Session, defer
+from ..database import Note
+from .graph_analytics import graph_rankings
+from .graph_cache import graph_cache
+
+class WeightedSampler:
+    """Draws distinct ids with probability proportional to their weight.
+
+    Built once from (id, weight) arrays; each draw is a binary search over
+    the cumulative weights, so sampling k notes costs O(k log n).
+    """
+
+    def __init__(self, ids: np.ndarray, weights: np.ndarray):
+        self.ids = ids
+        self.weights = weights.astype(np.float64)
+        self.cumulative = np.cumsum(self.weights)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def sample(self, count: int, rng: np.random.Generator) -> List[int]:
+        n = len(self.ids)
+        if count >= n:
+            return rng.permutation(self.ids).tolist()
+        total = self.cumulative[-1]
+        chosen: Dict[int, None] = {}
+        for _ in range(8):
+            draws = np.searchsorted(self.cumulative, rng.random(2 * count) * total, side="right")
+            for index in draws.tolist():
+                chosen.setdefault(index)
+                if len(chosen) == count:
+                    return self.ids[list(chosen)].tolist()
+        # A few heavy hubs keep getting redrawn: finish with weighted sampling
+        # without replacement (Efraimidis-Spirakis keys) over the rest.
+        remaining = np.setdiff1d(np.arange(n), list(chosen))
+        keys = rng.random(len(remaining)) ** (1.0 / self.weights[remaining])
+        extra = remaining[np.argsort(-keys)[:count - len(chosen)]]
+        return self.ids[list(chosen) + extra.tolist()].tolist()
+
+_derived: Dict[Tuple, object] = {}
+_derived_lock = threading.Lock()
+
+def _cached(key: Tuple, build: Callable[[], object]):
+    """Candidate sets are keyed on the vault version, so any note or link write retires them"""
+    key = key + (graph_cache.version,)
+    with _derived_lock:
+        value = _derived.get(key)
+    if value is None:
+        value = build()
+        with _derived_lock:
+            for stale in [k for k in _derived if k[0] == key[0]]:
+                del _derived[stale]
+            _derived[key] = value
+    return value
+
+# Ids handed out by unseeded random discovery, newest last
+_recent_discoveries: Deque[int] = deque(maxlen=100)
+
+def _hour_cutoff(days: int) -> datetime:
+    # Rounded to the hour so the cached candidate set is reused between requests
+    return datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(days=days)
 
 class IdeaResurfacing:
     def __init__(self, db: Session):
         self.db = db
+        self.rng = np.random.default_rng()
+    
+    def _degree_sampler(self, cutoff: datetime) -> WeightedSampler:
+        """Notes last updated before `cutoff`, weighted by PageRank once the analytics have run,
+        else by their stored link count (minimum 1)"""
+        rows = (
+            self.db.query(Note.id, Note.in_degree + Note.out_degree)
+            .filter(Note.updated_at < cutoff)
+            .all()
+        )
+        ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        weights = graph_rankings.weights(ids)
+        if weights is None:
+            weights = np.fromiter((max(1, r[1]) for r in rows), dtype=np.float64, count=len(rows))
+        return WeightedSampler(ids, weights)
+    
+    def _fetch(self, note_ids: List[int]) -> List[Note]:
+        """Load only the chosen notes, keeping the sampled order; bodies load on first access"""
+        if not note_ids:
+            return []
+        by_id = {n.id: n for n in self.db.query(Note).options(defer(Note.content)).filter(Note.id.in_(note_ids))}
+        return [by_id[i] for i in note_ids if i in by_id]
     
     def get_daily_suggestions(self, count: int = 5) -> List[Note]:
         """Get daily note suggestions using spaced repetition"""
-        # Get notes not viewed recently
-        week_ago = datetime.utcnow() - timedelta(days=7)
-        
-        candidates = self.db.query(Note).filter(
-            Note.updated_at < week_ago
-        ).all()
-        
-        if len(candidates) <= count:
-            return candidates
-        
-        # Prioritize notes with more connections
-        weighted_candidates = []
-        for note in candidates:
-            connection_count = len(note.outgoing_links) + len(note.incoming_links)
-            weight = max(1, connection_count)  # Minimum weight of 1
-            weighted_candidates.extend([note] * weight)
-        
-        return random.sample(weighted_candidates, min(count, len(weighted_candidates)))
+        # Get notes not viewed recently, prioritizing notes with more connections
+        cutoff = _hour_cutoff(7)
+        sampler = _cached(("daily", cutoff, graph_rankings.computed_at), lambda: self._degree_sampler(cutoff))
+        return self._fetch(sampler.sample(count, self.rng))
     
-    def get_random_discovery(self, exclude_recent: bool = True) -> Note:
-        """Get a random note for serendipitous discovery"""
-        query = self.db.query(Note)
+    def _eligible_ids(self, cutoff: Optional[datetime]) -> np.ndarray:
+        query = self.db.query(Note.id)
+        if cutoff is not None:
+            query = query.filter(Note.updated_at < cutoff)
+        return np.fromiter((row[0] for row in query), dtype=np.int64)
+    
+    def get_random_discovery(self, exclude_recent: bool = True, seed: Optional[int] = None,
+                             avoid_repeats: int = 10) -> Optional[Note]:
+        """Get a random note for serendipitous discovery.
+        
+        Picks an id from a cached array of eligible ids and loads only that note.
+        With a seed the pick is reproducible and the repeat memory is left alone;
+        otherwise the last `avoid_repeats` discoveries are skipped when possible.
+        """
+        cutoff = _hour_cutoff(3) if exclude_recent else None
+        ids = _cached(("discovery", cutoff), lambda: self._eligible_ids(cutoff))
+        if len(ids) == 0:
+            return None
         
-        if exclude_recent:
-            three_days_ago = datetime.utcnow() - timedelta(days=3)
-            query = query.filter(Note.updated_at < three_days_ago)
+        if seed is not None:
+            note_id = int(ids[np.random.default_rng(seed).integers(len(ids))])
+            return self.db.get(Note, note_id, options=[defer(Note.content)])
         
-        notes = query.all()
-        return random.choice(notes) if notes else None
+        recent = set(list(_recent_discoveries)[-avoid_repeats:]) if avoid_repeats > 0 else set()
+        if len(recent) >= len(ids):
+            recent = set()
+        # Rejection sampling: with few recent ids almost every probe succeeds
+        note_id = int(ids[self.rng.integers(len(ids))])
+        for _ in range(32):
+            if note_id not in recent:
+                break
+            note_id = int(ids[self.rng.integers(len(ids))])
+        _recent_discoveries.append(note_id)
+        return self.db.get(Note, note_id, options=[defer(Note.content)])
     
     def get_context_suggestions(self, current_note_id: int, count: int = 3) -> List[Note]:
         """Get suggestions based on current note context"""
@@ -62,9 +154,13 @@ class IdeaResurfacing:
     
     def get_orphan_suggestions(self, count: int = 3) -> List[Note]:
         """Suggest orphaned notes that need connections"""
-        # Find notes with no links
-        orphan_notes = self.db.query(Note).outerjoin(Link, 
-            (Note.id == Link.from_note_id) | (Note.id == Link.to_note_id)
-        ).filter(Link.id.is_(None)).limit(count).all()
+        # Find notes with no links, from the stored counts
+        orphan_notes = (
+            self.db.query(Note)
+            .options(defer(Note.content))
+            .filter(Note.in_degree == 0, Note.out_degree == 0)
+            .limit(count)
+            .all()
+        )
         
         return orphan_notes
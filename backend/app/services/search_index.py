@@ -0,0 +1,133 @@
+import re
+from typing import Dict, List, Sequence
+from sqlalchemy import DateTime, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+# External-content FTS5 table: the index stores only tokens, the text itself
+# stays in `notes` and is read back through the rowid for snippets.
+FTS_SCHEMA = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+        title, content,
+        content='notes', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS notes_fts_ai AFTER INSERT ON notes BEGIN
+        INSERT INTO notes_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS notes_fts_ad AFTER DELETE ON notes BEGIN
+        INSERT INTO notes_fts(notes_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS notes_fts_au AFTER UPDATE OF title, content ON notes BEGIN
+        INSERT INTO notes_fts(notes_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO notes_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+]
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+class SearchIndex:
+    # bm25() column weights: a hit in the title counts ten times a body hit
+    TITLE_WEIGHT = 10.0
+    CONTENT_WEIGHT = 1.0
+    SNIPPET_TOKENS = 16
+    HIGHLIGHT_OPEN = "<mark>"
+    HIGHLIGHT_CLOSE = "</mark>"
+
+    @staticmethod
+    def ensure_schema(conn: Connection) -> None:
+        """Create the FTS table and sync triggers, backfilling a fresh index"""
+        existed = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'notes_fts'")
+        ).first() is not None
+        for statement in FTS_SCHEMA:
+            conn.execute(text(statement))
+        if not existed:
+            SearchIndex.rebuild(conn)
+
+    @staticmethod
+    def rebuild(conn: Connection) -> int:
+        """Re-tokenize every note into the index, returns the number of notes indexed"""
+        conn.execute(text("INSERT INTO notes_fts(notes_fts) VALUES ('rebuild')"))
+        return conn.execute(text("SELECT count(*) FROM notes")).scalar_one()
+
+    @staticmethod
+    def build_query(q: str) -> str:
+        """Turn free user input into a safe FTS5 query: every term must match, the last as a prefix"""
+        terms = TOKEN_PATTERN.findall(q)
+        if not terms:
+            return ""
+        quoted = [f'"{term}"' for term in terms]
+        quoted[-1] += "*"
+        return " ".join(quoted)
+
+    @staticmethod
+    def search(db: Session, q: str, limit: int = 20, offset: int = 0, tags: Sequence[str] = ()) -> Dict:
+        """BM25-ranked search returning highlighted snippets and the total hit count.
+
+        With `tags`, only notes carrying every one of them are returned: each
+        FTS hit is checked against the (tag_name, note_id) index.
+        """
+        match = SearchIndex.build_query(q)
+        if not match:
+            return {"notes": [], "total": 0}
+        tag_filter = "".join(
+            f" AND notes_fts.rowid IN (SELECT note_id FROM tags WHERE tag_name = :tag{i})" for i in range(len(tags))
+        )
+        tag_params = {f"tag{i}": tag for i, tag in enumerate(tags)}
+
+        total = db.execute(
+            text(f"SELECT count(*) FROM notes_fts WHERE notes_fts MATCH :match{tag_filter}"),
+            {"match": match, **tag_params},
+        ).scalar_one()
+        if total == 0 or offset >= total:
+            return {"notes": [], "total": total}
+
+        rows = db.execute(
+            text(
+                f"""
+                SELECT n.id, n.title, n.updated_at,
+                       highlight(notes_fts, 0, :open, :close) AS title_highlight,
+                       snippet(notes_fts, 1, :open, :close, '…', :tokens) AS snippet,
+                       bm25(notes_fts, :title_weight, :content_weight) AS rank
+                FROM notes_fts
+                JOIN notes n ON n.id = notes_fts.rowid
+                WHERE notes_fts MATCH :match{tag_filter}
+                ORDER BY rank
+                LIMIT :limit OFFSET :offset
+                """
+            # Typed so updated_at comes back as a datetime, not SQLite's stored string
+            ).columns(updated_at=DateTime),
+            {
+                "match": match,
+                "open": SearchIndex.HIGHLIGHT_OPEN,
+                "close": SearchIndex.HIGHLIGHT_CLOSE,
+                "tokens": SearchIndex.SNIPPET_TOKENS,
+                "title_weight": SearchIndex.TITLE_WEIGHT,
+                "content_weight": SearchIndex.CONTENT_WEIGHT,
+                "limit": limit,
+                "offset": offset,
+                **tag_params,
+            },
+        ).all()
+
+        notes: List[Dict] = [
+            {
+                "id": row.id,
+                "title": row.title,
+                "title_highlight": row.title_highlight,
+                "snippet": row.snippet,
+                "score": -row.rank,
+                "updated_at": row.updated_at.isoformat() if row.updated_at else None,
+            }
+            for row in rows
+        ]
+        return {"notes": notes, "total": total}
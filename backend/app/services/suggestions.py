@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import os
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy.orm import Session
+from ..database import SessionLocal, Note
+from .graph_engine import GraphEngine
+from .note_fields import SUMMARY_FIELDS, note_dict
+from .related_notes import related_index
+from .resurfacing import IdeaResurfacing
+from .ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+PRECOMPUTE_INTERVAL = float(os.environ.get("FOCUSNEST_PRECOMPUTE_INTERVAL", "600"))
+SUGGESTION_TTL = float(os.environ.get("FOCUSNEST_SUGGESTION_TTL", "3600"))
+
+# Ready-to-serve payloads for the resurfacing/ranking endpoints, tagged with
+# the notes they mention so a write to any of them evicts the entry. Keys also
+# carry the graph generation: a new note or link can change who belongs in a
+# ranking without touching any note already in it.
+suggestion_cache = TTLCache(maxsize=256, ttl=SUGGESTION_TTL)
+_generation = 0
+
+DEFAULT_DAILY_COUNT = 5
+DEFAULT_ORPHAN_COUNT = 3
+DEFAULT_CENTRAL_LIMIT = 10
+
+def _note_payload(note: Note) -> Dict:
+    return note_dict(note, SUMMARY_FIELDS)
+
+def _cached_notes(key, db: Session, compute) -> Dict:
+    payload = suggestion_cache.get(key)
+    if payload is None:
+        notes: List[Note] = compute(IdeaResurfacing(db))
+        payload = {"notes": [_note_payload(n) for n in notes]}
+        suggestion_cache.set(key, payload, note_ids=[n.id for n in notes])
+    return payload
+
+def _key(name: str, arg: int):
+    return name, arg, _generation
+
+def daily_suggestions(db: Session, count: int = DEFAULT_DAILY_COUNT) -> Dict:
+    return _cached_notes(_key("daily", count), db, lambda r: r.get_daily_suggestions(count))
+
+def orphan_suggestions(db: Session, count: int = DEFAULT_ORPHAN_COUNT) -> Dict:
+    return _cached_notes(_key("orphans", count), db, lambda r: r.get_orphan_suggestions(count))
+
+def central_notes(db: Session, limit: int = DEFAULT_CENTRAL_LIMIT) -> Dict:
+    key = _key("central", limit)
+    payload = suggestion_cache.get(key)
+    if payload is None:
+        engine = GraphEngine(db)
+        ranked = engine.get_central_nodes(limit)
+        titles = engine.get_titles([note_id for note_id, _ in ranked])
+        payload = {"notes": [
+            {"id": note_id, "title": titles.get(note_id, f"Note {note_id}"), "centrality": score}
+            for note_id, score in ranked
+        ]}
+        suggestion_cache.set(key, payload, note_ids=[note_id for note_id, _ in ranked])
+    return payload
+
+def cached(name: str, arg: int) -> Optional[Dict]:
+    """The ready payload for ("daily" | "orphans" | "central", count), without touching the database"""
+    return suggestion_cache.get(_key(name, arg))
+
+def invalidate_notes(note_ids: Iterable[int]):
+    suggestion_cache.invalidate_notes(note_ids)
+
+def graph_changed():
+    """Notes were added or removed or links changed: every ranking may be different"""
+    global _generation
+    _generation += 1
+
+class SuggestionScheduler:
+    """Refreshes the default suggestion payloads in the background.
+
+    Runs on the app's event loop and does the database work in a worker
+    thread, so request handlers only ever read the cache.
+    """
+
+    def __init__(self, interval: float = PRECOMPUTE_INTERVAL):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def run_once(self):
+        with SessionLocal() as db:
+            for name, arg in (("daily", DEFAULT_DAILY_COUNT), ("orphans", DEFAULT_ORPHAN_COUNT), ("central", DEFAULT_CENTRAL_LIMIT)):
+                suggestion_cache.invalidate(_key(name, arg))
+            daily_suggestions(db)
+            orphan_suggestions(db)
+            central_notes(db)
+            # Batch recompute of the related-notes vectors, off the request path
+            related_index.refresh(db)
+
+    async def _loop(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.run_once)
+            except Exception:
+                logger.exception("Suggestion precompute failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+scheduler = SuggestionScheduler()
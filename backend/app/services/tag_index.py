@@ -0,0 +1,82 @@
+from typing import Dict, Iterable, List, Optional, Union
+from sqlalchemy import delete, insert, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from ..database import Tag
+
+# Facet counts per tag, kept current by triggers on `tags`, so listing the
+# most used tags reads a few rows instead of grouping the whole tags table.
+TAG_COUNT_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS tag_counts (
+        tag_name VARCHAR PRIMARY KEY,
+        note_count INTEGER NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_tag_counts_note_count ON tag_counts (note_count DESC, tag_name)",
+    """
+    CREATE TRIGGER IF NOT EXISTS tags_count_ai AFTER INSERT ON tags BEGIN
+        INSERT INTO tag_counts (tag_name, note_count) VALUES (new.tag_name, 1)
+        ON CONFLICT (tag_name) DO UPDATE SET note_count = note_count + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tags_count_ad AFTER DELETE ON tags BEGIN
+        UPDATE tag_counts SET note_count = note_count - 1 WHERE tag_name = old.tag_name;
+        DELETE FROM tag_counts WHERE tag_name = old.tag_name AND note_count <= 0;
+    END
+    """,
+]
+
+def ensure_schema(conn: Connection) -> None:
+    """Create the counts table and its triggers, counting existing tags into a fresh table"""
+    existed = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tag_counts'")
+    ).first() is not None
+    for statement in TAG_COUNT_SCHEMA:
+        conn.execute(text(statement))
+    if not existed:
+        rebuild_counts(conn)
+
+def rebuild_counts(conn: Union[Session, Connection]) -> int:
+    """Recount every tag from scratch; returns the number of distinct tags"""
+    conn.execute(text("DELETE FROM tag_counts"))
+    conn.execute(text(
+        "INSERT INTO tag_counts (tag_name, note_count) SELECT tag_name, count(*) FROM tags GROUP BY tag_name"
+    ))
+    return conn.execute(text("SELECT count(*) FROM tag_counts")).scalar_one()
+
+def add_tags(db: Union[Session, Connection], rows: List[Dict]):
+    """Insert {"note_id", "tag_name"} rows, skipping tags a note already has"""
+    if rows:
+        db.execute(insert(Tag).prefix_with("OR IGNORE"), rows)
+
+def sync_note_tags(db: Session, note_id: int, old: Iterable[str], new: Iterable[str]) -> bool:
+    """Apply the difference between a note's previous and current #hashtags.
+
+    Only tags that appeared or disappeared from the text are touched, so tags
+    set some other way (seeded, imported) stay. Returns whether anything changed.
+    """
+    old, new = set(old), set(new)
+    removed, added = old - new, new - old
+    if removed:
+        db.execute(delete(Tag).where(Tag.note_id == note_id, Tag.tag_name.in_(removed)))
+    add_tags(db, [{"note_id": note_id, "tag_name": tag} for tag in sorted(added)])
+    return bool(removed or added)
+
+def tagged_note_ids(tag: str):
+    """Subquery of the ids of notes carrying `tag`, answered by the (tag_name, note_id) index"""
+    return select(Tag.note_id).where(Tag.tag_name == tag)
+
+def tag_counts_query(prefix: Optional[str] = None, limit: int = 50, offset: int = 0):
+    """Tags with the number of notes carrying them, most used first"""
+    where = "WHERE tag_name >= :prefix AND tag_name < :prefix_end" if prefix else ""
+    statement = text(
+        f"SELECT tag_name, note_count FROM tag_counts {where} "
+        "ORDER BY note_count DESC, tag_name LIMIT :limit OFFSET :offset"
+    )
+    params = {"limit": limit, "offset": offset}
+    if prefix:
+        # Range scan on the primary key rather than LIKE, which SQLite will not index here
+        params.update(prefix=prefix, prefix_end=prefix + "\U0010ffff")
+    return statement.bindparams(**params)
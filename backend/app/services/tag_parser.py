@@ -0,0 +1,21 @@
+import re
+from typing import Set
+from .link_parser import LinkParser
+
+class TagParser:
+    # #tag, #multi-word-tag, #nested/tag; not "# Heading", url#fragment, &#39; or "#1"
+    TAG_PATTERN = r'(?<![\w#&/])#(?!\d+(?![\w/-]))(\w[\w/-]*)'
+    # Code and [[link]] text is never tagged
+    SKIP_PATTERN = r'```.*?```|`[^`\n]*`|' + LinkParser.LINK_PATTERN
+
+    @staticmethod
+    def normalize(tag: str) -> str:
+        """Case-fold and drop a leading '#' and trailing separators: '#Ideas/' -> 'ideas'"""
+        return tag.strip().lstrip("#").rstrip("/-").casefold()
+
+    @staticmethod
+    def extract_tags(content: str) -> Set[str]:
+        """Extract the normalized #hashtags of a note body"""
+        text = re.sub(TagParser.SKIP_PATTERN, " ", content or "", flags=re.DOTALL)
+        tags = (TagParser.normalize(match) for match in re.findall(TagParser.TAG_PATTERN, text))
+        return {tag for tag in tags if tag}
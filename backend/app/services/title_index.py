@@ -0,0 +1,169 @@
+import bisect
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy.orm import Session
+from ..database import Note
+
+def normalize_title(title: str) -> str:
+    """Case-fold and collapse whitespace so '[[ My  note ]]' matches 'my note'"""
+    return " ".join(title.split()).casefold()
+
+class TitleIndex:
+    """Process-wide map of normalized note title -> note ids.
+
+    Loaded with a single titles-only query on first use, then kept current
+    by the note write path, so resolving any number of links costs no queries.
+    Sorted arrays of the distinct keys, and of every word in them, answer
+    prefix lookups for link autocompletion with a binary search.
+    """
+
+    # Upper bound on index entries examined per suggest() stage
+    MAX_SCAN = 1000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids_by_key: Dict[str, Set[int]] = {}
+        self._key_by_id: Dict[int, str] = {}
+        self._title_by_id: Dict[int, str] = {}
+        self._sorted_keys: List[str] = []
+        self._sorted_words: List[Tuple[str, str]] = []
+        self._loaded = False
+
+    def _load(self, db: Session):
+        ids_by_key: Dict[str, Set[int]] = {}
+        key_by_id: Dict[int, str] = {}
+        title_by_id: Dict[int, str] = {}
+        for note_id, title in db.query(Note.id, Note.title):
+            key = normalize_title(title)
+            ids_by_key.setdefault(key, set()).add(note_id)
+            key_by_id[note_id] = key
+            title_by_id[note_id] = title
+        self._ids_by_key = ids_by_key
+        self._key_by_id = key_by_id
+        self._title_by_id = title_by_id
+        self._sorted_keys = sorted(ids_by_key)
+        self._sorted_words = sorted({(word, key) for key in ids_by_key for word in key.split()})
+        self._loaded = True
+
+    def ensure_loaded(self, db: Session):
+        with self._lock:
+            if not self._loaded:
+                self._load(db)
+
+    def invalidate(self):
+        """Drop the map; it is reloaded on next use (e.g. after writes from another process)"""
+        with self._lock:
+            self._loaded = False
+            self._ids_by_key = {}
+            self._key_by_id = {}
+            self._title_by_id = {}
+            self._sorted_keys = []
+            self._sorted_words = []
+
+    def resolve(self, titles: Iterable[str], db: Session) -> Dict[str, int]:
+        """Map each given title to a note id; unknown titles are left out.
+
+        When several notes share a normalized title the oldest (lowest id) wins.
+        """
+        self.ensure_loaded(db)
+        resolved = {}
+        with self._lock:
+            for title in titles:
+                ids = self._ids_by_key.get(normalize_title(title))
+                if ids:
+                    resolved[title] = min(ids)
+        return resolved
+
+    def lookup(self, title: str, db: Session) -> Optional[int]:
+        return self.resolve([title], db).get(title)
+
+    def suggest(self, q: str, limit: int, db: Session) -> List[Dict]:
+        """Titles for link autocompletion, best first, as [{"id", "title"}].
+
+        Titles starting with the query rank first (an exact match on top, then
+        shorter titles), followed by titles where every query word starts one
+        of the title's words, in any order. Each stage is a binary search into
+        a sorted array, so the cost does not grow with the size of the vault.
+        """
+        words = normalize_title(q).split()
+        if not words:
+            return []
+        query = " ".join(words)
+        self.ensure_loaded(db)
+        with self._lock:
+            prefixed = self._prefix_range(self._sorted_keys, query, lambda key: key)
+            ranked = sorted(prefixed, key=lambda key: (key != query, len(key), key))
+            if len(ranked) < limit:
+                # Probe with the longest word: it has the fewest matches
+                probe = max(words, key=len)
+                seen = set(ranked)
+                candidates = {
+                    key for _, key in self._prefix_range(self._sorted_words, probe, lambda entry: entry[0])
+                    if key not in seen
+                }
+                matching = [
+                    key for key in candidates
+                    if all(any(word.startswith(w) for word in key.split()) for w in words)
+                ]
+                ranked.extend(sorted(matching, key=lambda key: (len(key), key)))
+            results = []
+            for key in ranked[:limit]:
+                note_id = min(self._ids_by_key[key])
+                results.append({"id": note_id, "title": self._title_by_id[note_id]})
+            return results
+
+    def _prefix_range(self, entries: list, prefix: str, key_of) -> list:
+        """Entries of a sorted array whose key starts with `prefix`, at most MAX_SCAN of them"""
+        start = bisect.bisect_left(entries, prefix, key=key_of)
+        found = []
+        for entry in entries[start:start + self.MAX_SCAN]:
+            if not key_of(entry).startswith(prefix):
+                break
+            found.append(entry)
+        return found
+
+    def note_saved(self, note_id: int, title: str):
+        """Record a created or renamed note"""
+        key = normalize_title(title)
+        with self._lock:
+            if not self._loaded:
+                return
+            self._title_by_id[note_id] = title
+            old_key = self._key_by_id.get(note_id)
+            if old_key == key:
+                return
+            if old_key is not None:
+                self._discard(note_id, old_key)
+            self._add(note_id, key)
+
+    def note_deleted(self, note_id: int):
+        with self._lock:
+            if not self._loaded:
+                return
+            self._title_by_id.pop(note_id, None)
+            old_key = self._key_by_id.pop(note_id, None)
+            if old_key is not None:
+                self._discard(note_id, old_key)
+
+    def _add(self, note_id: int, key: str):
+        ids = self._ids_by_key.get(key)
+        if ids is None:
+            ids = self._ids_by_key[key] = set()
+            bisect.insort(self._sorted_keys, key)
+            for word in set(key.split()):
+                bisect.insort(self._sorted_words, (word, key))
+        ids.add(note_id)
+        self._key_by_id[note_id] = key
+
+    def _discard(self, note_id: int, key: str):
+        ids = self._ids_by_key.get(key)
+        if ids is None:
+            return
+        ids.discard(note_id)
+        if not ids:
+            del self._ids_by_key[key]
+            self._sorted_keys.pop(bisect.bisect_left(self._sorted_keys, key))
+            for word in set(key.split()):
+                self._sorted_words.pop(bisect.bisect_left(self._sorted_words, (word, key)))
+
+title_index = TitleIndex()
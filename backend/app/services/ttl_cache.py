@@ -0,0 +1,74 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after `ttl` seconds.
+
+    Entries can be tagged with the note ids they were built from, so a write
+    to any of those notes evicts exactly the entries that mention it.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, maxsize: int = 256, ttl: float = 3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any, Set[int]]]" = OrderedDict()
+        self._keys_by_note: Dict[int, Set[Hashable]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._evict(key)
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, note_ids: Iterable[int] = (), ttl: Optional[float] = None):
+        with self._lock:
+            if key in self._entries:
+                self._evict(key)
+            tags = set(note_ids)
+            self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value, tags)
+            for note_id in tags:
+                self._keys_by_note.setdefault(note_id, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._evict(next(iter(self._entries)))
+
+    def invalidate_notes(self, note_ids: Iterable[int]):
+        """Drop every entry built from any of the given notes"""
+        with self._lock:
+            for note_id in note_ids:
+                for key in list(self._keys_by_note.get(note_id, ())):
+                    self._evict(key)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            if key in self._entries:
+                self._evict(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_note.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _evict(self, key: Hashable):
+        _, _, tags = self._entries.pop(key)
+        for note_id in tags:
+            keys = self._keys_by_note.get(note_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_note[note_id]
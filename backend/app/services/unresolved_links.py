@@ -0,0 +1,60 @@
+from typing import Dict, Iterable, List, Tuple, Union
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from ..database import Link, UnresolvedLink
+from .title_index import normalize_title
+
+_KEY_CHUNK = 500
+
+def dangling_targets(titles: Iterable[str], resolved: Dict[str, int]) -> Dict[str, str]:
+    """{normalized key: link text} for the link titles missing from `resolved`"""
+    return {normalize_title(title): title for title in sorted(titles) if title not in resolved}
+
+def record_unresolved(db: Union[Session, Connection], rows: List[Dict]):
+    """Insert {"from_note_id", "target_key", "target_title"} rows, skipping pairs already recorded"""
+    if rows:
+        db.execute(insert(UnresolvedLink).prefix_with("OR IGNORE"), rows)
+
+def replace_unresolved(db: Session, from_note_id: int, dangling: Dict[str, str]):
+    """Make the stored dangling links of a note match `dangling` ({key: link text})"""
+    db.execute(delete(UnresolvedLink).where(UnresolvedLink.from_note_id == from_note_id))
+    record_unresolved(db, [
+        {"from_note_id": from_note_id, "target_key": key, "target_title": title}
+        for key, title in dangling.items()
+    ])
+
+def resolve_pending(db: Union[Session, Connection], targets: Dict[str, int]) -> List[Tuple[int, int]]:
+    """Turn the dangling links to the given keys into real links.
+
+    `targets` maps normalized titles to the note that now carries them. Each
+    key costs one indexed DELETE ... RETURNING on target_key, and the links
+    go in with one executemany, so the work is proportional to the number of
+    references, not to the size of the vault. Returns the (from, to) pairs made.
+    """
+    keys = sorted(targets)
+    pairs: List[Tuple[int, int]] = []
+    for start in range(0, len(keys), _KEY_CHUNK):
+        rows = db.execute(
+            delete(UnresolvedLink)
+            .where(UnresolvedLink.target_key.in_(keys[start:start + _KEY_CHUNK]))
+            .returning(UnresolvedLink.from_note_id, UnresolvedLink.target_key)
+        ).all()
+        pairs.extend((from_id, targets[key]) for from_id, key in rows)
+    if pairs:
+        db.execute(
+            insert(Link).prefix_with("OR IGNORE"),
+            [{"from_note_id": from_id, "to_note_id": to_id} for from_id, to_id in pairs],
+        )
+    return pairs
+
+def unresolved_query(limit: int = 50, offset: int = 0):
+    """Dangling targets with their reference counts, most referenced first"""
+    references = func.count().label("references")
+    return (
+        select(UnresolvedLink.target_key, func.min(UnresolvedLink.target_title).label("title"), references)
+        .group_by(UnresolvedLink.target_key)
+        .order_by(references.desc(), UnresolvedLink.target_key)
+        .limit(limit)
+        .offset(offset)
+    )
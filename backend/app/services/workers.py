@@ -0,0 +1,37 @@
+import asyncio
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+from sqlalchemy.orm import Session
+from ..database import SessionLocal
+
+T = TypeVar("T")
+
+ANALYTICS_WORKERS = int(os.environ.get("FOCUSNEST_ANALYTICS_WORKERS", "2"))
+
+# Graph analytics hold the graph cache lock and can run for seconds on a large
+# vault. They get their own small pool so they can neither block the event
+# loop nor take every thread that plain reads need.
+analytics_pool = ThreadPoolExecutor(max_workers=ANALYTICS_WORKERS, thread_name_prefix="focusnest-analytics")
+
+# SQLite runs one write at a time anyway; queueing writes on a single thread
+# keeps them from spinning on busy_timeout against each other.
+write_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="focusnest-writer")
+
+async def _run(pool: ThreadPoolExecutor, fn: Callable[[Session], T]) -> T:
+    def call():
+        with SessionLocal() as db:
+            return fn(db)
+    # run_in_executor does not carry context variables over; the request's
+    # metrics (services/metrics.py) need them on the worker thread too
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(pool, context.run, call)
+
+async def run_analytics(fn: Callable[[Session], T]) -> T:
+    """Run fn(db) with its own session on the analytics pool"""
+    return await _run(analytics_pool, fn)
+
+async def run_write(fn: Callable[[Session], T]) -> T:
+    """Run fn(db) with its own session on the writer thread"""
+    return await _run(write_pool, fn)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Compare the NetworkX and CSR GraphEngine backends on a synthetic graph.
+
+Usage (from backend/):
+    python -m benchmarks.graph_backends --notes 100000 --links-per-note 10
+"""
+
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+
+import networkx as nx
+
+from app.services.graph_cache import GraphCache
+from app.services.graph_engine import GraphEngine
+
+def build_graph(notes: int, links_per_note: int, seed: int) -> nx.Graph:
+    """Preferential-attachment graph: a few hubs, many sparsely linked notes"""
+    graph = nx.barabasi_albert_graph(notes, links_per_note, seed=seed)
+    nx.set_node_attributes(graph, {n: f"Note {n}" for n in graph.nodes()}, "title")
+    nx.set_edge_attributes(graph, 1, "strength")
+    return graph
+
+def measure_memory(factory):
+    """Return (result, bytes allocated while building it)"""
+    gc.collect()
+    tracemalloc.start()
+    result = factory()
+    _, peak = tracemalloc.get_traced_memory()
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, current, peak
+
+def time_calls(fn, args_list, repeat: int = 1) -> float:
+    """Mean milliseconds per call"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for args in args_list:
+            fn(*args)
+    return (time.perf_counter() - start) * 1000 / (repeat * len(args_list))
+
+def run(notes: int, links_per_note: int, samples: int, seed: int) -> dict:
+    random.seed(seed)
+    graph, nx_bytes, _ = measure_memory(lambda: build_graph(notes, links_per_note, seed))
+    cache = GraphCache.from_graph(graph)
+
+    start = time.perf_counter()
+    csr, csr_bytes, csr_peak = measure_memory(lambda: cache.csr(None))
+    csr_build_ms = (time.perf_counter() - start) * 1000
+
+    note_ids = [(random.randrange(notes),) for _ in range(samples)]
+    results = {
+        "notes": graph.number_of_nodes(),
+        "links": graph.number_of_edges(),
+        "memory_bytes": {"networkx": nx_bytes, "csr": csr.nbytes, "csr_build_peak": csr_peak},
+        "csr_build_ms": round(csr_build_ms, 2),
+        "latency_ms": {},
+    }
+    for backend in GraphEngine.BACKENDS:
+        engine = GraphEngine(None, backend=backend, cache=cache)
+        results["latency_ms"][backend] = {
+            "get_connected_notes": round(time_calls(engine.get_connected_notes, note_ids), 4),
+            "suggest_connections": round(time_calls(engine.suggest_connections, note_ids), 4),
+            "get_orphan_notes": round(time_calls(engine.get_orphan_notes, [()]), 4),
+            "get_central_nodes": round(time_calls(engine.get_central_nodes, [()]), 4),
+        }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="NetworkX vs CSR GraphEngine comparison")
+    parser.add_argument("--notes", type=int, default=20000)
+    parser.add_argument("--links-per-note", type=int, default=5)
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.notes, args.links_per_note, args.samples, args.seed), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Concurrent HTTP load test against a running FocusNest server.
+
+Many clients loop over a read-heavy request mix (note reads, list, search,
+ego networks) while a few of them also request the full graph, which is the
+slow path that used to starve everything else. Reports p50/p99 latency per
+endpoint as JSON.
+
+To compare two builds, run each against the same database copy, e.g.:
+    uvicorn app.main:app --port 8000 --workers 1
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --clients 200 --duration 30
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from collections import defaultdict
+
+import httpx
+
+def percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def request_mix(note_ids, rng: random.Random):
+    """(label, path) pairs in the proportions a browsing user produces"""
+    while True:
+        note_id = rng.choice(note_ids)
+        roll = rng.random()
+        if roll < 0.5:
+            yield "note", f"/api/notes/{note_id}"
+        elif roll < 0.7:
+            yield "list", "/api/notes/?limit=50"
+        elif roll < 0.9:
+            yield "search", f"/api/search/?q=note+{note_id % 1000}"
+        else:
+            yield "ego", f"/api/graph/ego/{note_id}?depth=1"
+
+async def client_loop(client: httpx.AsyncClient, requests, deadline: float, latencies, errors):
+    for label, path in requests:
+        if time.perf_counter() >= deadline:
+            return
+        start = time.perf_counter()
+        try:
+            response = await client.get(path)
+            response.raise_for_status()
+        except httpx.HTTPError:
+            errors[label] += 1
+            continue
+        latencies[label].append((time.perf_counter() - start) * 1000)
+
+async def run(url: str, clients: int, duration: float, graph_clients: int, seed: int) -> dict:
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        response = await client.get("/api/graph/nodes", params={"limit": 5000})
+        response.raise_for_status()
+        note_ids = [node["id"] for node in response.json()["nodes"]]
+        if not note_ids:
+            raise SystemExit("The target vault has no notes")
+
+        def full_graph():
+            while True:
+                yield "graph", "/api/graph/"
+
+        latencies = defaultdict(list)
+        errors = defaultdict(int)
+        deadline = time.perf_counter() + duration
+        loops = [
+            client_loop(client, request_mix(note_ids, random.Random(seed + i)), deadline, latencies, errors)
+            for i in range(clients - graph_clients)
+        ]
+        loops += [client_loop(client, full_graph(), deadline, latencies, errors) for _ in range(graph_clients)]
+        started = time.perf_counter()
+        await asyncio.gather(*loops)
+        elapsed = time.perf_counter() - started
+
+    total = sum(len(samples) for samples in latencies.values())
+    return {
+        "url": url,
+        "clients": clients,
+        "seconds": round(elapsed, 2),
+        "requests": total,
+        "requests_per_sec": round(total / elapsed, 1),
+        "errors": dict(errors),
+        "latency_ms": {
+            label: {
+                "count": len(samples),
+                "p50": round(statistics.median(samples), 2),
+                "p99": round(percentile(samples, 0.99), 2),
+            }
+            for label, samples in sorted(latencies.items())
+        },
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent latency test for the FocusNest API")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--graph-clients", type=int, default=2, help="clients that only fetch the full graph")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.url, args.clients, args.duration, args.graph_clients, args.seed))
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
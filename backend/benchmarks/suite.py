@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+In-process benchmark suite for FocusNest's hot paths.
+
+Generates a synthetic vault (see benchmarks/vault.py) in a scratch database,
+then times the API through FastAPI's TestClient and the GraphEngine methods
+directly. Response and suggestion caches are cleared before every timed
+request, so the numbers are the server's real work, not cache hits.
+
+Usage (from backend/):
+    python -m benchmarks.suite --notes 20000 --output bench.json
+    python -m benchmarks.suite --notes 20000 --baseline bench.json   # compare against an earlier run
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from .vault import VaultSpec, add_spec_arguments
+
+# A case slower than baseline by more than this factor is reported as a regression
+REGRESSION_RATIO = 1.2
+
+def measure(fn: Callable[[], object], repeat: int, setup: Optional[Callable[[], None]] = None) -> Dict:
+    """Run fn `repeat` times (after one untimed warm-up) and summarize the latencies in ms"""
+    if setup:
+        setup()
+    fn()
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "runs": repeat,
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "p50_ms": round(samples[len(samples) // 2], 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        "max_ms": round(samples[-1], 3),
+    }
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(spec: VaultSpec, repeat: int, links_per_write: int) -> Dict:
+    # Imported here: the engine binds to FOCUSNEST_DATABASE_URL at import time
+    from fastapi.testclient import TestClient
+    from app.database import SessionLocal
+    from app.main import app
+    from app.services import suggestions
+    from app.services.graph_analytics import graph_rankings, persist
+    from app.services.graph_cache import graph_cache
+    from app.services.graph_engine import GraphEngine
+    from app.services.http_cache import response_cache
+    from app.services.related_notes import related_index
+    from app.services.resurfacing import IdeaResurfacing
+    from app.services.title_index import title_index
+    from .vault import build, generate
+
+    started = time.perf_counter()
+    vault = build(spec)
+    build_seconds = time.perf_counter() - started
+
+    rng = random.Random(spec.seed)
+    records, _ = generate(spec)
+    titles = [record["title"] for record in records]
+    words = [word for word in records[0]["content"].split() if not word.startswith("[[")]
+    results: Dict[str, Dict] = {}
+
+    with SessionLocal() as db:
+        started = time.perf_counter()
+        title_index.ensure_loaded(db)
+        results["warm_title_index"] = {"seconds": round(time.perf_counter() - started, 3)}
+        started = time.perf_counter()
+        graph_cache.ensure_loaded(db)
+        results["warm_graph_cache"] = {"seconds": round(time.perf_counter() - started, 3)}
+        started = time.perf_counter()
+        related_index.ensure_loaded(db)
+        results["warm_related_index"] = {"seconds": round(time.perf_counter() - started, 3), **related_index.stats()}
+        started = time.perf_counter()
+        persist(db, graph_rankings.compute(db))
+        results["graph_analytics_run"] = {"seconds": round(time.perf_counter() - started, 3)}
+        hub = GraphEngine(db).get_central_nodes(1)[0][0]
+
+    with TestClient(app) as client:
+        def get(path: str, **params):
+            return lambda: client.get(path, params=params).raise_for_status()
+
+        def uncached():
+            response_cache.clear()
+            suggestions.suggestion_cache.clear()
+
+        cursor = client.get("/api/notes/", params={"limit": 100}).headers.get("x-next-cursor")
+        http_cases = {
+            "list_notes": get("/api/notes/", limit=100),
+            "list_notes_next_page": get("/api/notes/", limit=100, cursor=cursor),
+            "list_notes_with_content": get("/api/notes/", limit=100, fields="id,title,content"),
+            "get_note": get(f"/api/notes/{hub}"),
+            "render_note": get(f"/api/notes/{hub}/render"),
+            "backlinks": get(f"/api/notes/{hub}/backlinks", limit=50),
+            "search_notes_common_term": get("/api/search/", q=words[0]),
+            "search_notes_rare_term": get("/api/search/", q=words[-1]),
+            "suggest_titles": get("/api/search/suggest", q=titles[0][:3]),
+            "get_graph": get("/api/graph/"),
+            "get_graph_overview": get("/api/graph/overview"),
+            "graph_rankings": get("/api/graph/rankings", limit=50),
+            "graph_communities": get("/api/graph/communities", limit=20),
+            "get_ego_network": get(f"/api/graph/ego/{hub}"),
+            "related_notes": get(f"/api/notes/{hub}/related"),
+            "daily_suggestions": get("/api/search/resurface/daily"),
+            "random_discovery": get("/api/search/resurface/random"),
+        }
+        for name, fn in http_cases.items():
+            results[name] = measure(fn, repeat, setup=uncached)
+
+        def linked_content() -> str:
+            return " ".join(f"[[{title}]]" for title in rng.sample(titles, links_per_write))
+
+        created = []
+        results["create_note"] = measure(
+            lambda: created.append(client.post(
+                "/api/notes/", json={"title": f"Bench {len(created)}", "content": linked_content()}
+            ).json()["id"]),
+            repeat,
+        )
+        results["update_note_links"] = measure(
+            lambda: client.put(f"/api/notes/{created[0]}", json={"content": linked_content()}).raise_for_status(),
+            repeat,
+        )
+        results["update_note_text_only"] = measure(
+            lambda: client.put(
+                f"/api/notes/{created[0]}", json={"title": f"Bench renamed {rng.random()}"}
+            ).raise_for_status(),
+            repeat,
+        )
+
+    with SessionLocal() as db:
+        results["get_daily_suggestions"] = measure(lambda: IdeaResurfacing(db).get_daily_suggestions(5), repeat)
+        sample_ids = rng.sample(range(1, spec.notes), min(repeat, spec.notes - 1))
+        for backend in GraphEngine.BACKENDS:
+            engine = GraphEngine(db, backend=backend)
+            ids = iter(sample_ids * 2)
+            results[f"graph_{backend}_get_connected_notes"] = measure(
+                lambda: engine.get_connected_notes(next(ids)), repeat
+            )
+            ids = iter(sample_ids * 2)
+            results[f"graph_{backend}_suggest_connections"] = measure(
+                lambda: engine.suggest_connections(next(ids)), repeat
+            )
+            results[f"graph_{backend}_get_central_nodes"] = measure(lambda: engine.get_central_nodes(10), repeat)
+            results[f"graph_{backend}_get_orphan_notes"] = measure(engine.get_orphan_notes, repeat)
+        ids = iter(sample_ids * 2)
+        results["related_similar"] = measure(lambda: related_index.similar(next(ids)), repeat)
+        results["graph_get_graph_data"] = measure(GraphEngine(db).get_graph_data, repeat)
+
+    return {
+        "spec": asdict(spec),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "commit": _git_commit(),
+        },
+        "vault": {key: value for key, value in vault.items() if key != "spec"},
+        "build_seconds": round(build_seconds, 2),
+        "repeat": repeat,
+        "results": results,
+    }
+
+def compare(current: Dict, baseline: Dict) -> Dict:
+    """p50 ratio current/baseline per case present in both runs"""
+    ratios = {}
+    for name, result in current["results"].items():
+        before = baseline.get("results", {}).get(name, {})
+        if "p50_ms" in result and before.get("p50_ms"):
+            ratio = result["p50_ms"] / before["p50_ms"]
+            ratios[name] = {"ratio": round(ratio, 2), "regression": ratio > REGRESSION_RATIO}
+    return ratios
+
+def main():
+    parser = argparse.ArgumentParser(description="FocusNest hot-path benchmarks on a synthetic vault")
+    fields = add_spec_arguments(parser)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--links-per-write", type=int, default=50, help="links in each created/updated note")
+    parser.add_argument("--output", type=Path, help="write the JSON results here as well as to stdout")
+    parser.add_argument("--baseline", type=Path, help="earlier results to compare against")
+    args = parser.parse_args()
+    spec = VaultSpec(**{name: getattr(args, name) for name in fields})
+
+    with tempfile.TemporaryDirectory(prefix="focusnest-bench-") as scratch:
+        os.environ["FOCUSNEST_DATABASE_URL"] = f"sqlite:///{scratch}/bench.db"
+        # Keep background precomputation out of the measurements
+        os.environ["FOCUSNEST_PRECOMPUTE_INTERVAL"] = "0"
+        os.environ["FOCUSNEST_ANALYTICS_INTERVAL"] = "0"
+        results = run(spec, args.repeat, args.links_per_write)
+
+    if args.baseline:
+        results["comparison"] = compare(results, json.loads(args.baseline.read_text()))
+    output = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(output)
+    print(output)
+    regressions = [name for name, entry in results.get("comparison", {}).items() if entry["regression"]]
+    if regressions:
+        print(f"Regressions over {REGRESSION_RATIO}x: {', '.join(regressions)}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Synthetic vault generator.
+
+Builds a reproducible vault (same seed, same notes) with power-law linking:
+link targets are drawn with probability proportional to rank^-exponent, so a
+few hub notes collect most backlinks, as in real vaults. Notes are created
+evenly over the last `max_age_days`, oldest first, and a share of them edited
+again later, so the age-based resurfacing paths have candidates. Notes are
+loaded through database_setup.seed_notes, the same path as the sample notes.
+
+Usage (from backend/):
+    FOCUSNEST_DATABASE_URL=sqlite:///./data/bench.db \\
+        python -m benchmarks.vault --notes 20000 --mean-links 5
+"""
+
+import argparse
+import json
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+@dataclass
+class VaultSpec:
+    notes: int = 5000
+    mean_links: float = 5.0
+    # Larger exponents concentrate links on fewer hubs; 0 links uniformly
+    hub_exponent: float = 1.1
+    content_words: int = 150
+    tags_per_note: float = 1.5
+    tag_pool: int = 200
+    vocabulary: int = 5000
+    # Creation times spread over this many days up to now
+    max_age_days: float = 730.0
+    # Share of notes edited again some time after they were created
+    edited_share: float = 0.3
+    seed: int = 42
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "ta", "shi", "vo", "en", "dar", "qu", "is", "pol", "yx", "ber", "on"]
+
+def _power_law_cdf(size: int, exponent: float) -> np.ndarray:
+    weights = np.arange(1, size + 1, dtype=np.float64) ** -exponent
+    cdf = np.cumsum(weights)
+    return cdf / cdf[-1]
+
+def _words(rng: np.random.Generator, count: int) -> List[str]:
+    words = set()
+    while len(words) < count:
+        words.add("".join(rng.choice(SYLLABLES, size=rng.integers(2, 5))))
+    return sorted(words)
+
+def _timestamps(spec: VaultSpec, now: datetime) -> Tuple[List[datetime], List[datetime]]:
+    """(created_at, updated_at) per note, oldest note first"""
+    # A stream of its own, so the ages leave titles, bodies and links unchanged
+    rng = np.random.default_rng([spec.seed, 1])
+    ages = np.linspace(spec.max_age_days, 0.0, spec.notes, endpoint=False)
+    edited = rng.random(spec.notes) < spec.edited_share
+    since_edit = np.where(edited, ages * rng.random(spec.notes), ages)
+    created = [now - timedelta(days=age) for age in ages.tolist()]
+    updated = [now - timedelta(days=age) for age in since_edit.tolist()]
+    return created, updated
+
+def generate(spec: VaultSpec, now: Optional[datetime] = None) -> Tuple[List[Dict], Dict[str, List[str]]]:
+    """Note records and {title: [tags]} for a vault; deterministic for a given spec and `now`"""
+    rng = np.random.default_rng(spec.seed)
+    vocabulary = np.array(_words(rng, spec.vocabulary))
+    tag_names = [f"tag-{word}" for word in _words(rng, spec.tag_pool)]
+    # Word frequencies follow Zipf's law, so search terms range from rare to very common
+    word_cdf = _power_law_cdf(len(vocabulary), 1.0)
+    target_cdf = _power_law_cdf(spec.notes, spec.hub_exponent)
+    tag_cdf = _power_law_cdf(len(tag_names), 1.0)
+    # Hub rank is independent of creation order
+    rank_to_note = rng.permutation(spec.notes)
+
+    titles = [
+        f"{vocabulary[a].capitalize()} {vocabulary[b]} {i}"
+        for i, (a, b) in enumerate(rng.integers(0, len(vocabulary), size=(spec.notes, 2)))
+    ]
+    created, updated = _timestamps(spec, now or datetime.utcnow())
+    records, tags = [], {}
+    for i, title in enumerate(titles):
+        words = vocabulary[np.searchsorted(word_cdf, rng.random(max(1, int(rng.poisson(spec.content_words)))))]
+        link_count = int(rng.poisson(spec.mean_links))
+        targets = rank_to_note[np.searchsorted(target_cdf, rng.random(link_count))]
+        links = [f"[[{titles[t]}]]" for t in targets]
+        # Scatter the links through the body rather than appending them
+        body = list(words)
+        for link in links:
+            body.insert(int(rng.integers(0, len(body) + 1)), link)
+        records.append({
+            "title": title, "content": " ".join(body), "created_at": created[i], "updated_at": updated[i],
+        })
+        tag_count = int(rng.poisson(spec.tags_per_note))
+        if tag_count:
+            picked = np.searchsorted(tag_cdf, rng.random(tag_count))
+            tags[title] = sorted({tag_names[t] for t in picked})
+    return records, tags
+
+def build(spec: VaultSpec) -> Dict:
+    """Create the schema, add the sample notes and a generated vault to the configured database"""
+    from app.database import SessionLocal, init_db
+    from database_setup import seed_notes, seed_sample_notes
+
+    init_db()
+    records, tags = generate(spec)
+    with SessionLocal() as db:
+        seed_sample_notes(db)
+        stats = seed_notes(db, records, tags)
+    return {"spec": asdict(spec), **stats}
+
+def add_spec_arguments(parser: argparse.ArgumentParser) -> List[str]:
+    """Add one --option per VaultSpec field; returns the field names"""
+    names = []
+    for name, default in asdict(VaultSpec()).items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(default), default=default)
+        names.append(name)
+    return names
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic FocusNest vault")
+    fields = add_spec_arguments(parser)
+    args = parser.parse_args()
+    spec = VaultSpec(**{name: getattr(args, name) for name in fields})
+    print(json.dumps(build(spec), indent=2))
+
+if __name__ == "__main__":
+    main()
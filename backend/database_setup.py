@@ -1,91 +1,24 @@
 #!/usr/bin/env python3
 """
 FocusNest Database Initialization Script
-This script creates the SQLite database and tables for FocusNest.
+This script creates (or migrates) the SQLite database used by the app and
+adds the sample notes.
+
+The schema comes from the app itself (app.database models plus
+app.migrations), so this script and the running server always agree.
+Set FOCUSNEST_DATABASE_URL to target a different database file.
 """
 
-import sqlite3
-import os
-from pathlib import Path
+from sqlalchemy import func, inspect
 
-def create_database():
-    """Create the SQLite database and tables."""
-    
-    # Create data directory if it doesn't exist
-    data_dir = Path("../data")
-    data_dir.mkdir(exist_ok=True)
-    
-    # Database path
-    db_path = data_dir / "focusnest.db"
-    
-    # Connect to database (creates file if it doesn't exist)
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    # Create notes table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS notes (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        title TEXT NOT NULL,
-        content TEXT,
-        created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
-    
-    # Create links table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS links (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        from_note INTEGER NOT NULL,
-        to_note INTEGER NOT NULL,
-        strength REAL DEFAULT 1.0,
-        created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (from_note) REFERENCES notes (id) ON DELETE CASCADE,
-        FOREIGN KEY (to_note) REFERENCES notes (id) ON DELETE CASCADE,
-        UNIQUE(from_note, to_note)
-    )
-    """)
-    
-    # Create tags table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS tags (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        note_id INTEGER NOT NULL,
-        tag_name TEXT NOT NULL,
-        created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (note_id) REFERENCES notes (id) ON DELETE CASCADE,
-        UNIQUE(note_id, tag_name)
-    )
-    """)
-    
-    # Create metadata table
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS metadata (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        note_id INTEGER NOT NULL,
-        key TEXT NOT NULL,
-        value TEXT,
-        created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (note_id) REFERENCES notes (id) ON DELETE CASCADE,
-        UNIQUE(note_id, key)
-    )
-    """)
-    
-    # Create indexes for better performance
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_notes_title ON notes (title)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_notes_created ON notes (created)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_links_from ON links (from_note)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_links_to ON links (to_note)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tags_note ON tags (note_id)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tags_name ON tags (tag_name)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_metadata_note ON metadata (note_id)")
-    
-    # Insert sample data
-    cursor.execute("""
-    INSERT OR IGNORE INTO notes (id, title, content, created) VALUES 
-    (1, 'Welcome to FocusNest', 
-     'Welcome to your new knowledge management system!
+from app.database import engine, init_db, SessionLocal, Note
+from app.services.bulk import NoteImporter
+from app.services.tag_index import add_tags
+
+SAMPLE_NOTES = [
+    {
+        "title": "Welcome to FocusNest",
+        "content": """Welcome to your new knowledge management system!
 
 This is your first note. You can:
 
@@ -103,14 +36,11 @@ Try creating a link to [[My Second Note]] to see how linking works!
 3. **Graph View**: Click the graph button to visualize connections
 4. **Search**: Use the search bar to find notes quickly
 
-Happy note-taking!', 
-     datetime('now'))
-    """)
-    
-    cursor.execute("""
-    INSERT OR IGNORE INTO notes (id, title, content, created) VALUES 
-    (2, 'My Second Note', 
-     'This is your second note, linked from the [[Welcome to FocusNest]] note.
+Happy note-taking!""",
+    },
+    {
+        "title": "My Second Note",
+        "content": """This is your second note, linked from the [[Welcome to FocusNest]] note.
 
 You can create bidirectional links between notes. When you reference [[Welcome to FocusNest]], it creates a connection that you can see in the graph view.
 
@@ -121,14 +51,11 @@ You can create bidirectional links between notes. When you reference [[Welcome t
 - Use tags with #hashtag syntax
 - Build your personal knowledge graph
 
-The more connections you create, the more powerful your knowledge system becomes!', 
-     datetime('now'))
-    """)
-    
-    cursor.execute("""
-    INSERT OR IGNORE INTO notes (id, title, content, created) VALUES 
-    (3, 'Knowledge Management Tips', 
-     'Here are some tips for effective knowledge management with FocusNest:
+The more connections you create, the more powerful your knowledge system becomes!""",
+    },
+    {
+        "title": "Knowledge Management Tips",
+        "content": """Here are some tips for effective knowledge management with FocusNest:
 
 ## Best Practices
 
@@ -144,57 +71,80 @@ The more connections you create, the more powerful your knowledge system becomes
 - Reference [[Welcome to FocusNest]] for basic concepts
 - Create hub notes that link to many related topics
 
-Building a knowledge graph takes time, but the connections become incredibly valuable!', 
-     datetime('now'))
-    """)
-    
-    # Create some sample links
-    cursor.execute("INSERT OR IGNORE INTO links (from_note, to_note, strength) VALUES (1, 2, 1.0)")
-    cursor.execute("INSERT OR IGNORE INTO links (from_note, to_note, strength) VALUES (2, 1, 1.0)")
-    cursor.execute("INSERT OR IGNORE INTO links (from_note, to_note, strength) VALUES (3, 1, 1.0)")
-    cursor.execute("INSERT OR IGNORE INTO links (from_note, to_note, strength) VALUES (3, 2, 1.0)")
-    
-    # Create some sample tags
-    cursor.execute("INSERT OR IGNORE INTO tags (note_id, tag_name) VALUES (1, 'welcome')")
-    cursor.execute("INSERT OR IGNORE INTO tags (note_id, tag_name) VALUES (1, 'getting-started')")
-    cursor.execute("INSERT OR IGNORE INTO tags (note_id, tag_name) VALUES (2, 'example')")
-    cursor.execute("INSERT OR IGNORE INTO tags (note_id, tag_name) VALUES (3, 'tips')")
-    cursor.execute("INSERT OR IGNORE INTO tags (note_id, tag_name) VALUES (3, 'knowledge-management')")
-    
-    # Commit changes
-    conn.commit()
-    conn.close()
-    
-    print(f"✅ Database created successfully at: {db_path.absolute()}")
-    print("✅ Sample notes and links added")
-    print("\nDatabase tables created:")
-    print("  - notes (id, title, content, created, updated)")
-    print("  - links (id, from_note, to_note, strength, created)")
-    print("  - tags (id, note_id, tag_name, created)")
-    print("  - metadata (id, note_id, key, value, created)")
-    
-    return db_path
+Building a knowledge graph takes time, but the connections become incredibly valuable!""",
+    },
+]
+
+SAMPLE_TAGS = {
+    "Welcome to FocusNest": ["welcome", "getting-started"],
+    "My Second Note": ["example"],
+    "Knowledge Management Tips": ["tips", "knowledge-management"],
+}
+
+def seed_notes(db, records, tags_by_title=None, batch_size=1000) -> dict:
+    """Bulk load note records plus their tags; returns the importer's stats.
+
+    #hashtags in the content are tagged by the importer; `tags_by_title`
+    adds tags that are not written in the text. Shared by the sample notes
+    below and the synthetic vaults in benchmarks/.
+    """
+    first_new_id = (db.query(func.max(Note.id)).scalar() or 0) + 1
+
+    # The importer resolves [[links]] after all notes exist, so forward links connect too
+    stats = NoteImporter(batch_size=batch_size).run(records)
+
+    if tags_by_title:
+        ids = dict(db.query(Note.title, Note.id).filter(Note.id >= first_new_id))
+        rows = [
+            {"note_id": ids[title], "tag_name": tag}
+            for title, tags in tags_by_title.items() if title in ids
+            for tag in tags
+        ]
+        for start in range(0, len(rows), batch_size):
+            add_tags(db, rows[start:start + batch_size])
+        db.commit()
+        stats["tags"] = len(rows)
+    return stats
+
+def seed_sample_notes(db) -> int:
+    """Add the sample notes that are not there yet; returns how many were added."""
+    titles = [note["title"] for note in SAMPLE_NOTES]
+    existing = {title for (title,) in db.query(Note.title).filter(Note.title.in_(titles))}
+    missing = [note for note in SAMPLE_NOTES if note["title"] not in existing]
+    if not missing:
+        return 0
+
+    return seed_notes(db, missing, SAMPLE_TAGS)["notes"]
+
+def create_database():
+    """Create the SQLite database and tables."""
+    init_db()
+
+    with SessionLocal() as db:
+        added = seed_sample_notes(db)
+
+    print(f"✅ Database ready at: {engine.url.database}")
+    print(f"✅ Sample notes added: {added}")
+    print("\nDatabase tables:")
+    for table in ("notes", "links", "tags", "tag_counts", "unresolved_links", "note_rankings", "change_log"):
+        columns = ", ".join(c["name"] for c in inspect(engine).get_columns(table))
+        print(f"  - {table} ({columns})")
+
+    return engine.url.database
 
 def verify_database(db_path):
     """Verify that the database was created correctly."""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    # Check tables exist
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-    tables = [row[0] for row in cursor.fetchall()]
-    expected_tables = ['notes', 'links', 'tags', 'metadata']
-    
+    tables = set(inspect(engine).get_table_names())
+    expected_tables = ["notes", "links", "tags", "tag_counts", "unresolved_links", "note_rankings", "change_log", "notes_fts"]
+
     print(f"\nDatabase verification:")
-    for table in expected_tables:
-        if table in tables:
-            cursor.execute(f"SELECT COUNT(*) FROM {table}")
-            count = cursor.fetchone()[0]
-            print(f"  ✅ {table} table: {count} records")
-        else:
-            print(f"  ❌ {table} table: missing")
-    
-    conn.close()
+    with engine.connect() as conn:
+        for table in expected_tables:
+            if table in tables:
+                count = conn.exec_driver_sql(f"SELECT COUNT(*) FROM {table}").scalar()
+                print(f"  ✅ {table} table: {count} records")
+            else:
+                print(f"  ❌ {table} table: missing")
 
 if __name__ == "__main__":
     print("FocusNest Database Initialization")
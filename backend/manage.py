@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+FocusNest maintenance commands.
+
+Usage:
+    python manage.py reindex-search
+    python manage.py import <notes.ndjson | markdown directory>
+    python manage.py export <notes.ndjson | directory> [--format ndjson|markdown]
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+from app.database import engine, init_db
+from app.services.bulk import NoteImporter, export_markdown, export_ndjson, read_markdown_dir, read_ndjson
+from app.services.search_index import SearchIndex
+
+def reindex_search(args):
+    """Rebuild the full-text search index from the notes table."""
+    init_db()
+    with engine.begin() as conn:
+        count = SearchIndex.rebuild(conn)
+    print(f"✅ Search index rebuilt: {count} notes indexed")
+
+def import_notes(args):
+    """Bulk load notes from an NDJSON file (or stdin with '-') or a directory of .md files."""
+    init_db()
+    source = Path(args.source)
+    importer = NoteImporter(batch_size=args.batch_size)
+    if args.source == "-":
+        stats = importer.run(read_ndjson(sys.stdin))
+    elif source.is_dir():
+        stats = importer.run(read_markdown_dir(source))
+    else:
+        with open(source, encoding="utf-8") as f:
+            stats = importer.run(read_ndjson(f))
+    print(f"✅ Imported {stats['notes']} notes and {stats['links']} links "
+          f"in {stats['seconds']}s ({stats['notes_per_sec']} notes/sec)")
+
+def export_notes(args):
+    """Write every note to an NDJSON file (or stdout with '-') or a directory of .md files."""
+    init_db()
+    if args.format == "markdown":
+        count = export_markdown(Path(args.target))
+        print(f"✅ Exported {count} notes to {args.target}")
+        return
+    out = sys.stdout.buffer if args.target == "-" else open(args.target, "wb")
+    try:
+        for chunk in export_ndjson():
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="FocusNest maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    reindex = commands.add_parser("reindex-search", help="Backfill/rebuild the full-text search index")
+    reindex.set_defaults(func=reindex_search)
+
+    importer = commands.add_parser("import", help="Bulk import notes")
+    importer.add_argument("source", help="NDJSON file, '-' for stdin, or a directory of .md files")
+    importer.add_argument("--batch-size", type=int, default=NoteImporter.BATCH_SIZE)
+    importer.set_defaults(func=import_notes)
+
+    exporter = commands.add_parser("export", help="Export all notes")
+    exporter.add_argument("target", help="NDJSON file ('-' for stdout) or directory for markdown")
+    exporter.add_argument("--format", choices=["ndjson", "markdown"], default="ndjson")
+    exporter.set_defaults(func=export_notes)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
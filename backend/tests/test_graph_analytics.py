@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+from itertools import combinations
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, delete, select
+from sqlalchemy.orm import Session
+from app.database import Base, ChangeLog, Note, NoteRanking
+from app.services.graph_analytics import (
+    connected_components, graph_changed_since, label_propagation, persist,
+)
+from app.services.graph_csr import CSRGraph
+
+def _graph(n, edges):
+    sources, targets = zip(*edges)
+    return CSRGraph.from_edges(
+        np.arange(n, dtype=np.int64),
+        np.asarray(sources, dtype=np.int32),
+        np.asarray(targets, dtype=np.int32),
+        np.ones(len(edges), dtype=np.float32),
+    )
+
+def _groups(labels):
+    groups = {}
+    for row, label in enumerate(labels.tolist()):
+        groups.setdefault(label, set()).add(row)
+    return sorted(map(sorted, groups.values()))
+
+def test_label_propagation_finds_cliques_and_pairs():
+    cliques = [range(0, 5), range(5, 10)]
+    pairs = [(10, 11), (12, 13), (14, 15)]
+    edges = [edge for clique in cliques for edge in combinations(clique, 2)] + pairs
+    graph = _graph(16, edges)
+    expected = [list(clique) for clique in cliques] + [list(pair) for pair in pairs]
+    for seed in range(20):
+        assert _groups(label_propagation(graph, seed=seed)) == sorted(expected)
+
+def test_label_propagation_single_clique():
+    graph = _graph(5, list(combinations(range(5), 2)))
+    for seed in range(20):
+        assert label_propagation(graph, seed=seed).tolist() == [0] * 5
+
+def test_connected_components_numbered_by_size():
+    graph = _graph(7, [(0, 1), (1, 2), (2, 3), (4, 5)])
+    assert connected_components(graph).tolist() == [0, 0, 0, 0, 1, 1, 2]
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'analytics.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+def _log(db, kind, at):
+    db.add(ChangeLog(kind=kind, note_id=1, created_at=at))
+    db.commit()
+
+def test_graph_changed_since_ignores_title_edits(db):
+    computed_at = datetime(2026, 1, 2)
+    assert not graph_changed_since(db, computed_at)
+    _log(db, "link.created", computed_at - timedelta(hours=1))
+    _log(db, "note.updated", computed_at + timedelta(hours=1))
+    assert not graph_changed_since(db, computed_at)
+    _log(db, "link.deleted", computed_at + timedelta(hours=2))
+    assert graph_changed_since(db, computed_at)
+
+def test_graph_changed_since_when_log_was_pruned(db):
+    computed_at = datetime(2026, 1, 2)
+    _log(db, "note.updated", computed_at - timedelta(hours=1))
+    _log(db, "note.updated", computed_at + timedelta(hours=1))
+    db.execute(delete(ChangeLog).where(ChangeLog.id == 1))
+    db.commit()
+    # Whatever was pruned between the run and the oldest entry left is unknown
+    assert graph_changed_since(db, computed_at)
+
+def test_persist_upserts_and_drops_deleted_notes(db):
+    db.add_all([Note(id=note_id, title=f"n{note_id}") for note_id in (1, 2, 3)])
+    db.commit()
+
+    def run(ids, score, at):
+        return {"computed_at": at, "rows": [
+            {"note_id": note_id, "pagerank": score, "community": 0, "component": 0, "computed_at": at}
+            for note_id in ids
+        ]}
+
+    persist(db, run([1, 2, 3], 0.1, datetime(2026, 1, 1)))
+    db.query(Note).filter(Note.id == 3).delete()
+    db.commit()
+    persist(db, run([1, 2, 3], 0.2, datetime(2026, 1, 2)))
+    rows = db.execute(select(NoteRanking.note_id, NoteRanking.pagerank).order_by(NoteRanking.note_id)).all()
+    assert [tuple(row) for row in rows] == [(1, 0.2), (2, 0.2)]
@@ -0,0 +1,176 @@
+import random
+import threading
+from datetime import datetime
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from app.database import Base, Note
+from app.services.related_notes import RelatedIndex
+
+TOPICS = {
+    "garden": "tomato compost mulch seedling trellis basil soil harvest",
+    "sailing": "mainsail jib tack halyard mooring keel rudder spinnaker",
+    "baking": "sourdough starter crumb proofing levain oven flour scoring",
+    "chess": "gambit endgame rook bishop castling pawn opening checkmate",
+}
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'related.db'}")
+    Base.metadata.create_all(engine)
+    rng = random.Random(7)
+    with Session(engine) as session:
+        for topic, words in TOPICS.items():
+            for i in range(8):
+                session.add(Note(title=f"{topic} {i}", content=" ".join(rng.choices(words.split(), k=20))))
+        session.commit()
+        yield session
+    engine.dispose()
+
+def _create(db, index, title, content):
+    note = Note(title=title, content=content)
+    db.add(note)
+    db.commit()
+    index.note_saved(note.id, note.title, note.content, version=note.updated_at)
+    return note
+
+def _update(db, index, note, content):
+    old_title, old_content = note.title, note.content
+    note.content = content
+    db.commit()
+    index.note_saved(note.id, note.title, note.content, old_title, old_content, note.updated_at)
+
+def _delete(db, index, note):
+    note_id, title, content, version = note.id, note.title, note.content, note.updated_at
+    db.delete(note)
+    db.commit()
+    index.note_deleted(note_id, title, content, version)
+
+def _fresh(db):
+    index = RelatedIndex()
+    index.rebuild(db)
+    return index
+
+def _topic_of(db, note_id):
+    return db.get(Note, note_id).title.split()[0]
+
+def test_delta_serves_new_edited_and_deleted_notes(db):
+    index = _fresh(db)
+    note = _create(db, index, "garden 8", TOPICS["garden"])
+    assert index.stats()["pending"] == 1
+    assert {_topic_of(db, other) for other, _ in index.similar(note.id, 5)} == {"garden"}
+    first = db.query(Note).filter(Note.title == "garden 0").one()
+    assert note.id in dict(index.similar(first.id, 20))
+
+    _update(db, index, note, TOPICS["sailing"])
+    assert {_topic_of(db, other) for other, _ in index.similar(note.id, 5)} == {"sailing"}
+    _delete(db, index, note)
+    assert index.similar(note.id) is None
+    assert note.id not in dict(index.similar(first.id, 40))
+    # Document frequencies match a build from scratch
+    reference = _fresh(db)
+    assert index._docs == reference._docs
+    assert np.array_equal(index._df, reference._df)
+
+def test_merge_keeps_results(db):
+    index = _fresh(db)
+    notes = db.query(Note).order_by(Note.id).all()
+    for note in notes[:6]:
+        _update(db, index, note, note.content + " " + TOPICS["chess"].split()[0])
+    _create(db, index, "baking 8", TOPICS["baking"])
+    before = {note.id: index.similar(note.id, 10) for note in notes}
+    index._merge_delta()
+    assert index.stats()["pending"] == 0
+    after = {note.id: index.similar(note.id, 10) for note in notes}
+    for note_id, expected in before.items():
+        assert [other for other, _ in after[note_id]] == [other for other, _ in expected]
+        assert np.allclose([score for _, score in after[note_id]], [score for _, score in expected])
+
+def test_merge_runs_at_delta_limit(db):
+    index = _fresh(db)
+    index.DELTA_LIMIT = 3
+    for i in range(3):
+        _create(db, index, f"chess {8 + i}", TOPICS["chess"])
+    stats = index.stats()
+    assert stats["pending"] == 0
+    assert stats["notes"] == 35
+
+def test_rebuild_replays_only_writes_its_read_missed(db, monkeypatch):
+    index = _fresh(db)
+    notes = db.query(Note).order_by(Note.id).all()
+    read = RelatedIndex._read
+
+    def racing_read(fresh, read_db, *args, **kwargs):
+        # Committed before the read but reported after the replay list opened
+        _create(db, index, "sailing 8", TOPICS["sailing"])
+        _update(db, index, notes[0], TOPICS["chess"])
+        seen = read(fresh, read_db, *args, **kwargs)
+        # Committed after the read: only the replay knows about these
+        _update(db, index, notes[1], TOPICS["baking"])
+        _delete(db, index, notes[2])
+        _create(db, index, "garden 8", TOPICS["garden"])
+        return seen
+
+    monkeypatch.setattr(RelatedIndex, "_read", racing_read)
+    index.rebuild(db)
+    monkeypatch.setattr(RelatedIndex, "_read", read)
+    reference = _fresh(db)
+    assert index._docs == reference._docs
+    assert np.array_equal(index._df, reference._df)
+    assert index.stats()["notes"] == reference.stats()["notes"]
+    assert {_topic_of(db, other) for other, _ in index.similar(notes[1].id, 5)} == {"baking"}
+    assert index.similar(notes[2].id) is None
+
+def test_writes_do_not_wait_for_a_build(db, monkeypatch):
+    index = RelatedIndex()
+    reading, release = threading.Event(), threading.Event()
+    read = RelatedIndex._read
+
+    def slow_read(fresh, read_db, *args, **kwargs):
+        seen = read(fresh, read_db, *args, **kwargs)
+        reading.set()
+        release.wait(5)
+        return seen
+
+    monkeypatch.setattr(RelatedIndex, "_read", slow_read)
+    builder = threading.Thread(target=index.ensure_loaded, args=(db,))
+    builder.start()
+    assert reading.wait(5)
+    note = Note(title="garden 8", content=TOPICS["garden"])
+    db.add(note)
+    db.commit()
+    writer = threading.Thread(target=index.note_saved, args=(note.id, note.title, note.content),
+                              kwargs={"version": note.updated_at})
+    writer.start()
+    writer.join(1)
+    assert not writer.is_alive()
+    release.set()
+    builder.join(5)
+    # The build never saw the note; the replay brought it in
+    assert {_topic_of(db, other) for other, _ in index.similar(note.id, 5)} == {"garden"}
+
+def test_invalidate_discards_a_build_in_progress(db, monkeypatch):
+    index = RelatedIndex()
+    read = RelatedIndex._read
+
+    def invalidating_read(fresh, read_db, *args, **kwargs):
+        seen = read(fresh, read_db, *args, **kwargs)
+        index.invalidate()
+        return seen
+
+    monkeypatch.setattr(RelatedIndex, "_read", invalidating_read)
+    index.rebuild(db)
+    assert not index._loaded
+    assert index._replay is None
+
+def test_seen_versions():
+    earlier, later = datetime(2026, 1, 1), datetime(2026, 1, 2)
+    saved, deleted = RelatedIndex.note_saved, RelatedIndex.note_deleted
+    assert RelatedIndex._seen({1: later}, saved, 1, earlier)
+    assert not RelatedIndex._seen({1: earlier}, saved, 1, later)
+    assert not RelatedIndex._seen({}, saved, 1, later)
+    assert RelatedIndex._seen({}, deleted, 1, later)
+    assert not RelatedIndex._seen({1: later}, deleted, 1, later)
+    # The id now belongs to a note created after the deleted one
+    assert RelatedIndex._seen({1: later}, deleted, 1, earlier)
@@ -1,6 +1,7 @@
 import { initializeEditor } from './editor.js';
 import { toggleSearch, closeSearch, performSearch } from './search.js';
 import { toggleGraph, closeGraph } from './graph.js';
+import { startChangeFeed, onChanges, upsertNote, removeNote } from './changes.js';
 import { AppState, API_BASE } from './state.js';
 
 // Initialize app
@@ -10,6 +11,11 @@ document.addEventListener('DOMContentLoaded', async () => {
     initializeEditor({ onAutoSave: saveCurrentNote });
     await loadRecentNotes();
     await loadDailySuggestions();
+    // Later saves, here or in other tabs, arrive as changes to patch in
+    onChanges(({ notes }) => {
+        if (notes) renderNoteLists();
+    });
+    startChangeFeed({ reload: loadRecentNotes });
 });
 
 async function initializeApp() {
@@ -55,18 +61,22 @@ async function loadRecentNotes() {
         const response = await fetch(`${API_BASE}/notes/`);
         const notes = await response.json();
         AppState.notes = notes;
-        renderRecentNotes(notes);
-        // Also populate all notes section if it exists
-        const allNotesContainer = document.getElementById('all-notes');
-        if (allNotesContainer) {
-            renderAllNotes(notes);
-        }
+        renderNoteLists();
     } catch (error) {
         console.error('Failed to load notes:', error);
         showNotification('Failed to load notes', 'error');
     }
 }
 
+function renderNoteLists() {
+    renderRecentNotes(AppState.notes);
+    // Also populate all notes section if it exists
+    const allNotesContainer = document.getElementById('all-notes');
+    if (allNotesContainer) {
+        renderAllNotes(AppState.notes);
+    }
+}
+
 function renderRecentNotes(notes) {
     const container = document.getElementById('recent-notes');
     container.innerHTML = '';
@@ -148,7 +158,7 @@ function createNoteListItem(note) {
     element.className = 'note-item';
     element.innerHTML = `
         <h4>${escapeHtml(note.title)}</h4>
-        <p class="note-preview">${escapeHtml(note.content.substring(0, 100))}${note.content.length > 100 ? '...' : ''}</p>
+        <p class="note-preview">${escapeHtml(note.preview.substring(0, 100))}${note.preview.length > 100 ? '...' : ''}</p>
     `;
     element.addEventListener('click', () => loadNote(note.id));
     // Highlight selected note
@@ -216,7 +226,9 @@ async function saveCurrentNote() {
             const savedNote = await response.json();
             AppState.currentNote = savedNote;
             document.getElementById('delete-note').style.display = 'block';
-            await loadRecentNotes();
+            const { id, title, preview, word_count, updated_at } = savedNote;
+            upsertNote({ id, title, preview, word_count, updated_at });
+            renderNoteLists();
             showNotification('Note saved successfully', 'success');
         } else {
             const error = await response.json();
@@ -238,8 +250,9 @@ async function deleteCurrentNote() {
         });
 
         if (response.ok) {
+            removeNote(AppState.currentNote.id);
             createNewNote();
-            await loadRecentNotes();
+            renderNoteLists();
             showNotification('Note deleted successfully', 'success');
         } else {
             showNotification('Failed to delete note', 'error');
@@ -323,7 +336,7 @@ function renderSuggestions(suggestions) {
         element.className = 'suggestion-item';
         element.innerHTML = `
             <strong>${escapeHtml(note.title)}</strong>
-            <p>${escapeHtml(note.content.substring(0, 60))}...</p>
+            <p>${escapeHtml(note.preview.substring(0, 60))}...</p>
         `;
         element.addEventListener('click', () => loadNote(note.id));
         container.appendChild(element);
@@ -350,7 +363,7 @@ function renderRandomNote(note) {
     container.innerHTML = `
         <div class="suggestion-item">
             <strong>${escapeHtml(note.title)}</strong>
-            <p>${escapeHtml(note.content.substring(0, 80))}...</p>
+            <p>${escapeHtml(note.preview.substring(0, 80))}...</p>
         </div>
     `;
     container.querySelector('.suggestion-item').addEventListener('click', () => loadNote(note.id));
@@ -0,0 +1,111 @@
+import { AppState, API_BASE } from './state.js';
+
+// Live updates from /ws. AppState.changeSeq is the last change applied
+// locally; after a reconnect (or a dropped backlog) the client catches up
+// with /api/notes/changes?since= instead of reloading the whole list.
+
+const MAX_RETRY_DELAY = 30000;
+
+let reloadAll = async () => {};
+const listeners = [];
+let retryDelay = 1000;
+// Messages are handled one at a time, in order, even across awaits
+let queue = Promise.resolve();
+
+function startChangeFeed({ reload }) {
+    reloadAll = reload;
+    connect();
+}
+
+function onChanges(listener) {
+    listeners.push(listener);
+}
+
+function connect() {
+    const scheme = location.protocol === 'https:' ? 'wss' : 'ws';
+    const socket = new WebSocket(`${scheme}://${location.host}/ws`);
+    socket.onopen = () => { retryDelay = 1000; };
+    socket.onmessage = (event) => {
+        const message = JSON.parse(event.data);
+        queue = queue.then(() => handleMessage(message)).catch(error => {
+            console.error('Failed to apply changes:', error);
+        });
+    };
+    socket.onclose = () => {
+        setTimeout(connect, retryDelay);
+        retryDelay = Math.min(retryDelay * 2, MAX_RETRY_DELAY);
+    };
+}
+
+async function handleMessage(message) {
+    if (message.type === 'hello') {
+        if (AppState.changeSeq === null) {
+            // Nothing to catch up from: take the list as of now
+            AppState.changeSeq = message.seq;
+            await reloadAll();
+            notify({ notes: true, links: true });
+        } else {
+            await catchUp();
+        }
+    } else if (message.type === 'resync') {
+        await catchUp();
+    } else if (message.type === 'changes') {
+        const events = message.events.filter(event => event.seq > AppState.changeSeq);
+        AppState.changeSeq = Math.max(AppState.changeSeq, message.seq);
+        applyEvents(events);
+    }
+}
+
+async function catchUp() {
+    const response = await fetch(`${API_BASE}/notes/changes?since=${AppState.changeSeq}`);
+    const delta = await response.json();
+    if (delta.reset) {
+        AppState.changeSeq = delta.seq;
+        await reloadAll();
+        notify({ notes: true, links: true });
+        return;
+    }
+    delta.notes.forEach(upsertNote);
+    delta.deleted.forEach(removeNote);
+    AppState.changeSeq = delta.seq;
+    const links = delta.links.created.length + delta.links.deleted.length;
+    if (delta.notes.length || delta.deleted.length || links) {
+        notify({ notes: delta.notes.length + delta.deleted.length > 0, links: links > 0 });
+    }
+}
+
+function applyEvents(events) {
+    if (events.length === 0) return;
+    let notes = false;
+    let links = false;
+    events.forEach(event => {
+        if (event.type === 'note.created' || event.type === 'note.updated') {
+            upsertNote(event.note);
+            notes = true;
+        } else if (event.type === 'note.deleted') {
+            removeNote(event.id);
+            notes = true;
+        } else {
+            links = true;
+        }
+    });
+    notify({ notes, links });
+}
+
+// AppState.notes stays sorted like GET /api/notes/: most recently updated first
+function upsertNote(note) {
+    const notes = AppState.notes.filter(existing => existing.id !== note.id);
+    const index = notes.findIndex(existing => existing.updated_at < note.updated_at);
+    notes.splice(index === -1 ? notes.length : index, 0, note);
+    AppState.notes = notes;
+}
+
+function removeNote(noteId) {
+    AppState.notes = AppState.notes.filter(note => note.id !== noteId);
+}
+
+function notify(change) {
+    listeners.forEach(listener => listener(change));
+}
+
+export { startChangeFeed, onChanges, upsertNote, removeNote };
@@ -91,7 +91,7 @@ function handleLinkDetection(event) {
 
 async function showLinkSuggestions(linkText, start, end) {
     try {
-        const response = await fetch(`${API_BASE}/search?q=${encodeURIComponent(linkText)}&limit=5`);
+        const response = await fetch(`${API_BASE}/search/suggest?q=${encodeURIComponent(linkText)}&limit=5`);
         const body = await response.json();
 
         let suggestions = Array.isArray(body)
@@ -136,10 +136,10 @@ function displayLinkSuggestions(suggestions, linkText, start, end) {
         suggestions.forEach(note => {
             const item = document.createElement('div');
             item.className = 'suggestion-item';
-            item.innerHTML = `
-                <div class="suggestion-title">${note.title}</div>
-                <div class="suggestion-preview">${(note.content || '').substring(0, 100)}...</div>
-            `;
+            const title = document.createElement('div');
+            title.className = 'suggestion-title';
+            title.textContent = note.title;
+            item.appendChild(title);
             item.addEventListener('click', () => {
                 selectSuggestion(note.title, start, end);
             });
@@ -154,8 +154,8 @@ function displayLinkSuggestions(suggestions, linkText, start, end) {
 function selectSuggestion(title, start, end) {
     const editor = document.getElementById('note-content');
     const content = editor.value;
-    // Replace [[...]] with selected title
-    editor.value = content.substring(0, start) + title + content.substring(end);
+    // Replace [[...]] with [[selected title]]
+    editor.value = content.substring(0, start) + '[[' + title + ']]' + content.substring(end);
     editor.focus();
     hideLinkSuggestions();
 }
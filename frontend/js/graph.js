@@ -1,19 +1,39 @@
 // import * as d3 from 'd3';
 import { API_BASE } from './state.js';
 import { loadNote } from './app.js'; // Adjust if using a shared loader
+import { onChanges } from './changes.js';
 
 let graphSvg, graphSimulation;
+// The graph last drawn is reused until the change feed reports an edit
+let graphStale = true;
+let reloadTimer = null;
+
+onChanges(() => {
+    graphStale = true;
+    if (isGraphOpen()) {
+        // Batch a burst of saves into one refetch
+        clearTimeout(reloadTimer);
+        reloadTimer = setTimeout(loadGraphData, 1000);
+    }
+});
+
+function isGraphOpen() {
+    const graphArea = document.getElementById('graph-area');
+    return graphArea.style.display !== 'none' && getComputedStyle(graphArea).display !== 'none';
+}
 
 function toggleGraph() {
     const graphArea = document.getElementById('graph-area');
     const editorArea = document.getElementById('editor-area');
 
-    const isHidden = graphArea.style.display === 'none' || getComputedStyle(graphArea).display === 'none';
-
-    if (isHidden) {
+    if (!isGraphOpen()) {
         graphArea.style.display = 'flex';
         editorArea.style.display = 'none';
-        loadGraphData();
+        if (graphStale) {
+            loadGraphData();
+        } else if (graphSimulation) {
+            graphSimulation.alpha(0.3).restart();
+        }
     } else {
         closeGraph();
     }
@@ -25,16 +45,55 @@ function closeGraph() {
 }
 
 async function loadGraphData() {
+    graphStale = false;
     try {
-        const response = await fetch(`${API_BASE}/graph/`);
-        const data = await response.json();
+        const response = await fetch(`${API_BASE}/graph/export?format=binary`);
+        const data = decodeBinaryGraph(await response.arrayBuffer());
+        if (graphSimulation) graphSimulation.stop();
         renderGraph(data);
     } catch (err) {
         console.error('Failed to load graph data:', err);
+        graphStale = true;
         showNotification('Failed to load graph', 'error');
     }
 }
 
+// Decode the columnar export (see GraphExporter): a 20-byte header, typed
+// arrays for ids/connections/links, then NUL-separated titles.
+// Typed array views assume a little-endian host, which all browsers are.
+function decodeBinaryGraph(buffer) {
+    const header = new DataView(buffer, 0, 20);
+    const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+    if (magic !== 'FNGB') {
+        throw new Error('Unexpected graph export format');
+    }
+    const nodeCount = header.getUint32(12, true);
+    const linkCount = header.getUint32(16, true);
+
+    let offset = 20;
+    const take = (ArrayType, length) => {
+        const view = new ArrayType(buffer, offset, length);
+        offset += length * ArrayType.BYTES_PER_ELEMENT;
+        return view;
+    };
+    const ids = take(Int32Array, nodeCount);
+    const connections = take(Int32Array, nodeCount);
+    const sources = take(Int32Array, linkCount);
+    const targets = take(Int32Array, linkCount);
+    const strengths = take(Float32Array, linkCount);
+    const titles = new TextDecoder().decode(new Uint8Array(buffer, offset)).split('\0');
+
+    const nodes = new Array(nodeCount);
+    for (let i = 0; i < nodeCount; i++) {
+        nodes[i] = { id: ids[i], title: titles[i] || '', connections: connections[i] };
+    }
+    const links = new Array(linkCount);
+    for (let i = 0; i < linkCount; i++) {
+        links[i] = { source: sources[i], target: targets[i], strength: strengths[i] };
+    }
+    return { version: header.getUint32(8, true), nodes, links };
+}
+
 function renderGraph(data) {
     const container = document.getElementById('graph-container');
     container.innerHTML = '';
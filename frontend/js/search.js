@@ -70,8 +70,8 @@ function renderSearchResults(notes) {
         const element = document.createElement('div');
         element.className = 'search-result-item';
         element.innerHTML = `
-            <div class="search-result-title">${escapeHtml(note.title)}</div>
-            <div class="search-result-content">${escapeHtml(note.content.substring(0, 120))}...</div>
+            <div class="search-result-title">${highlightHtml(note.title_highlight || note.title)}</div>
+            <div class="search-result-content">${highlightHtml(note.snippet || '')}</div>
         `;
 
         element.addEventListener('click', () => {
@@ -90,6 +90,13 @@ function escapeHtml(text) {
     return div.innerHTML;
 }
 
+// Snippets arrive with <mark> around matched terms: escape everything, then restore only those tags
+function highlightHtml(text) {
+    return escapeHtml(text)
+        .replace(/&lt;mark&gt;/g, '<mark>')
+        .replace(/&lt;\/mark&gt;/g, '</mark>');
+}
+
 // Close overlay when clicking outside the modal box
 document.getElementById('search-overlay').addEventListener('click', (e) => {
     if (e.target.id === 'search-overlay') {
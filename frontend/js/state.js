@@ -6,5 +6,7 @@ export const AppState = {
   notes: [],
   isPreviewMode: false,
   searchResults: [],
+  // Last change feed seq applied to `notes` (null until the first load)
+  changeSeq: null,
 };
 